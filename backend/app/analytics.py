@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+from itertools import chain
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional; without it the same aggregates come from one SQLite GROUP BY
+    np = None
+
+from .database import (
+    DAY_US,
+    fetch_item_stock,
+    fetch_items_by_ids,
+    fetch_movement_aggregates,
+    from_epoch_us,
+    iter_movement_values,
+    utc_now_us,
+)
+from .schemas import AnalyticsSort
+
+ANALYTICS_CHUNK_SIZE = int(os.environ.get("MRP_ANALYTICS_CHUNK_SIZE", "200000"))
+# Without an explicit end, the API window ends at the start of the current
+# bucket (an hour by default), so cached reports roll over on a quiet database.
+ANALYTICS_NOW_BUCKET_US = int(float(os.environ.get("MRP_ANALYTICS_NOW_BUCKET_SECONDS", "3600")) * 1_000_000)
+DEFAULT_DEAD_STOCK_DAYS = 90
+# Window start when the whole history is analysed.
+HISTORY_START = -(2**62)
+
+
+class ItemAggregates(NamedTuple):
+    # One entry per item, in the order of ids: NumPy arrays, or lists when
+    # NumPy is not installed. stock_time is the quantity integrated over the
+    # window, in quantity x microseconds; first_ts is end_ts and last_exit_ts
+    # HISTORY_START for items without such movements.
+    movements: Sequence[int]
+    consumed_quantity: Sequence[float]
+    consumed_value: Sequence[float]
+    received_quantity: Sequence[float]
+    stock_time: Sequence[float]
+    first_ts: Sequence[int]
+    last_exit_ts: Sequence[int]
+
+
+class AnalyticsResult(NamedTuple):
+    engine: str
+    start_ts: Optional[int]
+    end_ts: int
+    dead_stock_days: int
+    item_count: int
+    movements: int
+    inventory_value: float
+    consumed_value: float
+    dead_stock_count: int
+    dead_stock_value: float
+    rows: List[Dict[str, Any]]
+    next_offset: Optional[int]
+
+
+def now_bucket(now_us: Optional[int] = None) -> int:
+    now_us = utc_now_us() if now_us is None else now_us
+    return now_us - now_us % ANALYTICS_NOW_BUCKET_US
+
+
+def analytics_engine() -> str:
+    return "numpy" if np is not None else "sqlite"
+
+
+def aggregate_movements(
+    conn: sqlite3.Connection,
+    ids: "np.ndarray",
+    *,
+    start_ts: int,
+    end_ts: int,
+    chunk_size: int = ANALYTICS_CHUNK_SIZE,
+) -> ItemAggregates:
+    # Reads the history in chunks of chunk_size rows and folds each chunk into
+    # per-item totals with grouped NumPy reductions, so memory depends on the
+    # chunk and the catalog, not on the length of the history. Every metric is
+    # a sum, minimum or maximum, so the rows need no particular order.
+    count = len(ids)
+    movements = np.zeros(count, dtype=np.int64)
+    consumed_quantity = np.zeros(count)
+    consumed_value = np.zeros(count)
+    received_quantity = np.zeros(count)
+    stock_time = np.zeros(count)
+    first_ts = np.full(count, end_ts, dtype=np.int64)
+    last_exit_ts = np.full(count, HISTORY_START, dtype=np.int64)
+    if count:
+        for chunk in iter_movement_values(conn, end_ts=end_ts, chunk_size=chunk_size):
+            # float64 holds item ids and microsecond timestamps exactly (< 2**53).
+            values = np.fromiter(chain.from_iterable(chunk), dtype=np.float64, count=4 * len(chunk)).reshape(-1, 4)
+            item_ids = values[:, 0].astype(np.int64)
+            position = np.minimum(np.searchsorted(ids, item_ids), count - 1)
+            # Archived movements of deleted items are skipped.
+            known = ids[position] == item_ids
+            position = position[known]
+            ts = values[known, 1].astype(np.int64)
+            quantity = values[known, 2]
+            value = values[known, 3]
+
+            exits = quantity < 0
+            recent = ts >= start_ts
+            recent_exits = recent & exits
+            recent_entries = recent & (quantity > 0)
+            movements += np.bincount(position[recent], minlength=count)
+            consumed_quantity -= np.bincount(position[recent_exits], quantity[recent_exits], minlength=count)
+            consumed_value -= np.bincount(position[recent_exits], value[recent_exits], minlength=count)
+            received_quantity += np.bincount(position[recent_entries], quantity[recent_entries], minlength=count)
+            # Each movement changes the stock from max(ts, start_ts) to end_ts.
+            stock_time += np.bincount(position, quantity * (end_ts - np.maximum(ts, start_ts)), minlength=count)
+            np.minimum.at(first_ts, position, ts)
+            np.maximum.at(last_exit_ts, position[exits], ts[exits])
+    return ItemAggregates(
+        movements, consumed_quantity, consumed_value, received_quantity, stock_time, first_ts, last_exit_ts
+    )
+
+
+def aggregate_movements_sqlite(
+    conn: sqlite3.Connection,
+    ids: List[int],
+    *,
+    start_ts: int,
+    end_ts: int,
+) -> ItemAggregates:
+    by_item = {row["item_id"]: row for row in fetch_movement_aggregates(conn, start_ts=start_ts, end_ts=end_ts)}
+    rows = [by_item.get(item_id) for item_id in ids]
+    return ItemAggregates(
+        [row["movements"] if row else 0 for row in rows],
+        [row["consumed_quantity"] if row else 0.0 for row in rows],
+        [row["consumed_value"] if row else 0.0 for row in rows],
+        [row["received_quantity"] if row else 0.0 for row in rows],
+        [row["stock_time"] if row else 0.0 for row in rows],
+        [row["first_ts"] if row else end_ts for row in rows],
+        [row["last_exit_ts"] if row and row["last_exit_ts"] is not None else HISTORY_START for row in rows],
+    )
+
+
+def _metrics_numpy(
+    aggregates: ItemAggregates,
+    quantity: "np.ndarray",
+    *,
+    start_ts: int,
+    end_ts: int,
+    dead_before: int,
+) -> Dict[str, "np.ndarray"]:
+    # Each item is measured from the later of the window start and its first
+    # movement; NaN marks a metric with nothing to divide by.
+    period = (end_ts - np.maximum(aggregates.first_ts, start_ts)).astype(np.float64)
+    consumed = aggregates.consumed_quantity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_quantity = np.where(period > 0, aggregates.stock_time / period, np.nan)
+        daily = np.where(period > 0, consumed / (period / DAY_US), np.nan)
+        turnover = np.where(average_quantity > 0, consumed / average_quantity, np.nan)
+        days_of_supply = np.where(daily > 0, quantity / daily, np.nan)
+    dead = (quantity > 0) & (aggregates.last_exit_ts < dead_before) & (aggregates.first_ts < dead_before)
+    return {
+        "average_quantity": average_quantity,
+        "average_daily_consumption": daily,
+        "turnover": turnover,
+        "days_of_supply": days_of_supply,
+        "dead_stock": dead,
+    }
+
+
+def _metrics_python(
+    aggregates: ItemAggregates,
+    quantity: List[float],
+    *,
+    start_ts: int,
+    end_ts: int,
+    dead_before: int,
+) -> Dict[str, List[Any]]:
+    metrics: Dict[str, List[Any]] = {
+        "average_quantity": [],
+        "average_daily_consumption": [],
+        "turnover": [],
+        "days_of_supply": [],
+        "dead_stock": [],
+    }
+    nan = math.nan
+    for index, current in enumerate(quantity):
+        first_ts = aggregates.first_ts[index]
+        period = end_ts - max(first_ts, start_ts)
+        consumed = aggregates.consumed_quantity[index]
+        average_quantity = aggregates.stock_time[index] / period if period > 0 else nan
+        daily = consumed / (period / DAY_US) if period > 0 else nan
+        metrics["average_quantity"].append(average_quantity)
+        metrics["average_daily_consumption"].append(daily)
+        metrics["turnover"].append(consumed / average_quantity if average_quantity > 0 else nan)
+        metrics["days_of_supply"].append(current / daily if daily > 0 else nan)
+        metrics["dead_stock"].append(
+            current > 0 and aggregates.last_exit_ts[index] < dead_before and first_ts < dead_before
+        )
+    return metrics
+
+
+# Sort key per order (ascending), with items lacking the metric last.
+SORT_METRICS = {
+    AnalyticsSort.DAYS_OF_SUPPLY: ("days_of_supply", 1),
+    AnalyticsSort.TURNOVER: ("turnover", -1),
+    AnalyticsSort.CONSUMPTION: ("average_daily_consumption", -1),
+}
+
+
+def _order_numpy(ids: "np.ndarray", metrics: Dict[str, "np.ndarray"], sort: AnalyticsSort) -> "np.ndarray":
+    if sort is AnalyticsSort.ID:
+        return np.arange(len(ids))
+    name, direction = SORT_METRICS[sort]
+    key = metrics[name] * direction
+    return np.lexsort((ids, np.where(np.isnan(key), np.inf, key)))
+
+
+def _order_python(ids: List[int], metrics: Dict[str, List[Any]], sort: AnalyticsSort) -> List[int]:
+    if sort is AnalyticsSort.ID:
+        return list(range(len(ids)))
+    name, direction = SORT_METRICS[sort]
+    values = metrics[name]
+
+    def key(index: int) -> tuple:
+        value = values[index]
+        return (math.inf if math.isnan(value) else value * direction, ids[index])
+
+    return sorted(range(len(ids)), key=key)
+
+
+def _optional(value: Any) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class AnalyticsData(NamedTuple):
+    # The loaded history: items (in id order) with their current stock and
+    # the per-item aggregates of their movements.
+    start_ts: int
+    end_ts: int
+    ids: Sequence[int]
+    quantity: Sequence[float]
+    unit_price: Sequence[float]
+    aggregates: ItemAggregates
+
+
+def load_analytics(
+    conn: sqlite3.Connection,
+    *,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    chunk_size: int = ANALYTICS_CHUNK_SIZE,
+) -> AnalyticsData:
+    # Items and movements from the same read snapshot. Movements in
+    # [start_ts, end_ts) are measured, live and archived; the whole history by
+    # default.
+    end_ts = utc_now_us() if end_ts is None else end_ts
+    lower = HISTORY_START if start_ts is None else start_ts
+    conn.execute("BEGIN;")
+    try:
+        stock = fetch_item_stock(conn)
+        item_ids = [row[0] for row in stock]
+        if np is not None:
+            ids = np.array(item_ids, dtype=np.int64)
+            quantity = np.array([row[1] for row in stock], dtype=np.float64)
+            unit_price = np.array([row[2] for row in stock], dtype=np.float64)
+            aggregates = aggregate_movements(conn, ids, start_ts=lower, end_ts=end_ts, chunk_size=chunk_size)
+            return AnalyticsData(lower, end_ts, ids, quantity, unit_price, aggregates)
+        aggregates = aggregate_movements_sqlite(conn, item_ids, start_ts=lower, end_ts=end_ts)
+        return AnalyticsData(
+            lower, end_ts, item_ids, [row[1] for row in stock], [row[2] for row in stock], aggregates
+        )
+    finally:
+        conn.commit()
+
+
+class AnalyticsLoader:
+    # Keeps the last history loaded, so paging through or re-sorting the
+    # report of one revision reads the movements once. Windows ending now
+    # (end_ts None) are keyed by now_bucket(), so an entry does not outlive it.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entry: Optional[Tuple[tuple, AnalyticsData]] = None
+        self.loads = 0
+        self.reuses = 0
+
+    def load(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        revision: int,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        bucket: Optional[int] = None,
+    ) -> AnalyticsData:
+        key = (revision, start_ts, end_ts, bucket)
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] == key:
+                self.reuses += 1
+                return entry[1]
+        data = load_analytics(conn, start_ts=start_ts, end_ts=end_ts)
+        with self._lock:
+            self._entry = (key, data)
+            self.loads += 1
+        return data
+
+
+def summarize_analytics(
+    conn: sqlite3.Connection,
+    data: AnalyticsData,
+    *,
+    dead_stock_days: int = DEFAULT_DEAD_STOCK_DAYS,
+    sort: AnalyticsSort = AnalyticsSort.DAYS_OF_SUPPLY,
+    dead_stock_only: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> AnalyticsResult:
+    # Per item: consumption (exits) in the window, average daily consumption,
+    # time-weighted average stock, turnover (consumption over average stock),
+    # days of supply at the current rate, and dead stock (in stock, without
+    # an exit for dead_stock_days). Names are read for the returned page only.
+    aggregates = data.aggregates
+    dead_before = data.end_ts - dead_stock_days * DAY_US
+    options = {"start_ts": data.start_ts, "end_ts": data.end_ts, "dead_before": dead_before}
+    if np is not None:
+        values = data.quantity * data.unit_price
+        metrics = _metrics_numpy(aggregates, data.quantity, **options)
+        order = _order_numpy(data.ids, metrics, sort)
+        if dead_stock_only:
+            order = order[metrics["dead_stock"][order]]
+        dead_stock_count = int(metrics["dead_stock"].sum())
+        dead_stock_value = float(values[metrics["dead_stock"]].sum())
+        totals = (int(aggregates.movements.sum()), float(values.sum()), float(aggregates.consumed_value.sum()))
+    else:
+        values = [current * price for current, price in zip(data.quantity, data.unit_price)]
+        metrics = _metrics_python(aggregates, data.quantity, **options)
+        order = _order_python(data.ids, metrics, sort)
+        if dead_stock_only:
+            order = [index for index in order if metrics["dead_stock"][index]]
+        dead = [index for index, flag in enumerate(metrics["dead_stock"]) if flag]
+        dead_stock_count = len(dead)
+        dead_stock_value = sum(values[index] for index in dead)
+        totals = (sum(aggregates.movements), sum(values), sum(aggregates.consumed_value))
+
+    end = len(order) if limit is None else offset + limit
+    page = [int(index) for index in order[offset:end]]
+    # An item deleted since the history was loaded drops out of the page.
+    names = {row[0]: row[1:4] for row in fetch_items_by_ids(conn, (int(data.ids[index]) for index in page))}
+    rows: List[Dict[str, Any]] = []
+    for index in page:
+        item_id = int(data.ids[index])
+        if item_id not in names:
+            continue
+        name, category, unit = names[item_id]
+        last_exit_ts = int(aggregates.last_exit_ts[index])
+        rows.append(
+            {
+                "id": item_id,
+                "name": name,
+                "category": category,
+                "unit": unit,
+                "quantity": float(data.quantity[index]),
+                "unit_price": float(data.unit_price[index]),
+                "total_value": float(values[index]),
+                "movements": int(aggregates.movements[index]),
+                "consumed_quantity": float(aggregates.consumed_quantity[index]),
+                "consumed_value": float(aggregates.consumed_value[index]),
+                "received_quantity": float(aggregates.received_quantity[index]),
+                "average_quantity": _optional(metrics["average_quantity"][index]),
+                "average_daily_consumption": _optional(metrics["average_daily_consumption"][index]),
+                "turnover": _optional(metrics["turnover"][index]),
+                "days_of_supply": _optional(metrics["days_of_supply"][index]),
+                "last_exit_at": from_epoch_us(last_exit_ts) if last_exit_ts != HISTORY_START else None,
+                "dead_stock": bool(metrics["dead_stock"][index]),
+            }
+        )
+    movements, inventory_value, consumed_value = totals
+    return AnalyticsResult(
+        engine=analytics_engine(),
+        start_ts=data.start_ts if data.start_ts != HISTORY_START else None,
+        end_ts=data.end_ts,
+        dead_stock_days=dead_stock_days,
+        item_count=len(data.ids),
+        movements=movements,
+        inventory_value=inventory_value,
+        consumed_value=consumed_value,
+        dead_stock_count=dead_stock_count,
+        dead_stock_value=dead_stock_value,
+        rows=rows,
+        next_offset=end if end < len(order) else None,
+    )
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from typing import Callable, NamedTuple, Optional
+
+from .database import (
+    DAY_US,
+    archive_movements_range,
+    fetch_archived_before,
+    immediate_transaction,
+    mark_archived,
+    oldest_movement_ts,
+    rebuild_daily_rollups,
+    utc_now_us,
+)
+
+DEFAULT_RETENTION_DAYS = int(os.environ.get("MRP_ARCHIVE_RETENTION_DAYS", "90"))
+ARCHIVE_BATCH_DAYS = 7
+
+
+class ArchiveResult(NamedTuple):
+    days: int
+    movements: int
+    archived_before: int
+
+
+def archive_cutoff(retention_days: int, *, now_us: Optional[int] = None) -> int:
+    # Only whole UTC days are archived: the cutoff is the start of the oldest
+    # day still inside the retention window.
+    now_us = utc_now_us() if now_us is None else now_us
+    return (now_us // DAY_US - retention_days) * DAY_US
+
+
+def archive_movements(
+    conn: sqlite3.Connection,
+    *,
+    before_ts: int,
+    max_days: Optional[int] = None,
+    batch_days: int = ARCHIVE_BATCH_DAYS,
+    on_batch: Optional[Callable[[int, int, int], None]] = None,
+) -> ArchiveResult:
+    # Archives oldest first, batch_days calendar days per transaction, so the
+    # write lock is only held briefly and an interrupted run resumes where it
+    # stopped. Days already archived are picked up again when late movements
+    # landed in them; their rollups are recomputed from the whole archive.
+    if batch_days < 1:
+        raise ValueError("batch_days must be at least 1")
+    cutoff_day = before_ts // DAY_US
+    days = moved = 0
+    while max_days is None or days < max_days:
+        with immediate_transaction(conn):
+            oldest = oldest_movement_ts(conn, before_ts=cutoff_day * DAY_US)
+            if oldest is None:
+                break
+            first_day = oldest // DAY_US
+            end_day = min(first_day + batch_days, cutoff_day)
+            if max_days is not None:
+                end_day = min(end_day, first_day + max_days - days)
+            count = archive_movements_range(conn, start_ts=first_day * DAY_US, end_ts=end_day * DAY_US)
+            rebuild_daily_rollups(conn, first_day=first_day, last_day=end_day - 1)
+            mark_archived(conn, before_ts=end_day * DAY_US)
+        days += end_day - first_day
+        moved += count
+        if on_batch is not None:
+            on_batch(first_day, end_day, count)
+    return ArchiveResult(days=days, movements=moved, archived_before=fetch_archived_before(conn))
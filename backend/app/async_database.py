@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .database import READ_POOL_SIZE, WRITE_POOL_SIZE, get_connection, immediate_transaction
+from .profiler import attached, current_session
+
+T = TypeVar("T")
+
+EXECUTOR_WORKERS = int(os.environ.get("MRP_DB_EXECUTOR_WORKERS", str(READ_POOL_SIZE + WRITE_POOL_SIZE)))
+EXECUTOR_QUEUE_SIZE = int(os.environ.get("MRP_DB_EXECUTOR_QUEUE", "2048"))
+
+
+class ExecutorBusyError(RuntimeError):
+    pass
+
+
+class DatabaseExecutor:
+    # Runs blocking sqlite work off the event loop on its own threads, so
+    # database calls neither occupy nor wait behind the shared anyio threadpool.
+    # At most queue_size calls may be running or waiting; beyond that callers
+    # are refused instead of piling up unbounded work.
+    def __init__(self, *, max_workers: int = EXECUTOR_WORKERS, queue_size: int = EXECUTOR_QUEUE_SIZE) -> None:
+        if max_workers < 1:
+            raise ValueError("Executor needs at least one worker")
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._peak_pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mrp-db")
+            return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._rejected += 1
+                raise ExecutorBusyError(f"Database executor queue is full ({self.queue_size} pending calls)")
+            self._pending += 1
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+        try:
+            # Like asyncio.to_thread: the call sees the caller's context variables.
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, fn, *args, **kwargs)
+            session = current_session.get()
+            if session is not None:
+                call = functools.partial(attached, session, call)
+            return await asyncio.get_running_loop().run_in_executor(executor, call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+
+database_executor = DatabaseExecutor()
+
+
+def _read_call(fn: Callable[..., T], args: tuple, kwargs: Dict[str, Any]) -> T:
+    with get_connection(readonly=True) as conn:
+        return fn(conn, *args, **kwargs)
+
+
+def _write_call(fn: Callable[..., T], args: tuple, kwargs: Dict[str, Any]) -> T:
+    with get_connection() as conn, immediate_transaction(conn):
+        return fn(conn, *args, **kwargs)
+
+
+async def run_read(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # fn(conn, *args, **kwargs) on a pooled read-only connection.
+    return await database_executor.run(_read_call, fn, args, kwargs)
+
+
+async def run_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # fn(conn, *args, **kwargs) as one immediate transaction, committed when fn
+    # returns and rolled back if it raises.
+    return await database_executor.run(_write_call, fn, args, kwargs)
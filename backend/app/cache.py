@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+DEFAULT_CACHE_ENTRIES = int(os.environ.get("MRP_RESPONSE_CACHE_ENTRIES", "512"))
+DEFAULT_CACHE_BYTES = int(os.environ.get("MRP_RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+MAX_ENTRY_FRACTION = 8
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+
+def make_etag(revision: int, key: Hashable) -> str:
+    return f'"r{revision}-{zlib.crc32(repr(key).encode()):08x}"'
+
+
+def content_etag(body: bytes) -> str:
+    # For responses without a database revision to tag them with.
+    return f'"c{zlib.crc32(body):08x}-{len(body):x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    # LRU of serialized responses tagged with the inventory write revision they
+    # were built from; an entry from an older revision counts as a miss.
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_CACHE_ENTRIES,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, Tuple[int, CachedBody]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def get_or_build(self, key: Hashable, revision: int, build: Callable[[], CachedBody]) -> CachedBody:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == revision:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.stale += 1
+            self.misses += 1
+        cached = build()
+        self.put(key, revision, cached)
+        return cached
+
+    def put(self, key: Hashable, revision: int, cached: CachedBody) -> None:
+        size = len(cached.body)
+        with self._lock:
+            if size > self.max_bytes // MAX_ENTRY_FRACTION:
+                self.uncacheable += 1
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                if previous[0] > revision:
+                    # A slower build from an older revision must not replace a newer entry.
+                    self._entries[key] = previous
+                    return
+                self._bytes -= len(previous[1].body)
+            self._entries[key] = (revision, cached)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable,
+            }
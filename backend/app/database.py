@@ -1,25 +1,388 @@
 from __future__ import annotations
 
+import heapq
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 from pathlib import Path
-from typing import Generator, Iterable, List, Optional
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Tuple
 
-DB_PATH = Path(__file__).resolve().parent.parent / "inventory.db"
-DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+from .metrics import METRICS_ENABLED, timed_query, trace_statement
+
+DB_PATH = Path(os.environ.get("MRP_DB_PATH", Path(__file__).resolve().parent.parent / "inventory.db"))
+
+EPOCH = datetime(1970, 1, 1)
+
+READ_POOL_SIZE = int(os.environ.get("MRP_DB_POOL_SIZE", "8"))
+WRITE_POOL_SIZE = int(os.environ.get("MRP_DB_WRITE_POOL_SIZE", "1"))
+POOL_TIMEOUT = float(os.environ.get("MRP_DB_POOL_TIMEOUT", "30"))
+STREAM_CHUNK_SIZE = 1000
+DAY_US = 86400 * 1_000_000
+MAX_QUERY_PARAMS = 500
+DEFAULT_REORDER_THRESHOLD = 5.0
+# Column order every item read returns (services.serialize_items unpacks it by position).
+ITEM_COLUMNS = "id, name, category, unit, quantity, unit_price, reorder_threshold, low_stock_threshold"
+
+MIGRATION_LOCK_TIMEOUT = float(os.environ.get("MRP_DB_MIGRATION_TIMEOUT", "600"))
+WAL_CHECKPOINT_SECONDS = float(os.environ.get("MRP_WAL_CHECKPOINT_SECONDS", "30"))
+WAL_TRUNCATE_BYTES = int(os.environ.get("MRP_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024)))
+CHANGE_EVENTS_KEPT = 1000
+
+# Applied in order: busy_timeout comes first so that switching a fresh file to
+# WAL waits for a worker that is doing the same instead of failing right away.
+# Every writer checkpoints passively after 1000 WAL pages; readers never
+# block on it, and journal_size_limit shrinks the file once a checkpoint resets it.
+DEFAULT_PRAGMAS: Dict[str, object] = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "wal_autocheckpoint": 1000,
+    "journal_size_limit": WAL_TRUNCATE_BYTES,
+    "cache_size": -16000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+class PoolError(RuntimeError):
+    pass
+
+
+class PoolTimeoutError(PoolError):
+    pass
+
+
+def parse_pragmas(raw: Optional[str]) -> Dict[str, object]:
+    pragmas: Dict[str, object] = dict(DEFAULT_PRAGMAS)
+    if not raw:
+        return pragmas
+    for entry in raw.split(","):
+        if not entry.strip():
+            continue
+        name, sep, value = entry.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid pragma setting: {entry!r}")
+        pragmas[name.strip().lower()] = value.strip()
+    return pragmas
+
+
+PRAGMAS = parse_pragmas(os.environ.get("MRP_DB_PRAGMAS"))
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        size: int,
+        readonly: bool = False,
+        pragmas: Optional[Dict[str, object]] = None,
+        timeout: float = POOL_TIMEOUT,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.path = Path(path)
+        self.size = size
+        self.readonly = readonly
+        self.pid = os.getpid()
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.timeout = timeout
+        # LIFO keeps the most recently used (warmest page cache) connections busy.
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            # journal_mode is persistent and needs write access; let writers own it.
+            if self.readonly and name == "journal_mode":
+                continue
+            conn.execute(f"PRAGMA {name} = {value};").fetchall()
+        if self.readonly:
+            conn.execute("PRAGMA query_only = ON;")
+        if METRICS_ENABLED:
+            conn.set_trace_callback(trace_statement)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._acquire_slow()
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return conn
+
+    def _acquire_slow(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._closed:
+                raise PoolError("Connection pool is closed")
+            create = self._created < self.size
+            if create:
+                self._created += 1
+            else:
+                self._waits += 1
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.timeout}s waiting for a database connection"
+            ) from None
+        finally:
+            with self._lock:
+                self._wait_time += time.perf_counter() - started
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            closed = self._closed
+            if closed:
+                self._created -= 1
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Generator[sqlite3.Connection, None, None]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "pid": self.pid,
+                "readonly": self.readonly,
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "wait_time_seconds": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+                "closed": self._closed,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(*, readonly: bool = False) -> ConnectionPool:
+    key = "read" if readonly else "write"
+    pool = _pools.get(key)
+    if pool is not None and pool.path == Path(DB_PATH) and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid != os.getpid():
+            # Inherited through fork (gunicorn --preload and the like): SQLite
+            # connections must not cross processes, so leave them to the
+            # parent instead of closing them here.
+            pool = None
+        if pool is None or pool.path != Path(DB_PATH):
+            # DB_PATH may be repointed (scripts, benchmarks); drop pools bound to the old file.
+            if pool is not None:
+                pool.close()
+            pool = ConnectionPool(
+                DB_PATH,
+                size=READ_POOL_SIZE if readonly else WRITE_POOL_SIZE,
+                readonly=readonly,
+            )
+            _pools[key] = pool
+        return pool
 
 
 @contextmanager
-def get_connection() -> Generator[sqlite3.Connection, None, None]:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    try:
+def get_connection(*, readonly: bool = False) -> Generator[sqlite3.Connection, None, None]:
+    with get_pool(readonly=readonly).connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats() -> Dict[str, Dict[str, object]]:
+    return {key: pool.stats() for key, pool in _pools.items() if pool.pid == os.getpid()}
+
+
+def wal_size(path: Optional[Path] = None) -> int:
+    try:
+        return os.path.getsize(f"{path or DB_PATH}-wal")
+    except OSError:
+        return 0
+
+
+def checkpoint_wal(conn: sqlite3.Connection, *, mode: str = "PASSIVE") -> Tuple[int, int, int]:
+    # (busy, WAL frames, frames checkpointed); busy is 1 when readers or another
+    # checkpointer kept a RESTART/TRUNCATE from finishing.
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode: {mode!r}")
+    row = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+    return row[0], row[1], row[2]
+
+
+class WalCheckpointer:
+    # Passive autocheckpoints copy pages back but cannot rewind the WAL while
+    # some reader still uses it, which with several busy workers can be never.
+    # Every interval this thread truncates the WAL once it has grown past
+    # WAL_TRUNCATE_BYTES, waiting up to busy_timeout for readers to move on.
+    # Each worker runs one; whichever gets there first does the work.
+    def __init__(self, *, interval: float = WAL_CHECKPOINT_SECONDS, threshold: int = WAL_TRUNCATE_BYTES) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = 0
+        self._busy = 0
+        self._errors = 0
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wal-checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> bool:
+        if wal_size() <= self.threshold:
+            return False
+        with get_connection() as conn:
+            busy, _, _ = checkpoint_wal(conn, mode="TRUNCATE")
+        self._runs += 1
+        self._busy += busy
+        return not busy
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error:
+                self._errors += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "wal_bytes": wal_size(),
+            "truncate_bytes": self.threshold,
+            "interval_seconds": self.interval,
+            "truncations": self._runs,
+            "busy": self._busy,
+            "errors": self._errors,
+        }
+
+
+def to_epoch_us(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_epoch_us(ts: int) -> datetime:
+    return EPOCH + timedelta(microseconds=ts)
+
+
+def utc_now_us() -> int:
+    return time.time_ns() // 1000
 
 
 def create_tables(conn: sqlite3.Connection) -> None:
+    migrate(conn)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, *, target: Optional[int] = None) -> int:
+    target = SCHEMA_VERSION if target is None else target
+    if conn.in_transaction:
+        conn.commit()
+    # Workers started together all land here; the first takes the write lock
+    # and the rest wait for it, for as long as a migration on a big file may
+    # take rather than the request-sized busy_timeout.
+    busy_timeout = conn.execute("PRAGMA busy_timeout;").fetchone()[0]
+    conn.execute(f"PRAGMA busy_timeout = {int(MIGRATION_LOCK_TIMEOUT * 1000)};")
+    try:
+        version = schema_version(conn)
+        while version < target:
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                # Another process may have migrated while we waited for the write lock.
+                version = schema_version(conn)
+                if version >= target:
+                    conn.commit()
+                    break
+                MIGRATIONS[version](conn)
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version};")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {busy_timeout};")
+    return version
+
+
+def _migration_base_schema(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -48,49 +411,856 @@ def create_tables(conn: sqlite3.Connection) -> None:
         );
         """
     )
-    conn.commit()
+    create_inventory_summary(conn)
+
+
+def _migration_epoch_timestamps(conn: sqlite3.Connection) -> None:
+    # Text timestamps ("%Y-%m-%d %H:%M:%S.%f", UTC) become integer epoch
+    # microseconds so (item_id, ts) and (ts) indexes can serve history sorts.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE movements_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            movement_type TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            ts INTEGER NOT NULL,
+            quantity_after REAL NOT NULL,
+            total_value_after REAL NOT NULL,
+            FOREIGN KEY (item_id) REFERENCES items(id)
+        );
+        """
+    )
+    cursor.execute(
+        """
+        INSERT INTO movements_v2 (
+            id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+        )
+        SELECT
+            id,
+            item_id,
+            movement_type,
+            quantity,
+            unit_price,
+            CAST(strftime('%s', timestamp) AS INTEGER) * 1000000
+                + CAST(substr(timestamp || '000000', 21, 6) AS INTEGER),
+            quantity_after,
+            total_value_after
+        FROM movements;
+        """
+    )
+    cursor.execute("DROP TABLE movements;")
+    cursor.execute("ALTER TABLE movements_v2 RENAME TO movements;")
+    cursor.execute("CREATE INDEX idx_movements_item_ts ON movements (item_id, ts);")
+    cursor.execute("CREATE INDEX idx_movements_ts ON movements (ts);")
+
+
+def _migration_write_revision(conn: sqlite3.Connection) -> None:
+    # Every committed change to items bumps a shared revision, so read caches
+    # can be keyed on it and are invalidated by the next write (from any process).
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE inventory_summary ADD COLUMN revision INTEGER NOT NULL DEFAULT 0;")
+    cursor.execute("DROP TRIGGER IF EXISTS items_total_after_insert;")
+    cursor.execute("DROP TRIGGER IF EXISTS items_total_after_update;")
+    cursor.execute("DROP TRIGGER IF EXISTS items_total_after_delete;")
+    cursor.execute(
+        """
+        CREATE TRIGGER items_total_after_insert
+        AFTER INSERT ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value + NEW.quantity * NEW.unit_price,
+                revision = revision + 1
+            WHERE id = 1;
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER items_total_after_update
+        AFTER UPDATE OF quantity, unit_price ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value
+                + NEW.quantity * NEW.unit_price
+                - OLD.quantity * OLD.unit_price,
+                revision = revision + 1
+            WHERE id = 1;
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER items_total_after_delete
+        AFTER DELETE ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value - OLD.quantity * OLD.unit_price,
+                revision = revision + 1
+            WHERE id = 1;
+        END;
+        """
+    )
+
+
+def _migration_items_fts(conn: sqlite3.Connection) -> None:
+    # External-content FTS5 index over items(name, category): the text lives
+    # only in items, the triggers keep the index in step with every write.
+    # remove_diacritics folds "Óleo" and "oleo" to the same token; the prefix
+    # indexes make the short prefixes typed while searching cheap.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE items_fts USING fts5(
+            name,
+            category,
+            content='items',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER items_fts_after_insert
+        AFTER INSERT ON items
+        BEGIN
+            INSERT INTO items_fts (rowid, name, category)
+            VALUES (NEW.id, NEW.name, NEW.category);
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER items_fts_after_delete
+        AFTER DELETE ON items
+        BEGIN
+            INSERT INTO items_fts (items_fts, rowid, name, category)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category);
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER items_fts_after_update
+        AFTER UPDATE OF name, category ON items
+        BEGIN
+            INSERT INTO items_fts (items_fts, rowid, name, category)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category);
+            INSERT INTO items_fts (rowid, name, category)
+            VALUES (NEW.id, NEW.name, NEW.category);
+        END;
+        """
+    )
+    cursor.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild');")
+
+
+def _migration_movement_archive(conn: sqlite3.Connection) -> None:
+    # Movements older than the retention window move (ids kept) to
+    # movements_archive and are summarized per UTC day, per item and for the
+    # whole inventory. archived_before marks the end of the archived range, so
+    # readers only look at the archive and rollups once something was archived.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE movements_archive (
+            id INTEGER PRIMARY KEY,
+            item_id INTEGER NOT NULL,
+            movement_type TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            ts INTEGER NOT NULL,
+            quantity_after REAL NOT NULL,
+            total_value_after REAL NOT NULL
+        );
+        """
+    )
+    cursor.execute("CREATE INDEX idx_movements_archive_item_ts ON movements_archive (item_id, ts);")
+    cursor.execute("CREATE INDEX idx_movements_archive_ts ON movements_archive (ts);")
+    cursor.execute(
+        """
+        CREATE TABLE item_daily_rollups (
+            item_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            open_quantity REAL NOT NULL,
+            close_quantity REAL NOT NULL,
+            in_quantity REAL NOT NULL,
+            out_quantity REAL NOT NULL,
+            close_unit_price REAL NOT NULL,
+            close_value REAL NOT NULL,
+            close_ts INTEGER NOT NULL,
+            movements INTEGER NOT NULL,
+            PRIMARY KEY (item_id, day)
+        ) WITHOUT ROWID;
+        """
+    )
+    cursor.execute("CREATE INDEX idx_item_daily_rollups_day ON item_daily_rollups (day);")
+    cursor.execute(
+        """
+        CREATE TABLE inventory_daily_rollups (
+            day INTEGER PRIMARY KEY,
+            close_total_value REAL NOT NULL,
+            min_total_value REAL NOT NULL,
+            max_total_value REAL NOT NULL,
+            close_ts INTEGER NOT NULL,
+            movements INTEGER NOT NULL
+        );
+        """
+    )
+    cursor.execute("ALTER TABLE inventory_summary ADD COLUMN archived_before INTEGER NOT NULL DEFAULT 0;")
+
+
+def _effective_threshold(row: str) -> str:
+    return f"""COALESCE(
+        {row}.reorder_threshold,
+        (SELECT reorder_threshold FROM category_thresholds WHERE category = {row}.category),
+        {DEFAULT_REORDER_THRESHOLD}
+    )"""
+
+
+def _migration_reorder_thresholds(conn: sqlite3.Connection) -> None:
+    # An item is low on stock below its own reorder_threshold, else its
+    # category's, else the default. Triggers keep the resolved value in
+    # items.low_stock_threshold, so the partial index below only holds the
+    # items currently low on stock, ordered by shortfall.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE category_thresholds (
+            category TEXT PRIMARY KEY,
+            reorder_threshold REAL NOT NULL
+        );
+        """
+    )
+    cursor.execute("ALTER TABLE items ADD COLUMN reorder_threshold REAL;")
+    cursor.execute(
+        f"ALTER TABLE items ADD COLUMN low_stock_threshold REAL NOT NULL DEFAULT {DEFAULT_REORDER_THRESHOLD};"
+    )
+    cursor.execute(
+        """
+        CREATE INDEX idx_items_low_stock ON items (quantity - low_stock_threshold, id)
+        WHERE quantity < low_stock_threshold;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER items_low_stock_after_insert
+        AFTER INSERT ON items
+        WHEN NEW.low_stock_threshold IS NOT {_effective_threshold("NEW")}
+        BEGIN
+            UPDATE items SET low_stock_threshold = {_effective_threshold("NEW")} WHERE id = NEW.id;
+        END;
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER items_low_stock_after_update
+        AFTER UPDATE OF reorder_threshold, category ON items
+        BEGIN
+            UPDATE items SET low_stock_threshold = {_effective_threshold("NEW")} WHERE id = NEW.id;
+            UPDATE inventory_summary SET revision = revision + 1 WHERE id = 1;
+        END;
+        """
+    )
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        threshold = "NEW.reorder_threshold" if row == "NEW" else str(DEFAULT_REORDER_THRESHOLD)
+        cursor.execute(
+            f"""
+            CREATE TRIGGER category_thresholds_after_{event.lower()}
+            AFTER {event} ON category_thresholds
+            BEGIN
+                UPDATE items SET low_stock_threshold = {threshold}
+                WHERE category = {row}.category AND reorder_threshold IS NULL;
+                UPDATE inventory_summary SET revision = revision + 1 WHERE id = 1;
+            END;
+            """
+        )
+
+
+def _migration_change_events(conn: sqlite3.Connection) -> None:
+    # Events that are not movements (item changes, deletes, resyncs), written in
+    # the same transaction as the change. Every worker tails this table and the
+    # movements table to feed its own GET /events subscribers; after_movement_id
+    # places each event among the movements in commit order.
+    conn.execute(
+        """
+        CREATE TABLE change_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,
+            after_movement_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL
+        );
+        """
+    )
 
 
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_epoch_timestamps,
+    _migration_write_revision,
+    _migration_items_fts,
+    _migration_movement_archive,
+    _migration_reorder_thresholds,
+    _migration_change_events,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def create_inventory_summary(conn: sqlite3.Connection) -> None:
+    # Single-row running total kept in sync by triggers, so every writer
+    # (API, CLI, seed) pays O(1) per item change instead of rescanning items.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS inventory_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_value REAL NOT NULL DEFAULT 0.0
+        );
+        """
+    )
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO inventory_summary (id, total_value)
+        SELECT 1, COALESCE(SUM(quantity * unit_price), 0.0) FROM items;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS items_total_after_insert
+        AFTER INSERT ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value + NEW.quantity * NEW.unit_price
+            WHERE id = 1;
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS items_total_after_update
+        AFTER UPDATE OF quantity, unit_price ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value
+                + NEW.quantity * NEW.unit_price
+                - OLD.quantity * OLD.unit_price
+            WHERE id = 1;
+        END;
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS items_total_after_delete
+        AFTER DELETE ON items
+        BEGIN
+            UPDATE inventory_summary
+            SET total_value = total_value - OLD.quantity * OLD.unit_price
+            WHERE id = 1;
+        END;
+        """
+    )
+
+
+@timed_query
 def calculate_total_inventory(conn: sqlite3.Connection) -> float:
+    return round(fetch_total_inventory(conn), 2)
+
+
+@timed_query
+def fetch_total_inventory(conn: sqlite3.Connection) -> float:
+    cursor = conn.cursor()
+    cursor.execute("SELECT total_value FROM inventory_summary WHERE id = 1;")
+    row = cursor.fetchone()
+    if row is None:
+        return recalculate_total_inventory(conn)
+    return row["total_value"]
+
+
+@timed_query
+def recalculate_total_inventory(conn: sqlite3.Connection) -> float:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(SUM(quantity * unit_price), 0.0) AS total FROM items;")
+    return round(cursor.fetchone()["total"], 2)
+
+
+@timed_query
+def rebuild_total_inventory(conn: sqlite3.Connection) -> float:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO inventory_summary (id, total_value)
+        SELECT 1, COALESCE(SUM(quantity * unit_price), 0.0) FROM items
+        WHERE true
+        ON CONFLICT (id) DO UPDATE SET total_value = excluded.total_value;
+        """
+    )
+    return calculate_total_inventory(conn)
+
+
+def check_total_inventory(conn: sqlite3.Connection) -> tuple[float, float]:
+    return calculate_total_inventory(conn), recalculate_total_inventory(conn)
+
+
+@timed_query
+def fetch_revision(conn: sqlite3.Connection) -> int:
     cursor = conn.cursor()
-    cursor.execute("SELECT quantity, unit_price FROM items;")
-    total = 0.0
-    for row in cursor.fetchall():
-        quantity = row["quantity"] or 0.0
-        unit_price = row["unit_price"] or 0.0
-        total += quantity * unit_price
-    return round(total, 2)
+    cursor.execute("SELECT revision FROM inventory_summary WHERE id = 1;")
+    row = cursor.fetchone()
+    return row["revision"] if row is not None else 0
+
 
+@timed_query
+def fetch_archived_before(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT archived_before FROM inventory_summary WHERE id = 1;").fetchone()
+    return row[0] if row is not None else 0
 
+
+@timed_query
+def oldest_movement_ts(conn: sqlite3.Connection, *, before_ts: int) -> Optional[int]:
+    return conn.execute("SELECT MIN(ts) FROM movements WHERE ts < ?;", (before_ts,)).fetchone()[0]
+
+
+@timed_query
+def archive_movements_range(conn: sqlite3.Connection, *, start_ts: int, end_ts: int) -> int:
+    # Moves movements with start_ts <= ts < end_ts to movements_archive; must
+    # run inside a write transaction.
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO movements_archive (
+            id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+        )
+        SELECT id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+        FROM movements
+        WHERE ts >= ? AND ts < ?;
+        """,
+        (start_ts, end_ts),
+    )
+    cursor.execute("DELETE FROM movements WHERE ts >= ? AND ts < ?;", (start_ts, end_ts))
+    return cursor.rowcount
+
+
+@timed_query
+def rebuild_daily_rollups(conn: sqlite3.Connection, *, first_day: int, last_day: int) -> None:
+    # Recomputes the rollups of days first_day..last_day from the archived rows,
+    # so re-archiving a day (late movements) replaces its rollups.
+    cursor = conn.cursor()
+    start_ts, end_ts = first_day * DAY_US, (last_day + 1) * DAY_US
+    cursor.execute("DELETE FROM item_daily_rollups WHERE day BETWEEN ? AND ?;", (first_day, last_day))
+    cursor.execute("DELETE FROM inventory_daily_rollups WHERE day BETWEEN ? AND ?;", (first_day, last_day))
+    cursor.execute(
+        """
+        INSERT INTO item_daily_rollups (
+            item_id, day, open_quantity, close_quantity, in_quantity, out_quantity,
+            close_unit_price, close_value, close_ts, movements
+        )
+        SELECT
+            item_id,
+            day,
+            SUM(CASE WHEN first_rank = 1 THEN
+                quantity_after - CASE movement_type WHEN 'exit' THEN -quantity ELSE quantity END
+            END),
+            SUM(CASE WHEN last_rank = 1 THEN quantity_after END),
+            SUM(CASE WHEN movement_type != 'exit' THEN quantity ELSE 0 END),
+            SUM(CASE WHEN movement_type = 'exit' THEN quantity ELSE 0 END),
+            SUM(CASE WHEN last_rank = 1 THEN unit_price END),
+            SUM(CASE WHEN last_rank = 1 THEN quantity_after * unit_price END),
+            MAX(ts),
+            COUNT(*)
+        FROM (
+            SELECT
+                item_id,
+                ts / ? AS day,
+                ts,
+                movement_type,
+                quantity,
+                unit_price,
+                quantity_after,
+                ROW_NUMBER() OVER (PARTITION BY item_id, ts / ? ORDER BY ts, id) AS first_rank,
+                ROW_NUMBER() OVER (PARTITION BY item_id, ts / ? ORDER BY ts DESC, id DESC) AS last_rank
+            FROM movements_archive
+            WHERE ts >= ? AND ts < ?
+        )
+        GROUP BY item_id, day;
+        """,
+        (DAY_US, DAY_US, DAY_US, start_ts, end_ts),
+    )
+    cursor.execute(
+        """
+        INSERT INTO inventory_daily_rollups (
+            day, close_total_value, min_total_value, max_total_value, close_ts, movements
+        )
+        SELECT day, total_value_after, min_total_value, max_total_value, ts, movements
+        FROM (
+            SELECT
+                ts / ? AS day,
+                ts,
+                total_value_after,
+                ROW_NUMBER() OVER (PARTITION BY ts / ? ORDER BY ts DESC, id DESC) AS last_rank,
+                MIN(total_value_after) OVER (PARTITION BY ts / ?) AS min_total_value,
+                MAX(total_value_after) OVER (PARTITION BY ts / ?) AS max_total_value,
+                COUNT(*) OVER (PARTITION BY ts / ?) AS movements
+            FROM movements_archive
+            WHERE ts >= ? AND ts < ?
+        )
+        WHERE last_rank = 1;
+        """,
+        (DAY_US, DAY_US, DAY_US, DAY_US, DAY_US, start_ts, end_ts),
+    )
+
+
+@timed_query
+def mark_archived(conn: sqlite3.Connection, *, before_ts: int) -> None:
+    # Archiving changes what the history endpoints return, so it bumps the
+    # revision like any item write (movement inserts alone do not).
+    conn.execute(
+        """
+        UPDATE inventory_summary
+        SET archived_before = MAX(archived_before, ?),
+            revision = revision + 1
+        WHERE id = 1;
+        """,
+        (before_ts,),
+    )
+
+
+@timed_query
+def fetch_category_summary(conn: sqlite3.Connection, *, as_of: Optional[int] = None) -> Iterable[sqlite3.Row]:
+    source, params = "items", ()
+    if as_of is not None:
+        source, params = _items_as_of_query(as_of=as_of)
+        source = f"({source})"
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT
+            category,
+            COUNT(*) AS item_count,
+            SUM(quantity) AS total_quantity,
+            SUM(quantity * unit_price) AS total_value,
+            SUM(quantity < low_stock_threshold) AS low_stock_count
+        FROM {source}
+        GROUP BY category
+        ORDER BY total_value DESC, category;
+        """,
+        params,
+    )
+    return cursor.fetchall()
+
+
+@timed_query
+def fetch_top_items_by_value(conn: sqlite3.Connection, *, limit: int) -> Iterable[sqlite3.Row]:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT id, name, category, unit, quantity, unit_price, reorder_threshold, low_stock_threshold
+        FROM items
+        ORDER BY quantity * unit_price DESC, id
+        LIMIT ?;
+        """,
+        (limit,),
+    )
+    return cursor.fetchall()
+
+
+# Ranked by value with ties in id order. The cumulative share is the running
+# value divided once by the total: summing per-item shares drifts
+# (0.8 + 0.15 > 0.95) and moves items across a class boundary.
+_ABC_RANKED_CTE = """
+    WITH valued AS (
+        SELECT
+            id,
+            name,
+            category,
+            unit,
+            quantity,
+            unit_price,
+            reorder_threshold,
+            low_stock_threshold,
+            quantity * unit_price AS total_value
+        FROM items
+    ),
+    totals AS (
+        SELECT SUM(total_value) AS grand_total FROM valued
+    ),
+    ranked AS (
+        SELECT
+            valued.*,
+            ROW_NUMBER() OVER ranking AS rank,
+            valued.total_value / totals.grand_total AS contribution,
+            SUM(valued.total_value) OVER (ranking ROWS UNBOUNDED PRECEDING) / totals.grand_total AS cumulative
+        FROM valued, totals
+        WHERE totals.grand_total > 0
+        WINDOW ranking AS (ORDER BY valued.total_value DESC, valued.id)
+    ),
+    classified AS (
+        SELECT
+            ranked.*,
+            CASE WHEN cumulative <= ? THEN 'A' WHEN cumulative <= ? THEN 'B' ELSE 'C' END AS abc_class
+        FROM ranked
+    )
+"""
+
+
+@timed_query
+def fetch_abc_summary(conn: sqlite3.Connection, *, a: float, b: float) -> Iterable[sqlite3.Row]:
+    cursor = conn.cursor()
+    cursor.execute(
+        _ABC_RANKED_CTE
+        + """
+        SELECT abc_class, COUNT(*) AS item_count, SUM(contribution) AS share, SUM(total_value) AS total_value
+        FROM classified
+        GROUP BY abc_class
+        ORDER BY abc_class;
+        """,
+        (a, b),
+    )
+    return cursor.fetchall()
+
+
+@timed_query
+def fetch_abc_rows(
+    conn: sqlite3.Connection,
+    *,
+    a: float,
+    b: float,
+    offset: int = 0,
+    limit: int,
+) -> Iterable[sqlite3.Row]:
+    cursor = conn.cursor()
+    cursor.execute(
+        _ABC_RANKED_CTE
+        + """
+        SELECT
+            id,
+            name,
+            category,
+            unit,
+            quantity,
+            unit_price,
+            reorder_threshold,
+            low_stock_threshold,
+            rank,
+            contribution,
+            cumulative,
+            abc_class
+        FROM classified
+        WHERE rank > ?
+        ORDER BY rank
+        LIMIT ?;
+        """,
+        (a, b, offset, limit),
+    )
+    return cursor.fetchall()
+
+
+@timed_query
 def fetch_item(conn: sqlite3.Connection, item_id: int) -> Optional[sqlite3.Row]:
     cursor = conn.cursor()
     cursor.execute(
-        "SELECT id, name, category, unit, quantity, unit_price FROM items WHERE id = ?;",
+        f"SELECT {ITEM_COLUMNS} FROM items WHERE id = ?;",
         (item_id,),
     )
     return cursor.fetchone()
 
 
-def fetch_all_items(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
+@timed_query
+def fetch_items_by_ids(conn: sqlite3.Connection, item_ids: Iterable[int]) -> List[sqlite3.Row]:
+    ids = list(dict.fromkeys(item_ids))
+    rows: List[sqlite3.Row] = []
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, category, unit, quantity, unit_price FROM items ORDER BY id;")
+    for start in range(0, len(ids), MAX_QUERY_PARAMS):
+        chunk = ids[start : start + MAX_QUERY_PARAMS]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            f"SELECT {ITEM_COLUMNS} FROM items WHERE id IN ({placeholders});",
+            chunk,
+        )
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+@timed_query
+def fetch_item_stock(conn: sqlite3.Connection) -> List[Tuple[int, float, float]]:
+    cursor = row_cursor(conn, raw=True)
+    cursor.execute("SELECT id, quantity, unit_price FROM items ORDER BY id;")
+    return cursor.fetchall()
+
+
+@timed_query
+def fetch_category_items(conn: sqlite3.Connection, category: str, *, raw: bool = False) -> List[sqlite3.Row]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(f"SELECT {ITEM_COLUMNS} FROM items WHERE category = ? ORDER BY id;", (category,))
+    return cursor.fetchall()
+
+
+@timed_query
+def fetch_all_items(
+    conn: sqlite3.Connection,
+    *,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    as_of: Optional[int] = None,
+    raw: bool = False,
+) -> Iterable[sqlite3.Row]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(*_items_page_query(after_id=after_id, limit=limit, as_of=as_of))
     return cursor.fetchall()
 
 
-def search_items(conn: sqlite3.Connection, pattern: str) -> Iterable[sqlite3.Row]:
+def iter_items(
+    conn: sqlite3.Connection,
+    *,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    as_of: Optional[int] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    raw: bool = False,
+) -> Iterator[List[sqlite3.Row]]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(*_items_page_query(after_id=after_id, limit=limit, as_of=as_of))
+    return iter_chunks(cursor, chunk_size)
+
+
+def _items_page_query(
+    *,
+    after_id: Optional[int],
+    limit: Optional[int],
+    as_of: Optional[int] = None,
+) -> Tuple[str, Tuple[object, ...]]:
+    if as_of is not None:
+        query, as_of_params = _items_as_of_query(as_of=as_of, after_id=after_id)
+        params: List[object] = list(as_of_params)
+        query += " ORDER BY last.item_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, tuple(params)
+    query = f"SELECT {ITEM_COLUMNS} FROM items"
+    params = []
+    if after_id is not None:
+        query += " WHERE id > ?"
+        params.append(after_id)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, tuple(params)
+
+
+def _items_as_of_query(*, as_of: int, after_id: Optional[int] = None) -> Tuple[str, Tuple[object, ...]]:
+    # Items as they stood at as_of, with the same columns as the items table
+    # (thresholds are the current ones).
+    # Every movement records quantity_after and unit_price, so each one is a
+    # checkpoint: an item's state is its last movement with ts <= as_of, one
+    # (item_id, ts) index seek per table. The cost grows with the catalog, not
+    # the history. Items without a movement by then did not exist yet.
+    newest_live = "a.id IS NULL OR (m.id IS NOT NULL AND (m.ts, m.id) > (a.ts, a.id))"
+    params: List[object] = [as_of, as_of]
+    item_filter = ""
+    if after_id is not None:
+        item_filter = "WHERE items.id > ?"
+        params.append(after_id)
+    query = f"""
+        SELECT
+            last.item_id AS id,
+            items.name,
+            items.category,
+            items.unit,
+            CASE WHEN {newest_live} THEN m.quantity_after ELSE a.quantity_after END AS quantity,
+            CASE WHEN {newest_live} THEN m.unit_price ELSE a.unit_price END AS unit_price,
+            items.reorder_threshold,
+            items.low_stock_threshold
+        FROM (
+            SELECT
+                items.id AS item_id,
+                (
+                    SELECT id FROM movements
+                    WHERE item_id = items.id AND ts <= ?
+                    ORDER BY ts DESC, id DESC LIMIT 1
+                ) AS live_id,
+                (
+                    SELECT id FROM movements_archive
+                    WHERE item_id = items.id AND ts <= ?
+                    ORDER BY ts DESC, id DESC LIMIT 1
+                ) AS archive_id
+            FROM items
+            {item_filter}
+        ) AS last
+        JOIN items ON items.id = last.item_id
+        LEFT JOIN movements AS m ON m.id = last.live_id
+        LEFT JOIN movements_archive AS a ON a.id = last.archive_id
+        WHERE m.id IS NOT NULL OR a.id IS NOT NULL
+    """
+    return query, tuple(params)
+
+
+def row_cursor(conn: sqlite3.Connection, *, raw: bool = False) -> sqlite3.Cursor:
+    # raw cursors yield plain tuples, skipping sqlite3.Row construction for
+    # bulk serialization paths that address columns by position.
     cursor = conn.cursor()
+    if raw:
+        cursor.row_factory = None
+    return cursor
+
+
+def iter_chunks(cursor: sqlite3.Cursor, chunk_size: int) -> Iterator[List[sqlite3.Row]]:
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def build_search_query(term: str) -> Optional[str]:
+    # Each word becomes a quoted prefix query ("oleo"* "lub"*), all of which must
+    # match; quoting keeps user input from being parsed as FTS5 syntax.
+    tokens = re.findall(r"\w+", term)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+@timed_query
+def search_items(
+    conn: sqlite3.Connection,
+    term: str,
+    *,
+    limit: int,
+    raw: bool = False,
+) -> List[sqlite3.Row]:
+    query = build_search_query(term)
+    if query is None:
+        return []
+    cursor = row_cursor(conn, raw=raw)
+    # bm25 weights: a hit in the name counts more than one in the category.
     cursor.execute(
         """
-        SELECT id, name, category, unit, quantity, unit_price
-        FROM items
-        WHERE name LIKE ? OR category LIKE ?
-        ORDER BY name;
+        SELECT
+            items.id,
+            items.name,
+            items.category,
+            items.unit,
+            items.quantity,
+            items.unit_price,
+            items.reorder_threshold,
+            items.low_stock_threshold
+        FROM items_fts
+        JOIN items ON items.id = items_fts.rowid
+        WHERE items_fts MATCH ?
+        ORDER BY bm25(items_fts, 10.0, 1.0), items.id
+        LIMIT ?;
         """,
-        (pattern, pattern),
+        (query, limit),
     )
     return cursor.fetchall()
 
 
+@timed_query
 def insert_item(
     conn: sqlite3.Connection,
     *,
@@ -99,18 +1269,88 @@ def insert_item(
     unit: str,
     quantity: float,
     unit_price: float,
+    reorder_threshold: Optional[float] = None,
 ) -> int:
     cursor = conn.cursor()
     cursor.execute(
         """
-        INSERT INTO items (name, category, unit, quantity, unit_price)
-        VALUES (?, ?, ?, ?, ?);
+        INSERT INTO items (name, category, unit, quantity, unit_price, reorder_threshold)
+        VALUES (?, ?, ?, ?, ?, ?);
         """,
-        (name, category, unit, quantity, unit_price),
+        (name, category, unit, quantity, unit_price, reorder_threshold),
     )
     return cursor.lastrowid
 
 
+@timed_query
+def set_item_reorder_threshold(
+    conn: sqlite3.Connection,
+    item_id: int,
+    reorder_threshold: Optional[float],
+) -> bool:
+    # None falls back to the category (or default) threshold.
+    cursor = conn.cursor()
+    cursor.execute("UPDATE items SET reorder_threshold = ? WHERE id = ?;", (reorder_threshold, item_id))
+    return cursor.rowcount > 0
+
+
+@timed_query
+def fetch_category_thresholds(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+    cursor = conn.cursor()
+    cursor.execute("SELECT category, reorder_threshold FROM category_thresholds ORDER BY category;")
+    return cursor.fetchall()
+
+
+@timed_query
+def set_category_reorder_threshold(
+    conn: sqlite3.Connection,
+    category: str,
+    reorder_threshold: Optional[float],
+) -> None:
+    # None removes the category default; the triggers re-resolve the
+    # effective threshold of the category's items without an override.
+    cursor = conn.cursor()
+    if reorder_threshold is None:
+        cursor.execute("DELETE FROM category_thresholds WHERE category = ?;", (category,))
+        return
+    cursor.execute(
+        """
+        INSERT INTO category_thresholds (category, reorder_threshold) VALUES (?, ?)
+        ON CONFLICT (category) DO UPDATE SET reorder_threshold = excluded.reorder_threshold;
+        """,
+        (category, reorder_threshold),
+    )
+
+
+@timed_query
+def fetch_low_stock_items(
+    conn: sqlite3.Connection,
+    *,
+    order_by_shortfall: bool = True,
+    offset: int = 0,
+    limit: int,
+    raw: bool = False,
+) -> List[sqlite3.Row]:
+    # Only the rows of idx_items_low_stock (items currently low on stock) are
+    # read: by shortfall they come out of the index already sorted, by id
+    # just those rows are sorted. INDEXED BY keeps the planner from walking
+    # the whole catalog in id order instead.
+    order = "quantity - low_stock_threshold, id" if order_by_shortfall else "id"
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(
+        f"""
+        SELECT {ITEM_COLUMNS}
+        FROM items INDEXED BY idx_items_low_stock
+        WHERE quantity < low_stock_threshold
+        ORDER BY {order}
+        LIMIT ? OFFSET ?;
+        """,
+        (limit, offset),
+    )
+    return cursor.fetchall()
+
+
+@timed_query
 def update_item_record(
     conn: sqlite3.Connection,
     *,
@@ -125,12 +1365,55 @@ def update_item_record(
     )
 
 
+@timed_query
+def apply_stock_change(
+    conn: sqlite3.Connection,
+    *,
+    item_id: int,
+    delta: float,
+    unit_price: Optional[float] = None,
+    min_quantity: Optional[float] = None,
+) -> Optional[sqlite3.Row]:
+    # Check and write in one statement, so no other writer can slip in between
+    # reading the stock and updating it. Returns None when the item is missing
+    # or holds less than min_quantity.
+    query = (
+        "UPDATE items SET quantity = COALESCE(quantity, 0) + ?, "
+        "unit_price = COALESCE(?, unit_price, 0) WHERE id = ?"
+    )
+    params: List[object] = [delta, unit_price, item_id]
+    if min_quantity is not None:
+        query += " AND COALESCE(quantity, 0) >= ?"
+        params.append(min_quantity)
+    query += " RETURNING quantity, unit_price;"
+    rows = conn.execute(query, params).fetchall()
+    return rows[0] if rows else None
+
+
+@timed_query
+def update_item_records(
+    conn: sqlite3.Connection,
+    records: Iterable[Tuple[int, float, float]],
+) -> None:
+    cursor = conn.cursor()
+    cursor.executemany(
+        "UPDATE items SET quantity = ?, unit_price = ? WHERE id = ?;",
+        ((quantity, unit_price, item_id) for item_id, quantity, unit_price in records),
+    )
+
+
+@timed_query
 def delete_item(conn: sqlite3.Connection, item_id: int) -> None:
     cursor = conn.cursor()
     cursor.execute("DELETE FROM movements WHERE item_id = ?;", (item_id,))
+    cursor.execute("DELETE FROM movements_archive WHERE item_id = ?;", (item_id,))
+    cursor.execute("DELETE FROM item_daily_rollups WHERE item_id = ?;", (item_id,))
     cursor.execute("DELETE FROM items WHERE id = ?;", (item_id,))
+    # Here rather than in the endpoint so deletes from the CLI reach the feed too.
+    insert_change_event(conn, "item_deleted", b'{"id":%d}' % item_id)
 
 
+@timed_query
 def insert_movement(
     conn: sqlite3.Connection,
     *,
@@ -138,7 +1421,7 @@ def insert_movement(
     movement_type: str,
     quantity: float,
     unit_price: float,
-    timestamp: str,
+    ts: int,
     quantity_after: float,
     total_value_after: float,
 ) -> int:
@@ -153,7 +1436,7 @@ def insert_movement(
             movement_type,
             quantity,
             unit_price,
-            timestamp,
+            ts,
             quantity_after,
             total_value_after
         )
@@ -164,7 +1447,7 @@ def insert_movement(
             movement_type,
             quantity,
             unit_price,
-            timestamp,
+            ts,
             quantity_after,
             total_value_after,
         ),
@@ -172,63 +1455,548 @@ def insert_movement(
     return cursor.lastrowid
 
 
+def next_autoincrement_id(conn: sqlite3.Connection, table: str) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?;", (table,))
+    row = cursor.fetchone()
+    return (row[0] if row is not None else 0) + 1
+
+
+@timed_query
+def insert_items(
+    conn: sqlite3.Connection,
+    records: List[Tuple[str, str, str, float, float, Optional[float]]],
+) -> List[int]:
+    # records: (name, category, unit, quantity, unit_price, reorder_threshold); same id
+    # contract as insert_movements.
+    if not records:
+        return []
+    cursor = conn.cursor()
+    first_id = next_autoincrement_id(conn, "items")
+    cursor.executemany(
+        """
+        INSERT INTO items (name, category, unit, quantity, unit_price, reorder_threshold)
+        VALUES (?, ?, ?, ?, ?, ?);
+        """,
+        records,
+    )
+    return list(range(first_id, first_id + len(records)))
+
+
+@timed_query
+def insert_movements(
+    conn: sqlite3.Connection,
+    records: List[Tuple[int, str, float, float, int, float, float]],
+) -> List[int]:
+    # records: (item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after).
+    # Must run inside a write transaction: AUTOINCREMENT ids are then contiguous
+    # after the current sqlite_sequence value, so executemany needs no per-row lastrowid.
+    if not records:
+        return []
+    cursor = conn.cursor()
+    first_id = next_autoincrement_id(conn, "movements")
+    cursor.executemany(
+        """
+        INSERT INTO movements (
+            item_id,
+            movement_type,
+            quantity,
+            unit_price,
+            ts,
+            quantity_after,
+            total_value_after
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?);
+        """,
+        (
+            (
+                item_id,
+                movement_type,
+                quantity,
+                round(unit_price, 4),
+                ts,
+                quantity_after,
+                round(total_value_after, 2),
+            )
+            for item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after in records
+        ),
+    )
+    return list(range(first_id, first_id + len(records)))
+
+
+@contextmanager
+def immediate_transaction(conn: sqlite3.Connection) -> Generator[sqlite3.Connection, None, None]:
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+@timed_query
 def list_movements_rows(
     conn: sqlite3.Connection,
     *,
     item_id: Optional[int] = None,
     limit: Optional[int] = None,
+    before_ts: Optional[int] = None,
+    before_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+    raw: bool = False,
 ) -> Iterable[sqlite3.Row]:
-    cursor = conn.cursor()
-    query = (
-        "SELECT id, item_id, movement_type, quantity, unit_price, timestamp, quantity_after, total_value_after "
-        "FROM movements"
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(
+        *_movements_page_query(
+            item_id=item_id,
+            limit=limit,
+            before_ts=before_ts,
+            before_id=before_id,
+            since_id=since_id,
+            include_archive=fetch_archived_before(conn) > 0,
+        )
     )
+    return cursor.fetchall()
+
+
+def iter_movements_rows(
+    conn: sqlite3.Connection,
+    *,
+    item_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    before_ts: Optional[int] = None,
+    before_id: Optional[int] = None,
+    since_id: Optional[int] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    raw: bool = False,
+) -> Iterator[List[sqlite3.Row]]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(
+        *_movements_page_query(
+            item_id=item_id,
+            limit=limit,
+            before_ts=before_ts,
+            before_id=before_id,
+            since_id=since_id,
+            include_archive=fetch_archived_before(conn) > 0,
+        )
+    )
+    return iter_chunks(cursor, chunk_size)
+
+
+def _movements_page_query(
+    *,
+    item_id: Optional[int],
+    limit: Optional[int],
+    before_ts: Optional[int],
+    before_id: Optional[int],
+    since_id: Optional[int] = None,
+    include_archive: bool = False,
+) -> Tuple[str, Tuple[object, ...]]:
+    columns = "id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after"
+    conditions: List[str] = []
     params: List[object] = []
     if item_id is not None:
-        query += " WHERE item_id = ?"
+        conditions.append("item_id = ?")
         params.append(item_id)
-    query += " ORDER BY datetime(timestamp) DESC"
+    if before_ts is not None:
+        # Keyset on (ts, id) descending; before_id breaks ties within the same microsecond.
+        if before_id is not None:
+            conditions.append("(ts, id) < (?, ?)")
+            params.extend((before_ts, before_id))
+        else:
+            conditions.append("ts < ?")
+            params.append(before_ts)
+    if since_id is not None:
+        # Change feed resume: everything committed after a known movement id,
+        # oldest first, walking the rowid of each table.
+        conditions.append("id > ?")
+        params.append(since_id)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = f"SELECT {columns} FROM movements{where}"
+    if include_archive:
+        # Both arms walk their (ts) / (item_id, ts) index in order and SQLite
+        # merges them, so paging across the archive boundary needs no sort.
+        query += f" UNION ALL SELECT {columns} FROM movements_archive{where}"
+        params *= 2
+    query += " ORDER BY id" if since_id is not None else " ORDER BY ts DESC, id DESC"
     if limit is not None:
         query += " LIMIT ?"
         params.append(limit)
-    cursor.execute(query, tuple(params))
-    return cursor.fetchall()
+    return query, tuple(params)
+
+
+@timed_query
+def fetch_last_movement_id(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        """
+        SELECT MAX(
+            COALESCE((SELECT MAX(id) FROM movements), 0),
+            COALESCE((SELECT MAX(id) FROM movements_archive), 0)
+        );
+        """
+    ).fetchone()
+    return row[0]
+
+
+def insert_change_event(conn: sqlite3.Connection, event: str, data: bytes) -> int:
+    # data is the encoded JSON payload; only the last CHANGE_EVENTS_KEPT rows
+    # are kept, far more than a feed polling every few hundred ms falls behind.
+    cursor = conn.execute(
+        "INSERT INTO change_events (event, data, after_movement_id, ts) VALUES (?, ?, ?, ?);",
+        (event, data.decode(), next_autoincrement_id(conn, "movements") - 1, utc_now_us()),
+    )
+    event_id = cursor.lastrowid
+    conn.execute("DELETE FROM change_events WHERE id <= ?;", (event_id - CHANGE_EVENTS_KEPT,))
+    return event_id
 
 
+@timed_query
+def fetch_change_watermarks(conn: sqlite3.Connection) -> Tuple[int, int]:
+    # (last movement id, last change event id) as of one snapshot.
+    row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_events;").fetchone()
+    return fetch_last_movement_id(conn), row[0]
+
+
+@timed_query
+def fetch_changes_since(
+    conn: sqlite3.Connection,
+    *,
+    movement_id: int,
+    change_id: int,
+    limit: int,
+) -> Tuple[List[tuple], List[tuple]]:
+    # Both lists in id order and at most limit long, read in one snapshot.
+    conn.execute("BEGIN;")
+    try:
+        changes = conn.execute(
+            "SELECT id, event, data, after_movement_id FROM change_events WHERE id > ? ORDER BY id LIMIT ?;",
+            (change_id, limit),
+        ).fetchall()
+        movements = list_movements_rows(conn, since_id=movement_id, limit=limit, raw=True)
+    finally:
+        conn.commit()
+    return [tuple(row) for row in changes], movements
+
+
+@timed_query
 def fetch_movement_by_id(conn: sqlite3.Connection, movement_id: int) -> Optional[sqlite3.Row]:
     cursor = conn.cursor()
     cursor.execute(
         """
-        SELECT id, item_id, movement_type, quantity, unit_price, timestamp, quantity_after, total_value_after
+        SELECT id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
         FROM movements
+        WHERE id = ?
+        UNION ALL
+        SELECT id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+        FROM movements_archive
         WHERE id = ?;
         """,
-        (movement_id,),
+        (movement_id, movement_id),
     )
     return cursor.fetchone()
 
 
-def fetch_inventory_series(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT timestamp, total_value_after
-        FROM movements
-        ORDER BY datetime(timestamp);
-        """
+def _movement_values_query(end: str = "?") -> str:
+    # Every movement before end from both tables as (item_id, ts, signed
+    # quantity, signed value), exits negative. NOT INDEXED: the whole history
+    # is read, and a plain table scan beats walking the ts index.
+    signed = "CASE movement_type WHEN 'exit' THEN -quantity ELSE quantity END"
+    return " UNION ALL ".join(
+        f"SELECT item_id, ts, {signed} AS quantity, {signed} * unit_price AS value "
+        f"FROM {table} NOT INDEXED WHERE ts < {end}"
+        for table in ("movements_archive", "movements")
     )
-    return cursor.fetchall()
 
 
-def fetch_item_series(conn: sqlite3.Connection, item_id: int) -> Iterable[sqlite3.Row]:
+def iter_movement_values(
+    conn: sqlite3.Connection,
+    *,
+    end_ts: int,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[List[Tuple[int, int, float, float]]]:
+    # Unordered: the analytics only need sums, minimums and maximums.
+    cursor = row_cursor(conn, raw=True)
+    cursor.execute(_movement_values_query(), (end_ts, end_ts))
+    return iter_chunks(cursor, chunk_size)
+
+
+@timed_query
+def fetch_movement_aggregates(conn: sqlite3.Connection, *, start_ts: int, end_ts: int) -> List[sqlite3.Row]:
+    # What app.analytics computes with NumPy, as one GROUP BY. stock_time is
+    # the integral of the quantity over [max(ts, start_ts), end_ts): each
+    # movement changes the stock from its ts on.
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT timestamp, quantity_after
-        FROM movements
-        WHERE item_id = ?
-        ORDER BY datetime(timestamp);
+        f"""
+        SELECT
+            item_id,
+            SUM(ts >= :start) AS movements,
+            SUM(CASE WHEN quantity < 0 AND ts >= :start THEN -quantity ELSE 0 END) AS consumed_quantity,
+            SUM(CASE WHEN quantity < 0 AND ts >= :start THEN -value ELSE 0 END) AS consumed_value,
+            SUM(CASE WHEN quantity > 0 AND ts >= :start THEN quantity ELSE 0 END) AS received_quantity,
+            SUM(quantity * (:end - MAX(ts, :start))) AS stock_time,
+            MIN(ts) AS first_ts,
+            MAX(CASE WHEN quantity < 0 THEN ts END) AS last_exit_ts
+        FROM ({_movement_values_query(":end")})
+        GROUP BY item_id;
         """,
-        (item_id,),
+        {"start": start_ts, "end": end_ts},
     )
     return cursor.fetchall()
+
+
+@timed_query
+def fetch_inventory_series(
+    conn: sqlite3.Connection,
+    *,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    bucket_us: Optional[int] = None,
+    raw: bool = False,
+) -> Iterable[sqlite3.Row]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(
+        *_series_query(
+            "total_value_after",
+            item_id=None,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_us=bucket_us,
+        )
+    )
+    rows = cursor.fetchall()
+    if not _reads_archive(conn, start_ts):
+        return rows
+    cursor.execute(
+        *_rollup_series_query(
+            "inventory_daily_rollups",
+            "close_total_value AS total_value_after",
+            item_id=None,
+            start_ts=start_ts,
+            end_ts=end_ts,
+        )
+    )
+    return _merge_series(cursor.fetchall(), rows)
+
+
+@timed_query
+def fetch_item_series(
+    conn: sqlite3.Connection,
+    item_id: int,
+    *,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    bucket_us: Optional[int] = None,
+    raw: bool = False,
+) -> Iterable[sqlite3.Row]:
+    cursor = row_cursor(conn, raw=raw)
+    cursor.execute(
+        *_series_query(
+            "quantity_after",
+            item_id=item_id,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_us=bucket_us,
+        )
+    )
+    rows = cursor.fetchall()
+    if not _reads_archive(conn, start_ts):
+        return rows
+    cursor.execute(
+        *_rollup_series_query(
+            "item_daily_rollups",
+            "close_quantity AS quantity_after",
+            item_id=item_id,
+            start_ts=start_ts,
+            end_ts=end_ts,
+        )
+    )
+    return _merge_series(cursor.fetchall(), rows)
+
+
+@timed_query
+def fetch_items_series(
+    conn: sqlite3.Connection,
+    item_ids: Iterable[int],
+    *,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    bucket_us: Optional[int] = None,
+) -> Dict[int, List[Tuple[int, float]]]:
+    # Existing items map to their (ts, quantity) series, empty when there are
+    # no movements in range; unknown ids are left out.
+    ids = sorted(set(item_ids))
+    series: Dict[int, List[Tuple[int, float]]] = {}
+    reads_archive = _reads_archive(conn, start_ts)
+    cursor = row_cursor(conn, raw=True)
+    for start in range(0, len(ids), MAX_QUERY_PARAMS):
+        chunk = ids[start : start + MAX_QUERY_PARAMS]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(f"SELECT id FROM items WHERE id IN ({placeholders});", chunk)
+        chunk_series: Dict[int, List[Tuple[int, float]]] = {row[0]: [] for row in cursor.fetchall()}
+        if not chunk_series:
+            continue
+        found = list(chunk_series)
+        cursor.execute(
+            *_items_series_query(found, start_ts=start_ts, end_ts=end_ts, bucket_us=bucket_us)
+        )
+        for item_id, ts, quantity in cursor:
+            chunk_series[item_id].append((ts, quantity))
+        if reads_archive:
+            cursor.execute(*_items_rollup_series_query(found, start_ts=start_ts, end_ts=end_ts))
+            rollup_series: Dict[int, List[Tuple[int, float]]] = {}
+            for item_id, ts, quantity in cursor:
+                rollup_series.setdefault(item_id, []).append((ts, quantity))
+            for item_id, rollup_rows in rollup_series.items():
+                chunk_series[item_id] = _merge_series(rollup_rows, chunk_series[item_id])
+        series.update(chunk_series)
+    return series
+
+
+def _items_series_query(
+    item_ids: List[int],
+    *,
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+    bucket_us: Optional[int],
+) -> Tuple[str, Tuple[object, ...]]:
+    # One range scan of idx_movements_item_ts per requested item, returned in
+    # (item_id, ts) order; bucketing partitions the LEAD() window by item.
+    conditions = [f"item_id IN ({', '.join('?' for _ in item_ids)})"]
+    params: List[object] = list(item_ids)
+    if start_ts is not None:
+        conditions.append("ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        conditions.append("ts <= ?")
+        params.append(end_ts)
+    where = f"WHERE {' AND '.join(conditions)}"
+
+    if bucket_us is None:
+        query = f"SELECT item_id, ts, quantity_after FROM movements {where} ORDER BY item_id, ts, id;"
+        return query, tuple(params)
+
+    query = f"""
+        SELECT item_id, ts, quantity_after
+        FROM (
+            SELECT
+                item_id,
+                ts,
+                quantity_after,
+                ts / ? AS bucket,
+                LEAD(ts / ?) OVER (PARTITION BY item_id ORDER BY ts, id) AS next_bucket
+            FROM movements
+            {where}
+        )
+        WHERE next_bucket IS NULL OR next_bucket != bucket
+        ORDER BY item_id, ts;
+    """
+    return query, (bucket_us, bucket_us, *params)
+
+
+def _items_rollup_series_query(
+    item_ids: List[int],
+    *,
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+) -> Tuple[str, Tuple[object, ...]]:
+    conditions = [f"item_id IN ({', '.join('?' for _ in item_ids)})"]
+    params: List[object] = list(item_ids)
+    if start_ts is not None:
+        conditions.extend(("day >= ?", "close_ts >= ?"))
+        params.extend((start_ts // DAY_US, start_ts))
+    if end_ts is not None:
+        conditions.extend(("day <= ?", "close_ts <= ?"))
+        params.extend((end_ts // DAY_US, end_ts))
+    query = f"""
+        SELECT item_id, close_ts, close_quantity
+        FROM item_daily_rollups
+        WHERE {' AND '.join(conditions)}
+        ORDER BY item_id, day;
+    """
+    return query, tuple(params)
+
+
+def _reads_archive(conn: sqlite3.Connection, start_ts: Optional[int]) -> bool:
+    archived_before = fetch_archived_before(conn)
+    return archived_before > 0 and (start_ts is None or start_ts < archived_before)
+
+
+def _rollup_series_query(
+    table: str,
+    value_column: str,
+    *,
+    item_id: Optional[int],
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+) -> Tuple[str, Tuple[object, ...]]:
+    # Archived days contribute their closing point only: the same point a
+    # bucket=day series yields, and the last one of any finer bucket.
+    conditions: List[str] = []
+    params: List[object] = []
+    if item_id is not None:
+        conditions.append("item_id = ?")
+        params.append(item_id)
+    if start_ts is not None:
+        conditions.extend(("day >= ?", "close_ts >= ?"))
+        params.extend((start_ts // DAY_US, start_ts))
+    if end_ts is not None:
+        conditions.extend(("day <= ?", "close_ts <= ?"))
+        params.extend((end_ts // DAY_US, end_ts))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT close_ts AS ts, {value_column} FROM {table} {where} ORDER BY day;", tuple(params)
+
+
+def _merge_series(rollup_rows: List[sqlite3.Row], rows: List[sqlite3.Row]) -> List[sqlite3.Row]:
+    if not rollup_rows:
+        return rows
+    if not rows or rows[0][0] >= rollup_rows[-1][0]:
+        return rollup_rows + rows
+    # Movements inserted with a timestamp inside the archived range stay live
+    # until the next archive run; interleave them by time.
+    return list(heapq.merge(rollup_rows, rows, key=itemgetter(0)))
+
+
+def _series_query(
+    value_column: str,
+    *,
+    item_id: Optional[int],
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+    bucket_us: Optional[int],
+) -> Tuple[str, Tuple[object, ...]]:
+    conditions: List[str] = []
+    params: List[object] = []
+    if item_id is not None:
+        conditions.append("item_id = ?")
+        params.append(item_id)
+    if start_ts is not None:
+        conditions.append("ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        conditions.append("ts <= ?")
+        params.append(end_ts)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if bucket_us is None:
+        return f"SELECT ts, {value_column} FROM movements {where} ORDER BY ts, id;", tuple(params)
+
+    # Keep the last row of each bucket: the window runs in (ts, id) index order,
+    # so LEAD() needs no extra sort, unlike GROUP BY/ROW_NUMBER over the bucket.
+    query = f"""
+        SELECT ts, {value_column}
+        FROM (
+            SELECT
+                ts,
+                {value_column},
+                ts / ? AS bucket,
+                LEAD(ts / ?) OVER (ORDER BY ts, id) AS next_bucket
+            FROM movements
+            {where}
+        )
+        WHERE next_bucket IS NULL OR next_bucket != bucket
+        ORDER BY ts;
+    """
+    return query, (bucket_us, bucket_us, *params)
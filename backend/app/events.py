@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Set, Tuple
+
+from .async_database import run_read
+from .database import fetch_change_watermarks, fetch_changes_since
+from .services import encode_json, serialize_movements
+
+EVENTS_QUEUE_SIZE = int(os.environ.get("MRP_EVENTS_QUEUE_SIZE", "256"))
+EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("MRP_EVENTS_MAX_SUBSCRIBERS", "1000"))
+EVENTS_POLL_SECONDS = float(os.environ.get("MRP_EVENTS_POLL_MS", "250")) / 1000
+HEARTBEAT_SECONDS = 15.0
+RETRY_MS = 3000
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+KEEP_ALIVE = b": keep-alive\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriberLimitError(RuntimeError):
+    pass
+
+
+def format_event(event: str, data: Any, *, event_id: Optional[int] = None) -> bytes:
+    # bytes data is taken as already encoded JSON.
+    head = f"id: {event_id}\nevent: {event}\n" if event_id is not None else f"event: {event}\n"
+    payload = data if isinstance(data, bytes) else encode_json(data)
+    return head.encode() + b"data: " + payload + b"\n\n"
+
+
+def resync_event(reason: str) -> bytes:
+    return format_event("resync", {"reason": reason})
+
+
+LAGGED = resync_event("lagged")
+
+
+class Subscription:
+    # Per-client buffer of encoded events. A client that falls queue_size
+    # events behind loses its backlog and gets a single resync event instead,
+    # so memory stays bounded and publishers never wait on a slow reader.
+    def __init__(self, *, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self.resyncs = 0
+        self._messages: Deque[bytes] = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+
+    def push(self, message: bytes) -> None:
+        if len(self._messages) >= self.queue_size:
+            self._messages.clear()
+            self._messages.append(LAGGED)
+            self.resyncs += 1
+        self._messages.append(message)
+        self._wakeup.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    async def next_chunk(self, timeout: float) -> Optional[bytes]:
+        # Everything queued so far in one write; b"" on timeout, None once closed.
+        if not self._messages and not self._closed:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return b""
+        if not self._messages:
+            return None
+        chunk = b"".join(self._messages)
+        self._messages.clear()
+        return chunk
+
+
+class EventBroker:
+    # In-process fan-out for GET /events. Events are encoded once per publish
+    # and appended to every subscriber's buffer; nothing touches the database
+    # per subscriber. publish() must be called from the event loop thread.
+    def __init__(
+        self,
+        *,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+    ) -> None:
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscription] = set()
+        self._published = 0
+        self._resyncs = 0
+
+    def subscribe(self) -> Subscription:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise SubscriberLimitError(f"Too many event subscribers (limit {self.max_subscribers})")
+        subscription = Subscription(queue_size=self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            self._resyncs += subscription.resyncs
+
+    def publish(self, event: str, data: Any, *, event_id: Optional[int] = None) -> None:
+        self._published += 1
+        if self._subscribers:
+            self._fan_out(format_event(event, data, event_id=event_id))
+
+    def publish_movements(self, rows: Iterable[tuple]) -> None:
+        # rows are movement tuples in GET /movements column order. Movement
+        # events carry the movement id as the SSE id, the watermark a
+        # reconnecting client passes to GET /movements?since_id=.
+        movements = serialize_movements(rows) if self._subscribers else []
+        self._published += 1
+        if movements:
+            self._fan_out(
+                b"".join(format_event("movement", movement, event_id=movement["id"]) for movement in movements)
+            )
+
+    def resync(self, reason: str) -> None:
+        self._published += 1
+        if self._subscribers:
+            self._fan_out(resync_event(reason))
+
+    def _fan_out(self, message: bytes) -> None:
+        for subscription in self._subscribers:
+            subscription.push(message)
+
+    def close(self) -> None:
+        for subscription in list(self._subscribers):
+            subscription.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self._published,
+            "resyncs": self._resyncs + sum(subscription.resyncs for subscription in self._subscribers),
+            "queue_size": self.queue_size,
+        }
+
+
+class ChangeFeed:
+    # Feeds the broker from the database rather than from the request that made
+    # the change, so with several uvicorn workers every subscriber sees every
+    # write, whichever process committed it. While anyone is subscribed, the feed
+    # reads change_events and movements past its watermarks every poll interval,
+    # or right away after a local write calls notify(); one query per poll per
+    # process, however many subscribers there are.
+    def __init__(self, broker: EventBroker, *, interval: float = EVENTS_POLL_SECONDS) -> None:
+        self.broker = broker
+        self.interval = interval
+        self._watermarks: Optional[Tuple[int, int]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._polls = 0
+        self._skipped = 0
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def watermark(self) -> int:
+        # The last movement id already handed to the broker (or the current one
+        # when the feed starts); later movements reach subscribers through it.
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._watermarks = None
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        async with self._lock:
+            if self._watermarks is None:
+                self._watermarks = await run_read(fetch_change_watermarks)
+            return self._watermarks[0]
+
+    async def _run(self) -> None:
+        while self.broker.has_subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Change feed poll failed")
+        # Nobody left to deliver to; the next subscriber restarts from the
+        # then-current watermarks instead of replaying what was missed.
+        self._task = None
+
+    async def poll(self) -> None:
+        async with self._lock:
+            if self._watermarks is None:
+                return
+            movement_id, change_id = self._watermarks
+            limit = self.broker.queue_size
+            changes, movements = await run_read(
+                fetch_changes_since, movement_id=movement_id, change_id=change_id, limit=limit + 1
+            )
+            self._polls += 1
+            if len(changes) > limit or len(movements) > limit:
+                # More than any subscriber can buffer (bulk imports): skip
+                # ahead and let clients reload instead of streaming the backlog.
+                self._watermarks = await run_read(fetch_change_watermarks)
+                self._skipped += 1
+                self.broker.resync("backlog")
+                return
+            # Interleave the two in commit order: each change event follows
+            # the movements committed before it.
+            start = 0
+            for event_id, event, data, after_movement_id in changes:
+                end = start
+                while end < len(movements) and movements[end][0] <= after_movement_id:
+                    end += 1
+                if end > start:
+                    self.broker.publish_movements(movements[start:end])
+                    start = end
+                self.broker.publish(event, data.encode())
+                change_id = event_id
+            if start < len(movements):
+                self.broker.publish_movements(movements[start:])
+            if movements:
+                movement_id = movements[-1][0]
+            self._watermarks = (movement_id, change_id)
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"polls": self._polls, "backlog_resyncs": self._skipped}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .database import (
+    fetch_total_inventory,
+    get_connection,
+    immediate_transaction,
+    insert_items,
+    insert_movements,
+    utc_now_us,
+)
+from .schemas import (
+    ImportFormat,
+    ImportRejectedRow,
+    ItemCreate,
+    ItemImportResult,
+    MovementKind,
+)
+
+IMPORT_CHUNK_SIZE = 10000
+MAX_REPORTED_ERRORS = 1000
+OPTIONAL_CSV_FIELDS = ("reorder_threshold",)
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> Optional[ImportFormat]:
+    if content_type:
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        if media_type in ("text/csv", "application/csv"):
+            return ImportFormat.CSV
+        if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            return ImportFormat.NDJSON
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith(".csv"):
+            return ImportFormat.CSV
+        if lowered.endswith((".ndjson", ".jsonl")):
+            return ImportFormat.NDJSON
+    return None
+
+
+def iter_csv_records(lines: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(lines)
+    for record in reader:
+        # An empty optional cell means "not set", not an invalid number.
+        for field in OPTIONAL_CSV_FIELDS:
+            if record.get(field) == "":
+                del record[field]
+        yield reader.line_num, record
+
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as exc:
+            yield line_number, exc
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+class ItemImporter:
+    def __init__(self, conn, *, chunk_size: int = IMPORT_CHUNK_SIZE) -> None:
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[ImportRejectedRow] = []
+        self._pending: List[Tuple[str, str, str, float, float, Optional[float]]] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRejectedRow(line=line, error=error))
+
+    def feed(self, records: Iterable[Tuple[int, object]]) -> None:
+        for line, record in records:
+            if isinstance(record, Exception):
+                self.reject(line, f"invalid JSON: {record}")
+                continue
+            if not isinstance(record, dict):
+                self.reject(line, "row must be an object")
+                continue
+            try:
+                item = ItemCreate.model_validate(record)
+            except ValidationError as exc:
+                self.reject(line, format_validation_error(exc))
+                continue
+            self._pending.append(
+                (item.name, item.category, item.unit, item.quantity, item.unit_price, item.reorder_threshold)
+            )
+            if len(self._pending) >= self.chunk_size:
+                self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        chunk, self._pending = self._pending, []
+        ts = utc_now_us()
+        init = MovementKind.INIT.value
+        with immediate_transaction(self.conn):
+            total_value = fetch_total_inventory(self.conn)
+            item_ids = insert_items(self.conn, chunk)
+            movements = []
+            for item_id, (_, _, _, quantity, unit_price, _) in zip(item_ids, chunk):
+                total_value += quantity * unit_price
+                movements.append(
+                    (
+                        item_id,
+                        init,
+                        quantity,
+                        unit_price,
+                        ts,
+                        quantity,
+                        total_value,
+                    )
+                )
+            insert_movements(self.conn, movements)
+        self.imported += len(chunk)
+
+    def result(self) -> ItemImportResult:
+        return ItemImportResult(
+            imported=self.imported,
+            rejected=self.rejected,
+            errors=self.errors,
+            errors_truncated=self.rejected > len(self.errors),
+        )
+
+
+def import_items_file(
+    source: BinaryIO,
+    import_format: ImportFormat,
+    *,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> ItemImportResult:
+    lines = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        records = iter_csv_records(lines) if import_format is ImportFormat.CSV else iter_ndjson_records(lines)
+        with get_connection() as conn:
+            importer = ItemImporter(conn, chunk_size=chunk_size)
+            importer.feed(records)
+            return importer.result()
+    finally:
+        lines.detach()
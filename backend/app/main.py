@@ -1,44 +1,152 @@
 from __future__ import annotations
 
+import asyncio
 import sqlite3
+import tempfile
 from datetime import datetime
-from typing import Generator, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
 
-from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
 
 from .database import (
-    DATETIME_FORMAT,
+    WalCheckpointer,
     calculate_total_inventory,
+    close_pools,
     create_tables,
     delete_item,
+    fetch_abc_rows,
+    fetch_abc_summary,
     fetch_all_items,
+    fetch_category_items,
+    fetch_category_summary,
+    fetch_category_thresholds,
     fetch_item,
     fetch_item_series,
+    fetch_items_by_ids,
+    fetch_items_series,
     fetch_inventory_series,
-    fetch_movement_by_id,
+    fetch_low_stock_items,
+    fetch_revision,
+    fetch_top_items_by_value,
+    fetch_total_inventory,
     get_connection,
+    insert_change_event,
     insert_item,
     insert_movement,
+    insert_movements,
+    iter_items,
+    iter_movements_rows,
     list_movements_rows,
+    pool_stats,
     search_items as search_items_db,
-    update_item_record,
+    set_category_reorder_threshold,
+    set_item_reorder_threshold,
+    to_epoch_us,
+    update_item_records,
+    utc_now_us,
+)
+from .analytics import DEFAULT_DEAD_STOCK_DAYS, AnalyticsLoader, now_bucket, summarize_analytics
+from .async_database import ExecutorBusyError, database_executor, run_read, run_write
+from .cache import CachedBody, ResponseCache, content_etag, etag_matches, make_etag
+from .events import (
+    EVENT_STREAM_MEDIA_TYPE,
+    HEARTBEAT_SECONDS,
+    KEEP_ALIVE,
+    RETRY_MS,
+    ChangeFeed,
+    EventBroker,
+    SubscriberLimitError,
+    format_event,
+)
+from .importer import detect_format, import_items_file
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, Counter, Gauge, MetricsMiddleware, registry
+from .profiler import (
+    DEFAULT_INTERVAL_MS,
+    MAX_WINDOW_SECONDS,
+    PROFILE_ID_HEADER,
+    PROFILER_ENABLED,
+    TOKEN_HEADER,
+    Profile,
+    ProfilerMiddleware,
+    Sampler,
+    new_profile_id,
+    profile_store,
+    token_matches,
+    window_lock,
 )
 from .schemas import (
+    ABCReport,
+    AnalyticsReport,
+    AnalyticsSort,
+    BatchLineStatus,
+    BatchMode,
+    CategoryThreshold,
+    ImportFormat,
     InventoryPoint,
     ItemCreate,
+    ItemImportResult,
     ItemQuantityPoint,
     ItemRead,
+    LowStockItem,
+    LowStockSort,
+    MovementBatchCreate,
+    MovementBatchLine,
+    MovementBatchResult,
     MovementCreate,
     MovementKind,
     MovementRead,
+    ProfileFormat,
+    ReorderThresholdUpdate,
+    ReportSummary,
+    ResponseFormat,
+    SeriesBucket,
+    ValuationReport,
 )
+from .snapshot import ITEM_FIELDS, ItemColumns, ItemSnapshot
 from .services import (
+    BUCKET_WIDTH_US,
+    NDJSON_MEDIA_TYPE,
+    build_abc_report,
+    build_analytics_report,
+    build_batch_movement_output,
     build_item_output,
-    build_inventory_points,
-    build_item_quantity_points,
-    build_movement_output,
+    build_report_summary,
+    build_valuation_report,
+    downsample_lttb,
+    encode_json,
+    plan_movement_batch,
+    serialize_inventory_points,
+    serialize_item_quantity_points,
+    serialize_items,
+    serialize_low_stock_items,
+    serialize_movements,
+    stream_ndjson,
 )
+from .writer import MovementRejected, MovementWriter, WriterTimeoutError
+
+MAX_PAGE_SIZE = 5000
+DEFAULT_MOVEMENTS_PAGE_SIZE = 500
+MAX_REPORT_PAGE_SIZE = 1000
+MAX_TOP_ITEMS = 100
+MAX_SERIES_POINTS = 10000
+MAX_SERIES_ITEMS = 200
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_TERM_LENGTH = 100
+DEFAULT_LOW_STOCK_PAGE_SIZE = 100
+
+response_cache = ResponseCache()
+movement_writer = MovementWriter()
+event_broker = EventBroker()
+change_feed = ChangeFeed(event_broker)
+wal_checkpointer = WalCheckpointer()
+item_snapshot = ItemSnapshot()
+analytics_loader = AnalyticsLoader()
 
 app = FastAPI(title="Inventory MRP API")
 app.add_middleware(
@@ -47,174 +155,883 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
 
 
 @app.on_event("startup")
 def on_startup() -> None:
     with get_connection() as conn:
         create_tables(conn)
+    movement_writer.start()
+    wal_checkpointer.start()
+    item_snapshot.start()
 
 
-def connection_dependency() -> Generator[sqlite3.Connection, None, None]:
-    with get_connection() as conn:
-        yield conn
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    item_snapshot.stop()
+    change_feed.close()
+    event_broker.close()
+    wal_checkpointer.stop()
+    movement_writer.stop()
+    database_executor.shutdown()
+    close_pools()
+
+
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+def record_item_event(conn: sqlite3.Connection, row: sqlite3.Row) -> ItemRead:
+    # Written with the change itself; the change feed publishes it from there.
+    output = build_item_output(row)
+    insert_change_event(conn, "item", encode_json(output.model_dump(mode="json")))
+    return output
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    # Starlette abandons the body iterator when the client disconnects, and the
+    # reference cycles left behind keep it alive until a full garbage
+    # collection: until then stream_rows holds its read connection, and the
+    # snapshot that connection pins stops WAL checkpoints from resetting the
+    # log. Close the iterators as soon as the response is over instead.
+    def __init__(self, content: Any, *args: Any, **kwargs: Any) -> None:
+        super().__init__(content, *args, **kwargs)
+        self._source = content
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            if self._source is not self.body_iterator and hasattr(self._source, "close"):
+                await run_in_threadpool(self._source.close)
+
+
+def stream_rows(open_chunks: Callable, serialize: Callable) -> Iterator[bytes]:
+    # Starlette iterates sync bodies in its threadpool; the stream holds its
+    # own read connection until the last chunk is sent.
+    with get_connection(readonly=True) as conn:
+        yield from stream_ndjson(open_chunks(conn), serialize)
+
+
+def next_cursor_headers(request: Request, **params: object) -> Dict[str, str]:
+    return {
+        "X-Next-Cursor": urlencode(params),
+        "Link": f'<{request.url.include_query_params(**params)}>; rel="next"',
+    }
+
+
+async def cached_response(
+    request: Request,
+    build: Callable[[sqlite3.Connection], Any],
+    headers_for: Optional[Callable[[Any], Dict[str, str]]] = None,
+    *,
+    variant: Optional[Hashable] = None,
+) -> Response:
+    # variant tells apart responses that depend on more than the URL and the
+    # database revision (such as the current time).
+    key = (request.url.path, request.url.query) if variant is None else (request.url.path, request.url.query, variant)
+    if_none_match = request.headers.get("if-none-match")
+
+    def respond(conn: sqlite3.Connection) -> Response:
+        # The revision is read before the data, so a concurrent write can only make
+        # an entry fresher than its tag (causing a rebuild), never staler.
+        revision = fetch_revision(conn)
+        etag = make_etag(revision, key)
+        validators = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers=validators)
+
+        def render() -> CachedBody:
+            payload = build(conn)
+            return CachedBody(encode_json(payload), headers_for(payload) if headers_for else {})
+
+        cached = response_cache.get_or_build(key, revision, render)
+        return Response(
+            content=cached.body,
+            media_type="application/json",
+            headers={**cached.headers, **validators},
+        )
+
+    return await run_read(respond)
+
+
+def snapshot_response(
+    request: Request,
+    build: Callable[[ItemColumns], Any],
+    headers_for: Optional[Callable[[Any], Dict[str, str]]] = None,
+) -> Response:
+    # Like cached_response, but built from the item snapshot on the event loop.
+    # Entries are tagged with the snapshot version; the ETag hashes the body,
+    # so workers holding the same data tag it alike.
+    key = ("snapshot", request.url.path, request.url.query)
+
+    def render() -> CachedBody:
+        payload = build(item_snapshot.columns)
+        body = encode_json(payload)
+        return CachedBody(body, {**(headers_for(payload) if headers_for else {}), "ETag": content_etag(body)})
+
+    cached = response_cache.get_or_build(key, item_snapshot.version, render)
+    validators = {"ETag": cached.headers["ETag"], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), validators["ETag"]):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=validators)
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers={**cached.headers, **validators},
+    )
 
 
 @app.get("/health")
-def healthcheck() -> dict[str, str]:
+async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/health/db")
+async def database_health() -> dict[str, dict[str, object]]:
+    return {**pool_stats(), "executor": database_executor.stats(), "wal": wal_checkpointer.stats()}
+
+
+@app.get("/health/cache")
+async def cache_health() -> dict[str, int]:
+    return response_cache.stats()
+
+
+@app.get("/health/writer")
+async def writer_health() -> dict[str, object]:
+    return movement_writer.stats()
+
+
+@app.get("/health/events")
+async def events_health() -> dict[str, int]:
+    return {**event_broker.stats(), **change_feed.stats()}
+
+
+@app.get("/health/snapshot")
+async def snapshot_health() -> dict[str, object]:
+    return item_snapshot.stats()
+
+
+def collect_runtime_metrics() -> List[Any]:
+    pool_connections = Gauge("mrp_db_pool_connections", "Pooled connections by state.", ("pool", "state"))
+    pool_waits = Counter("mrp_db_pool_waits_total", "Checkouts that had to wait for a connection.", ("pool",))
+    pool_timeouts = Counter("mrp_db_pool_timeouts_total", "Checkouts that timed out.", ("pool",))
+    for key, stats in pool_stats().items():
+        for state in ("created", "in_use", "idle"):
+            pool_connections.set(stats[state], key, state)
+        pool_waits.set(stats["waits"], key)
+        pool_timeouts.set(stats["timeouts"], key)
+
+    wal = wal_checkpointer.stats()
+    wal_bytes = Gauge("mrp_db_wal_bytes", "Size of the SQLite WAL file.")
+    wal_bytes.set(wal["wal_bytes"])
+    wal_truncations = Counter("mrp_db_wal_truncations_total", "WAL TRUNCATE checkpoints run by this process.")
+    wal_truncations.set(wal["truncations"])
+
+    executor = database_executor.stats()
+    executor_pending = Gauge("mrp_db_executor_pending", "Database calls running or waiting in the executor.")
+    executor_pending.set(executor["pending"])
+    executor_rejected = Counter("mrp_db_executor_rejected_total", "Database calls refused with a full queue.")
+    executor_rejected.set(executor["rejected"])
+
+    writer = movement_writer.stats()
+    writer_queued = Gauge("mrp_writer_queued", "Movements waiting for the writer.")
+    writer_queued.set(writer["queued"])
+    writer_movements = Counter("mrp_writer_movements_total", "Movements committed by the writer.")
+    writer_movements.set(writer["movements"])
+    writer_groups = Counter("mrp_writer_groups_total", "Group commits made by the writer.")
+    writer_groups.set(writer["groups"])
+    writer_rejected = Counter("mrp_writer_rejected_total", "Movements rejected by the writer.")
+    writer_rejected.set(writer["rejected"])
+
+    cache = response_cache.stats()
+    cache_lookups = Counter("mrp_response_cache_lookups_total", "Response cache lookups by outcome.", ("outcome",))
+    for outcome in ("hits", "misses", "stale", "not_modified"):
+        cache_lookups.set(cache[outcome], outcome)
+    cache_bytes = Gauge("mrp_response_cache_bytes", "Bytes held by the response cache.")
+    cache_bytes.set(cache["bytes"])
+
+    events = event_broker.stats()
+    event_subscribers = Gauge("mrp_event_subscribers", "Clients connected to GET /events.")
+    event_subscribers.set(events["subscribers"])
+    event_resyncs = Counter("mrp_event_resyncs_total", "Event backlogs dropped for slow subscribers.")
+    event_resyncs.set(events["resyncs"])
+
+    snapshot = item_snapshot.stats()
+    snapshot_bytes = Gauge("mrp_item_snapshot_bytes", "Memory held by the item snapshot.")
+    snapshot_bytes.set(snapshot["memory"]["bytes"] if "memory" in snapshot else 0)
+    snapshot_mismatches = Counter("mrp_item_snapshot_mismatches_total", "Snapshot rows corrected by verification.")
+    snapshot_mismatches.set(snapshot["mismatches"])
+
+    return [
+        pool_connections,
+        pool_waits,
+        pool_timeouts,
+        wal_bytes,
+        wal_truncations,
+        executor_pending,
+        executor_rejected,
+        writer_queued,
+        writer_movements,
+        writer_groups,
+        writer_rejected,
+        cache_lookups,
+        cache_bytes,
+        event_subscribers,
+        event_resyncs,
+        snapshot_bytes,
+        snapshot_mismatches,
+    ]
+
+
+registry.add_collector(collect_runtime_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set MRP_METRICS=1 to enable them")
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def require_profiler_token(request: Request) -> None:
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set MRP_PROFILER_TOKEN to enable it")
+    if not token_matches(request.headers.get(TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+
+
+def profile_response(profile: Profile, profile_id: str, profile_format: ProfileFormat) -> Response:
+    headers = {PROFILE_ID_HEADER: profile_id}
+    if profile_format is ProfileFormat.COLLAPSED:
+        return PlainTextResponse(profile.collapsed(), headers=headers)
+    if profile_format is ProfileFormat.PSTATS:
+        headers["Content-Disposition"] = f'attachment; filename="{profile_id}.pstats"'
+        return Response(profile.pstats_bytes(), media_type="application/octet-stream", headers=headers)
+    return JSONResponse({"id": profile_id, **profile.summary()}, headers=headers)
+
+
+@app.post("/debug/profile", include_in_schema=False)
+async def profile_window_endpoint(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=MAX_WINDOW_SECONDS),
+    interval_ms: float = Query(DEFAULT_INTERVAL_MS, ge=0.5, le=1000),
+    include_idle: bool = Query(False),
+    profile_format: ProfileFormat = Query(ProfileFormat.SUMMARY, alias="format"),
+) -> Response:
+    require_profiler_token(request)
+    if not window_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profiling window is already running")
+    sampler = Sampler(interval=interval_ms / 1000, include_idle=include_idle).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = sampler.stop()
+        window_lock.release()
+    profile_id = new_profile_id()
+    profile_store.put(profile_id, profile)
+    return profile_response(profile, profile_id, profile_format)
+
+
+@app.get("/debug/profile/{profile_id}", include_in_schema=False)
+async def stored_profile_endpoint(
+    profile_id: str,
+    request: Request,
+    profile_format: ProfileFormat = Query(ProfileFormat.SUMMARY, alias="format"),
+) -> Response:
+    require_profiler_token(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile_response(profile, profile_id, profile_format)
+
+
 @app.post("/items", response_model=ItemRead, status_code=201)
-def create_item_endpoint(
-    item: ItemCreate,
-    conn: sqlite3.Connection = Depends(connection_dependency),
-) -> ItemRead:
-    item_id = insert_item(
-        conn,
-        name=item.name,
-        category=item.category,
-        unit=item.unit,
-        quantity=item.quantity,
-        unit_price=item.unit_price,
-    )
-    timestamp = datetime.utcnow().strftime(DATETIME_FORMAT)
-    total_after = calculate_total_inventory(conn)
-    insert_movement(
-        conn,
-        item_id=item_id,
-        movement_type=MovementKind.INIT.value,
-        quantity=item.quantity,
-        unit_price=item.unit_price,
-        timestamp=timestamp,
-        quantity_after=item.quantity,
-        total_value_after=total_after,
-    )
-    conn.commit()
-    row = fetch_item(conn, item_id)
-    if row is None:
+async def create_item_endpoint(item: ItemCreate) -> ItemRead:
+    def create(conn: sqlite3.Connection) -> Optional[ItemRead]:
+        item_id = insert_item(
+            conn,
+            name=item.name,
+            category=item.category,
+            unit=item.unit,
+            quantity=item.quantity,
+            unit_price=item.unit_price,
+            reorder_threshold=item.reorder_threshold,
+        )
+        ts = utc_now_us()
+        total_after = calculate_total_inventory(conn)
+        insert_movement(
+            conn,
+            item_id=item_id,
+            movement_type=MovementKind.INIT.value,
+            quantity=item.quantity,
+            unit_price=item.unit_price,
+            ts=ts,
+            quantity_after=item.quantity,
+            total_value_after=total_after,
+        )
+        row = fetch_item(conn, item_id)
+        return (record_item_event(conn, row), tuple(row)) if row is not None else None
+
+    created = await run_write(create)
+    change_feed.notify()
+    if created is None:
         raise HTTPException(status_code=500, detail="Failed to load saved item")
-    return build_item_output(row)
+    output, row = created
+    item_snapshot.upsert(row)
+    return output
+
+
+@app.post(
+    "/items/import",
+    response_model=ItemImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/csv": {"schema": {"type": "string"}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_items_endpoint(
+    request: Request,
+    import_format: Optional[ImportFormat] = Query(None, alias="format"),
+) -> ItemImportResult:
+    import_format = import_format or detect_format(None, request.headers.get("content-type"))
+    if import_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson",
+        )
+    # Spool the body to disk so memory stays bounded regardless of upload size.
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            await run_in_threadpool(spool.write, chunk)
+        spool.seek(0)
+        result = await run_in_threadpool(import_items_file, spool, import_format)
+    # Imports can touch thousands of items; subscribers reload instead.
+    await run_write(insert_change_event, "resync", encode_json({"reason": "import"}))
+    change_feed.notify()
+    if item_snapshot.ready:
+        await item_snapshot.reload()
+    return result
 
 
 @app.get("/items", response_model=List[ItemRead])
-def list_items_endpoint(conn: sqlite3.Connection = Depends(connection_dependency)) -> List[ItemRead]:
-    rows = fetch_all_items(conn)
-    return [build_item_output(row) for row in rows]
+async def list_items_endpoint(
+    request: Request,
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    as_of: Optional[datetime] = Query(None),
+    response_format: ResponseFormat = Query(ResponseFormat.JSON, alias="format"),
+) -> List[ItemRead]:
+    as_of_us = to_epoch_us(as_of) if as_of is not None else None
+    if response_format is ResponseFormat.NDJSON:
+        return ClosingStreamingResponse(
+            stream_rows(
+                lambda stream_conn: iter_items(
+                    stream_conn,
+                    after_id=after_id,
+                    limit=limit,
+                    as_of=as_of_us,
+                    raw=True,
+                ),
+                serialize_items,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        return serialize_items(fetch_all_items(conn, after_id=after_id, limit=limit, as_of=as_of_us, raw=True))
+
+    def headers_for(items: List[Dict[str, Any]]) -> Dict[str, str]:
+        if limit is not None and len(items) == limit:
+            return next_cursor_headers(request, after_id=items[-1]["id"])
+        return {}
+
+    # Unpaged listings stay on the database, which streams them in chunks.
+    if item_snapshot.ready and as_of_us is None and limit is not None:
+        return snapshot_response(
+            request,
+            lambda columns: serialize_items(columns.page(after_id=after_id, limit=limit)),
+            headers_for,
+        )
+    return await cached_response(request, build, headers_for)
+
+
+# Declared before /items/{item_id}, which would otherwise capture "search".
+@app.get("/items/search", response_model=List[ItemRead])
+async def search_items_endpoint(
+    request: Request,
+    term: str = Query(..., min_length=1, max_length=MAX_SEARCH_TERM_LENGTH),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+) -> List[ItemRead]:
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        return serialize_items(search_items_db(conn, term, limit=limit, raw=True))
+
+    return await cached_response(request, build)
+
+
+@app.get("/items/low-stock", response_model=List[LowStockItem])
+async def low_stock_items_endpoint(
+    request: Request,
+    sort: LowStockSort = Query(LowStockSort.SHORTFALL),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_LOW_STOCK_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> List[LowStockItem]:
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        rows = fetch_low_stock_items(
+            conn,
+            order_by_shortfall=sort is LowStockSort.SHORTFALL,
+            offset=offset,
+            limit=limit,
+            raw=True,
+        )
+        return serialize_low_stock_items(rows)
+
+    def headers_for(items: List[Dict[str, Any]]) -> Dict[str, str]:
+        if len(items) < limit:
+            return {}
+        return next_cursor_headers(request, offset=offset + limit)
+
+    return await cached_response(request, build, headers_for)
+
+
+@app.put("/items/{item_id}/reorder-threshold", response_model=ItemRead)
+async def update_item_reorder_threshold_endpoint(item_id: int, payload: ReorderThresholdUpdate) -> ItemRead:
+    def update(conn: sqlite3.Connection) -> ItemRead:
+        if not set_item_reorder_threshold(conn, item_id, payload.reorder_threshold):
+            raise HTTPException(status_code=404, detail="Item not found")
+        row = fetch_item(conn, item_id)
+        return record_item_event(conn, row), tuple(row)
+
+    output, row = await run_write(update)
+    change_feed.notify()
+    item_snapshot.upsert(row)
+    return output
 
 
 @app.get("/items/{item_id}", response_model=ItemRead)
-def get_item_endpoint(
+async def get_item_endpoint(
     item_id: int,
-    conn: sqlite3.Connection = Depends(connection_dependency),
+    request: Request,
 ) -> ItemRead:
-    row = fetch_item(conn, item_id)
-    if row is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return build_item_output(row)
+    def build(conn: sqlite3.Connection) -> ItemRead:
+        row = fetch_item(conn, item_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return build_item_output(row)
+
+    def build_from_snapshot(columns: ItemColumns) -> ItemRead:
+        row = columns.get(item_id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return build_item_output(dict(zip(ITEM_FIELDS, row)))
+
+    if item_snapshot.ready:
+        return snapshot_response(request, build_from_snapshot)
+    return await cached_response(request, build)
 
 
 @app.delete("/items/{item_id}", status_code=204)
-def delete_item_endpoint(
-    item_id: int,
-    conn: sqlite3.Connection = Depends(connection_dependency),
-) -> Response:
-    if fetch_item(conn, item_id) is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    delete_item(conn, item_id)
-    conn.commit()
+async def delete_item_endpoint(item_id: int) -> Response:
+    def delete(conn: sqlite3.Connection) -> None:
+        if fetch_item(conn, item_id) is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        delete_item(conn, item_id)
+
+    await run_write(delete)
+    change_feed.notify()
+    item_snapshot.remove(item_id)
     return Response(status_code=204)
 
 
-@app.get("/items/search", response_model=List[ItemRead])
-def search_items_endpoint(
-    term: str = Query(..., min_length=1),
-    conn: sqlite3.Connection = Depends(connection_dependency),
-) -> List[ItemRead]:
-    pattern = f"%{term}%"
-    rows = search_items_db(conn, pattern)
-    return [build_item_output(row) for row in rows]
+@app.get("/categories/reorder-thresholds", response_model=List[CategoryThreshold])
+async def list_category_thresholds_endpoint() -> List[CategoryThreshold]:
+    rows = await run_read(fetch_category_thresholds)
+    return [CategoryThreshold(category=row["category"], reorder_threshold=row["reorder_threshold"]) for row in rows]
+
+
+@app.put("/categories/{category}/reorder-threshold", response_model=CategoryThreshold)
+async def update_category_threshold_endpoint(category: str, payload: ReorderThresholdUpdate) -> CategoryThreshold:
+    # Applies to the category's items without their own threshold, including
+    # items added to the category later.
+    def update(conn: sqlite3.Connection) -> List[tuple]:
+        set_category_reorder_threshold(conn, category, payload.reorder_threshold)
+        insert_change_event(conn, "resync", encode_json({"reason": "reorder_thresholds"}))
+        return fetch_category_items(conn, category, raw=True) if item_snapshot.ready else []
+
+    rows = await run_write(update)
+    change_feed.notify()
+    for row in rows:
+        item_snapshot.upsert(row)
+    return CategoryThreshold(category=category, reorder_threshold=payload.reorder_threshold)
 
 
 @app.post("/movements", response_model=MovementRead, status_code=201)
-def register_movement_endpoint(
-    payload: MovementCreate,
-    conn: sqlite3.Connection = Depends(connection_dependency),
-) -> MovementRead:
+async def register_movement_endpoint(payload: MovementCreate) -> MovementRead:
     if payload.movement_type is MovementKind.INIT:
         raise HTTPException(status_code=400, detail="movement_type must be entry or exit")
+    try:
+        movement_id, record = await movement_writer.register_async(payload)
+    except MovementRejected as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from None
+    except WriterTimeoutError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from None
+    change_feed.notify()
+    item_snapshot.set_stock(record[0], record[5], record[3])
+    return build_batch_movement_output(movement_id, record)
 
-    item = fetch_item(conn, payload.item_id)
-    if item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
 
-    current_quantity = item["quantity"] or 0.0
-    current_price = item["unit_price"] or 0.0
+@app.post(
+    "/movements/batch",
+    response_model=MovementBatchResult,
+    status_code=201,
+    responses={409: {"model": MovementBatchResult}},
+)
+async def register_movement_batch_endpoint(payload: MovementBatchCreate) -> MovementBatchResult:
+    ts = utc_now_us()
 
-    if payload.movement_type is MovementKind.EXIT and payload.quantity > current_quantity:
-        raise HTTPException(status_code=400, detail="Quantity exceeds current stock")
+    def apply(
+        conn: sqlite3.Connection,
+    ) -> Tuple[Dict[int, str], Dict[int, MovementRead], Dict[int, Tuple[float, float]]]:
+        items = fetch_items_by_ids(conn, (movement.item_id for movement in payload.movements))
+        planned, errors, touched = plan_movement_batch(
+            payload.movements,
+            items,
+            fetch_total_inventory(conn),
+            ts,
+        )
+        rejected = dict(errors)
+        if not planned or (payload.mode is BatchMode.ATOMIC and rejected):
+            return rejected, {}, {}
+        update_item_records(
+            conn,
+            ((item_id, quantity, unit_price) for item_id, (quantity, unit_price) in touched.items()),
+        )
+        movement_ids = insert_movements(conn, [record for _, record in planned])
+        applied = {
+            index: build_batch_movement_output(movement_id, record)
+            for (index, record), movement_id in zip(planned, movement_ids)
+        }
+        return rejected, applied, touched
 
-    updated_price = payload.unit_price if payload.unit_price is not None else current_price
-    if payload.movement_type is MovementKind.ENTRY:
-        new_quantity = current_quantity + payload.quantity
-    else:
-        new_quantity = current_quantity - payload.quantity
+    rejected, applied, touched = await run_write(apply)
+    if applied:
+        change_feed.notify()
+    for item_id, (quantity, unit_price) in touched.items():
+        item_snapshot.set_stock(item_id, quantity, unit_price)
 
-    update_item_record(
-        conn,
-        item_id=payload.item_id,
-        quantity=new_quantity,
-        unit_price=updated_price,
-    )
+    results: List[MovementBatchLine] = []
+    for index in range(len(payload.movements)):
+        if index in rejected:
+            results.append(
+                MovementBatchLine(index=index, status=BatchLineStatus.REJECTED, error=rejected[index])
+            )
+        elif index in applied:
+            results.append(
+                MovementBatchLine(index=index, status=BatchLineStatus.APPLIED, movement=applied[index])
+            )
+        else:
+            results.append(MovementBatchLine(index=index, status=BatchLineStatus.SKIPPED))
 
-    timestamp = datetime.utcnow().strftime(DATETIME_FORMAT)
-    total_after = calculate_total_inventory(conn)
-    movement_id = insert_movement(
-        conn,
-        item_id=payload.item_id,
-        movement_type=payload.movement_type.value,
-        quantity=payload.quantity,
-        unit_price=updated_price,
-        timestamp=timestamp,
-        quantity_after=new_quantity,
-        total_value_after=total_after,
+    result = MovementBatchResult(
+        mode=payload.mode,
+        applied=len(applied),
+        rejected=len(rejected),
+        results=results,
     )
-    conn.commit()
+    if rejected and payload.mode is BatchMode.ATOMIC:
+        return JSONResponse(status_code=409, content=result.model_dump(mode="json"))
+    return result
 
-    row = fetch_movement_by_id(conn, movement_id)
-    if row is None:
-        raise HTTPException(status_code=500, detail="Failed to load movement")
-    return build_movement_output(row)
+
+@app.get("/events", response_class=StreamingResponse)
+async def events_endpoint() -> StreamingResponse:
+    # Subscribe before reading the watermark: every movement after it is
+    # published by the change feed, which now counts this subscriber.
+    try:
+        subscription = event_broker.subscribe()
+    except SubscriberLimitError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from None
+    try:
+        last_movement_id = await change_feed.watermark()
+    except BaseException:
+        event_broker.unsubscribe(subscription)
+        raise
+
+    async def stream() -> AsyncIterator[bytes]:
+        try:
+            yield f"retry: {RETRY_MS}\n".encode() + format_event("ready", {"last_movement_id": last_movement_id})
+            while True:
+                chunk = await subscription.next_chunk(HEARTBEAT_SECONDS)
+                if chunk is None:
+                    return
+                yield chunk or KEEP_ALIVE
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return ClosingStreamingResponse(
+        stream(),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/movements", response_model=List[MovementRead])
-def list_movements_endpoint(
+async def list_movements_endpoint(
+    request: Request,
     item_id: Optional[int] = Query(None),
-    limit: Optional[int] = Query(None, ge=1),
-    conn: sqlite3.Connection = Depends(connection_dependency),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before_ts: Optional[datetime] = Query(None),
+    before_id: Optional[int] = Query(None, ge=1),
+    since_id: Optional[int] = Query(None, ge=0),
+    response_format: ResponseFormat = Query(ResponseFormat.JSON, alias="format"),
 ) -> List[MovementRead]:
-    rows = list_movements_rows(conn, item_id=item_id, limit=limit)
-    return [build_movement_output(row) for row in rows]
+    if since_id is not None and (before_ts is not None or before_id is not None):
+        raise HTTPException(status_code=400, detail="since_id cannot be combined with before_ts/before_id")
+    before_ts_us = to_epoch_us(before_ts) if before_ts is not None else None
+    if response_format is ResponseFormat.NDJSON:
+        return ClosingStreamingResponse(
+            stream_rows(
+                lambda stream_conn: iter_movements_rows(
+                    stream_conn,
+                    item_id=item_id,
+                    limit=limit,
+                    before_ts=before_ts_us,
+                    before_id=before_id,
+                    since_id=since_id,
+                    raw=True,
+                ),
+                serialize_movements,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    page_size = limit if limit is not None else DEFAULT_MOVEMENTS_PAGE_SIZE
+
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        rows = list_movements_rows(
+            conn,
+            item_id=item_id,
+            limit=page_size,
+            before_ts=before_ts_us,
+            before_id=before_id,
+            since_id=since_id,
+            raw=True,
+        )
+        return serialize_movements(rows)
+
+    def headers_for(movements: List[Dict[str, Any]]) -> Dict[str, str]:
+        if len(movements) < page_size:
+            return {}
+        last = movements[-1]
+        if since_id is not None:
+            return next_cursor_headers(request, since_id=last["id"])
+        return next_cursor_headers(request, before_ts=last["timestamp"], before_id=last["id"])
+
+    return await cached_response(request, build, headers_for)
+
+
+def series_range(start: Optional[datetime], end: Optional[datetime]) -> tuple[Optional[int], Optional[int]]:
+    start_ts = to_epoch_us(start) if start is not None else None
+    end_ts = to_epoch_us(end) if end is not None else None
+    if start_ts is not None and end_ts is not None and start_ts > end_ts:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return start_ts, end_ts
 
 
 @app.get("/dashboard/total", response_model=List[InventoryPoint])
-def dashboard_total_endpoint(
-    conn: sqlite3.Connection = Depends(connection_dependency),
+async def dashboard_total_endpoint(
+    request: Request,
+    bucket: Optional[SeriesBucket] = Query(None),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_SERIES_POINTS),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
 ) -> List[InventoryPoint]:
-    rows = fetch_inventory_series(conn)
-    return build_inventory_points(rows)
+    start_ts, end_ts = series_range(start, end)
+
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        rows = fetch_inventory_series(
+            conn,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_us=BUCKET_WIDTH_US[bucket] if bucket is not None else None,
+            raw=True,
+        )
+        if max_points is not None:
+            rows = downsample_lttb(rows, max_points)
+        return serialize_inventory_points(rows)
+
+    return await cached_response(request, build)
+
+
+@app.get("/dashboard/items", response_model=Dict[int, List[ItemQuantityPoint]])
+async def dashboard_items_quantity_endpoint(
+    request: Request,
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$"),
+    bucket: Optional[SeriesBucket] = Query(None),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_SERIES_POINTS),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+) -> Dict[int, List[ItemQuantityPoint]]:
+    # Several item series in one round trip and one query; unknown ids are
+    # left out of the map instead of failing the whole request.
+    item_ids = list(dict.fromkeys(int(item_id) for item_id in ids.split(",")))
+    if len(item_ids) > MAX_SERIES_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SERIES_ITEMS} ids per request")
+    start_ts, end_ts = series_range(start, end)
+
+    def build(conn: sqlite3.Connection) -> Dict[str, List[Dict[str, Any]]]:
+        series = fetch_items_series(
+            conn,
+            item_ids,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_us=BUCKET_WIDTH_US[bucket] if bucket is not None else None,
+        )
+        payload: Dict[str, List[Dict[str, Any]]] = {}
+        for item_id, rows in series.items():
+            if max_points is not None:
+                rows = downsample_lttb(rows, max_points)
+            payload[str(item_id)] = serialize_item_quantity_points(rows)
+        return payload
+
+    return await cached_response(request, build)
 
 
 @app.get("/dashboard/items/{item_id}", response_model=List[ItemQuantityPoint])
-def dashboard_item_quantity_endpoint(
+async def dashboard_item_quantity_endpoint(
     item_id: int,
-    conn: sqlite3.Connection = Depends(connection_dependency),
+    request: Request,
+    bucket: Optional[SeriesBucket] = Query(None),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_SERIES_POINTS),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
 ) -> List[ItemQuantityPoint]:
-    if fetch_item(conn, item_id) is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    rows = fetch_item_series(conn, item_id)
-    return build_item_quantity_points(rows)
+    start_ts, end_ts = series_range(start, end)
+
+    def build(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        if fetch_item(conn, item_id) is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        rows = fetch_item_series(
+            conn,
+            item_id,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            bucket_us=BUCKET_WIDTH_US[bucket] if bucket is not None else None,
+            raw=True,
+        )
+        if max_points is not None:
+            rows = downsample_lttb(rows, max_points)
+        return serialize_item_quantity_points(rows)
+
+    return await cached_response(request, build)
+
+
+@app.get("/reports/abc", response_model=ABCReport)
+async def abc_report_endpoint(
+    request: Request,
+    a: float = Query(0.8, gt=0, le=1),
+    b: float = Query(0.95, gt=0, le=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_REPORT_PAGE_SIZE),
+) -> ABCReport:
+    if a > b:
+        raise HTTPException(status_code=400, detail="Threshold a must not exceed b")
+
+    def build(conn: sqlite3.Connection) -> ABCReport:
+        summary_rows = fetch_abc_summary(conn, a=a, b=b)
+        rows = fetch_abc_rows(conn, a=a, b=b, offset=offset, limit=limit)
+        next_offset = offset + limit if len(rows) == limit else None
+        return build_abc_report(summary_rows, rows, a=a, b=b, next_offset=next_offset)
+
+    return await cached_response(request, build)
+
+
+@app.get("/reports/analytics", response_model=AnalyticsReport)
+async def analytics_report_endpoint(
+    request: Request,
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    dead_stock_days: int = Query(DEFAULT_DEAD_STOCK_DAYS, ge=1, le=3650),
+    sort: AnalyticsSort = Query(AnalyticsSort.DAYS_OF_SUPPLY),
+    dead_stock: bool = Query(False),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_REPORT_PAGE_SIZE),
+) -> AnalyticsReport:
+    start_us = to_epoch_us(start) if start is not None else None
+    end_us = to_epoch_us(end) if end is not None else None
+    if start_us is not None and start_us >= (utc_now_us() if end_us is None else end_us):
+        raise HTTPException(status_code=400, detail="start must be before end")
+    # Without end the window ends now. The current bucket goes in the cache
+    # keys only, so a report cached on a quiet database still moves on with
+    # time while every write is counted as soon as it commits.
+    bucket = now_bucket() if end_us is None else None
+
+    def build(conn: sqlite3.Connection) -> AnalyticsReport:
+        data = analytics_loader.load(
+            conn, revision=fetch_revision(conn), start_ts=start_us, end_ts=end_us, bucket=bucket
+        )
+        result = summarize_analytics(
+            conn,
+            data,
+            dead_stock_days=dead_stock_days,
+            sort=sort,
+            dead_stock_only=dead_stock,
+            offset=offset,
+            limit=limit,
+        )
+        return build_analytics_report(result)
+
+    return await cached_response(request, build, variant=bucket)
+
+
+@app.get("/reports/summary", response_model=ReportSummary)
+async def report_summary_endpoint(
+    request: Request,
+    top: int = Query(5, ge=1, le=MAX_TOP_ITEMS),
+) -> ReportSummary:
+    def build(conn: sqlite3.Connection) -> ReportSummary:
+        category_rows = fetch_category_summary(conn)
+        top_rows = fetch_top_items_by_value(conn, limit=top)
+        return build_report_summary(category_rows, top_rows)
+
+    if item_snapshot.ready:
+        # Built once per snapshot version, top items from the same columns as the categories.
+        return snapshot_response(
+            request,
+            lambda columns: build_report_summary(
+                columns.category_rows(), [dict(zip(ITEM_FIELDS, row)) for row in columns.top_rows(top)]
+            ),
+        )
+    return await cached_response(request, build)
+
+
+@app.get("/reports/valuation", response_model=ValuationReport)
+async def valuation_report_endpoint(
+    request: Request,
+    as_of: Optional[datetime] = Query(None),
+) -> ValuationReport:
+    as_of_us = to_epoch_us(as_of) if as_of is not None else None
+
+    def build(conn: sqlite3.Connection) -> ValuationReport:
+        category_rows = fetch_category_summary(conn, as_of=as_of_us)
+        return build_valuation_report(category_rows, as_of=as_of)
 
+    if item_snapshot.ready and as_of_us is None:
+        return snapshot_response(request, lambda columns: build_valuation_report(columns.category_rows(), as_of=None))
+    return await cached_response(request, build)
 
 __all__ = ["app"]
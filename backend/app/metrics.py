@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_ENABLED = os.environ.get("MRP_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_SECONDS = float(os.environ.get("MRP_SLOW_QUERY_MS", "100")) / 1000
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+F = TypeVar("F", bound=Callable[..., Any])
+M = TypeVar("M")
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last one is +Inf), sum, count];
+        # counts are made cumulative only when rendered.
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()
+            )
+        names = self.labels + ("le",)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {count}"
+
+
+Metric = Any
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Metric]]) -> None:
+        # collect() builds fresh metrics at scrape time (pool sizes, queue depths, ...).
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.register(
+    Counter("mrp_http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status"))
+)
+HTTP_LATENCY = registry.register(
+    Histogram("mrp_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+)
+HTTP_IN_FLIGHT = registry.register(Gauge("mrp_http_requests_in_flight", "HTTP requests being served."))
+DB_QUERY_LATENCY = registry.register(
+    Histogram("mrp_db_query_duration_seconds", "Time spent in database.py query functions.", ("query",))
+)
+DB_SLOW_QUERIES = registry.register(
+    Counter(
+        "mrp_db_slow_queries_total",
+        f"Query function calls slower than {SLOW_QUERY_SECONDS * 1000:g} ms (MRP_SLOW_QUERY_MS).",
+        ("query",),
+    )
+)
+DB_STATEMENTS = registry.register(
+    Counter("mrp_db_statements_total", "SQL statements run on pooled connections, by verb.", ("verb",))
+)
+
+
+def observe_query(name: str, elapsed: float) -> None:
+    DB_QUERY_LATENCY.observe(elapsed, name)
+    if elapsed >= SLOW_QUERY_SECONDS:
+        DB_SLOW_QUERIES.inc(name)
+        logger.warning("Slow query %s took %.1f ms", name, elapsed * 1000)
+
+
+def timed_query(fn: F) -> F:
+    # Applied at import time: with metrics disabled the function is returned
+    # untouched, so the disabled path costs nothing per call.
+    if not METRICS_ENABLED:
+        return fn
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe_query(name, time.perf_counter() - started)
+
+    return timed  # type: ignore[return-value]
+
+
+def trace_statement(statement: str) -> None:
+    # sqlite3 trace callback; statements run by triggers arrive as "-- TRIGGER ...".
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if verb == "--":
+        verb = "TRIGGER"
+    elif not verb.isalpha():
+        verb = "OTHER"
+    DB_STATEMENTS.inc(verb)
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware, so streaming bodies pass through untouched and the
+    # latency covers the whole response. Requests are labelled with the route
+    # template (/items/{item_id}), never the raw path, to keep cardinality fixed.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(elapsed, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import hmac
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple, TypeVar
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILER_TOKEN = os.environ.get("MRP_PROFILER_TOKEN") or None
+PROFILER_ENABLED = PROFILER_TOKEN is not None
+DEFAULT_INTERVAL_MS = float(os.environ.get("MRP_PROFILER_INTERVAL_MS", "5"))
+REQUEST_INTERVAL_MS = 1.0
+MAX_WINDOW_SECONDS = 120
+MAX_STACK_DEPTH = 128
+STORED_PROFILES = 32
+
+T = TypeVar("T")
+
+TOKEN_HEADER = "x-profiler-token"
+PROFILE_HEADER = "x-profile"
+PROFILE_OPT_IN = ("1", "true")
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Threads that serve every request; a per-request profile samples them while
+# the request is in flight, so their samples may include concurrent requests.
+SHARED_THREAD_NAMES = ("movement-writer",)
+
+# Leaf frames of threads parked waiting for work (event loop select, pool
+# workers, queue and condition waits); left out unless idle samples are asked for.
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+SERIALIZATION_MODULES = ("json", "orjson", "pydantic", "pydantic_core", "fastapi.encoders")
+SERIALIZATION_FUNCTIONS = ("serialize_", "encode_json", "stream_ndjson", "_json_default", "format_timestamp")
+
+
+class FrameKey(NamedTuple):
+    filename: str
+    lineno: int
+    function: str
+    module: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.module}:{self.function}"
+
+
+def token_matches(candidate: Optional[str]) -> bool:
+    if PROFILER_TOKEN is None or candidate is None:
+        return False
+    return hmac.compare_digest(candidate.encode(), PROFILER_TOKEN.encode())
+
+
+def frame_category(frame: FrameKey) -> Optional[str]:
+    module, function = frame.module, frame.function
+    if module == "app.database":
+        return "database"
+    if module == "app.services":
+        if function.startswith("build_"):
+            return "build"
+        if function.startswith(SERIALIZATION_FUNCTIONS):
+            return "serialization"
+    if any(module == name or module.startswith(name + ".") for name in SERIALIZATION_MODULES):
+        return "serialization"
+    return None
+
+
+class Profile:
+    def __init__(self, stacks: Counter, *, interval: float, duration: float, mode: str) -> None:
+        self.stacks = stacks
+        self.interval = interval
+        self.duration = duration
+        self.mode = mode
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        # Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno):
+        # "thread;outer;...;inner count", one line per distinct stack.
+        lines = [
+            ";".join(frame.label if isinstance(frame, FrameKey) else frame for frame in stack) + f" {count}"
+            for stack, count in sorted(self.stacks.items(), key=lambda entry: -entry[1])
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def _frame_totals(self) -> Tuple[Counter, Counter, Dict[FrameKey, Counter]]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        callers: Dict[FrameKey, Counter] = {}
+        for stack, count in self.stacks.items():
+            frames = [frame for frame in stack if isinstance(frame, FrameKey)]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+            for caller, callee in zip(frames, frames[1:]):
+                callers.setdefault(callee, Counter())[caller] += count
+        return own, total, callers
+
+    def pstats_bytes(self) -> bytes:
+        # Same marshal layout cProfile writes, so pstats.Stats(path), snakeviz
+        # and gprof2dot load it; times are sample counts times the interval.
+        own, total, callers = self._frame_totals()
+        stats = {}
+        for frame in total:
+            key = (frame.filename, frame.lineno, frame.function)
+            calls = total[frame]
+            frame_callers = {
+                (caller.filename, caller.lineno, caller.function): (count, count, 0.0, count * self.interval)
+                for caller, count in callers.get(frame, Counter()).items()
+            }
+            stats[key] = (calls, calls, own[frame] * self.interval, calls * self.interval, frame_callers)
+        return marshal.dumps(stats)
+
+    def summary(self, *, top: int = 25) -> Dict[str, object]:
+        categories: Counter = Counter()
+        for stack, count in self.stacks.items():
+            category = "other"
+            for frame in reversed(stack):
+                if isinstance(frame, FrameKey):
+                    found = frame_category(frame)
+                    if found is not None:
+                        category = found
+                        break
+            categories[category] += count
+        own, total, _ = self._frame_totals()
+        samples = self.samples
+
+        def share(count: int) -> float:
+            return round(count / samples, 4) if samples else 0.0
+
+        return {
+            "mode": self.mode,
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "categories": {
+                name: {"samples": count, "share": share(count)} for name, count in categories.most_common()
+            },
+            "top_self": [
+                {"frame": frame.label, "samples": count, "share": share(count)}
+                for frame, count in own.most_common(top)
+            ],
+            "top_total": [
+                {"frame": frame.label, "samples": count, "share": share(count)}
+                for frame, count in total.most_common(top)
+            ],
+        }
+
+
+class Sampler:
+    # Statistical profiler: a daemon thread snapshots sys._current_frames()
+    # every interval, so the profiled threads run unmodified (no tracing hooks).
+    def __init__(
+        self,
+        *,
+        interval: float,
+        threads: Optional[Callable[[], Set[int]]] = None,
+        include_idle: bool = False,
+        mode: str = "window",
+    ) -> None:
+        self.interval = interval
+        self.threads = threads
+        self.include_idle = include_idle
+        self.mode = mode
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._code_keys: Dict[object, FrameKey] = {}
+
+    def start(self) -> "Sampler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="mrp-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return Profile(
+            self._stacks,
+            interval=self.interval,
+            duration=time.perf_counter() - self._started,
+            mode=self.mode,
+        )
+
+    def _frame_key(self, frame) -> FrameKey:
+        code = frame.f_code
+        key = self._code_keys.get(code)
+        if key is None:
+            key = self._code_keys[code] = FrameKey(
+                code.co_filename,
+                code.co_firstlineno,
+                getattr(code, "co_qualname", code.co_name),
+                frame.f_globals.get("__name__", "?"),
+            )
+        return key
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            wanted = self.threads() if self.threads is not None else None
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (wanted is not None and ident not in wanted):
+                    continue
+                stack: List[FrameKey] = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._frame_key(frame))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                leaf = stack[0]
+                leaf_name = (os.path.basename(leaf.filename), leaf.function.rsplit(".", 1)[-1])
+                if not self.include_idle and leaf_name in IDLE_FRAMES:
+                    continue
+                stack.reverse()
+                self._stacks[(names.get(ident, str(ident)),) + tuple(stack)] += 1
+
+
+class RequestSession:
+    def __init__(self) -> None:
+        self.threads: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def attach(self, ident: int) -> None:
+        with self._lock:
+            self.threads.add(ident)
+
+    def detach(self, ident: int) -> None:
+        with self._lock:
+            self.threads.discard(ident)
+
+    def snapshot(self) -> Set[int]:
+        with self._lock:
+            threads = set(self.threads)
+        threads.update(thread.ident for thread in threading.enumerate() if thread.name in SHARED_THREAD_NAMES)
+        return threads
+
+
+current_session: ContextVar[Optional[RequestSession]] = ContextVar("profile_session", default=None)
+
+
+def attached(session: RequestSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Runs fn on a worker thread on behalf of a profiled request.
+    ident = threading.get_ident()
+    session.attach(ident)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        session.detach(ident)
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class ProfileStore:
+    def __init__(self, capacity: int = STORED_PROFILES) -> None:
+        self.capacity = capacity
+        self._profiles: OrderedDict[str, Profile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, profile_id: str, profile: Profile) -> None:
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.capacity:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+profile_store = ProfileStore()
+window_lock = threading.Lock()
+
+
+class ProfilerMiddleware:
+    # Requests sent with "X-Profile: 1" (or "true") and a valid X-Profiler-Token are sampled
+    # on the event loop thread, on executor threads while they run the
+    # request's database calls, and on the shared writer thread. The response
+    # is unchanged apart from an X-Profile-Id header naming the stored profile.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        opted_in = (headers.get(PROFILE_HEADER) or "").strip().lower() in PROFILE_OPT_IN
+        if not opted_in or not token_matches(headers.get(TOKEN_HEADER)):
+            await self.app(scope, receive, send)
+            return
+
+        session = RequestSession()
+        session.attach(threading.get_ident())
+        sampler = Sampler(interval=REQUEST_INTERVAL_MS / 1000, threads=session.snapshot, mode="request").start()
+        token = current_session.set(session)
+        profile_id: Optional[str] = None
+
+        async def send_with_profile(message: Message) -> None:
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                # The id is handed out up front; the profile is stored once the
+                # body has been sent, so it covers streaming responses too.
+                profile_id = new_profile_id()
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_session.reset(token)
+            profile = sampler.stop()
+            if profile_id is not None:
+                profile_store.put(profile_id, profile)
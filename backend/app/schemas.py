@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -13,12 +13,41 @@ class MovementKind(str, Enum):
     EXIT = "exit"
 
 
+class ResponseFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ProfileFormat(str, Enum):
+    SUMMARY = "summary"
+    COLLAPSED = "collapsed"
+    PSTATS = "pstats"
+
+
+class ABCClass(str, Enum):
+    A = "A"
+    B = "B"
+    C = "C"
+
+
+class SeriesBucket(str, Enum):
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+
 class ItemBase(BaseModel):
     name: str = Field(..., min_length=1)
     category: str = Field(..., min_length=1)
     unit: str = Field(..., min_length=1)
     quantity: float = Field(..., ge=0)
     unit_price: float = Field(..., ge=0)
+    reorder_threshold: Optional[float] = Field(None, ge=0)
 
 
 class ItemCreate(ItemBase):
@@ -29,6 +58,33 @@ class ItemRead(ItemBase):
     id: int
     total_value: float
     low_stock: bool
+    low_stock_threshold: float
+
+
+class LowStockItem(ItemRead):
+    shortfall: float
+
+
+class LowStockSort(str, Enum):
+    SHORTFALL = "shortfall"
+    ID = "id"
+
+
+class AnalyticsSort(str, Enum):
+    DAYS_OF_SUPPLY = "days_of_supply"
+    TURNOVER = "turnover"
+    CONSUMPTION = "consumption"
+    ID = "id"
+
+
+class ReorderThresholdUpdate(BaseModel):
+    # null clears the setting (item: use the category's; category: use the default).
+    reorder_threshold: Optional[float] = Field(..., ge=0)
+
+
+class CategoryThreshold(BaseModel):
+    category: str
+    reorder_threshold: Optional[float]
 
 
 class MovementCreate(BaseModel):
@@ -38,6 +94,22 @@ class MovementCreate(BaseModel):
     unit_price: Optional[float] = Field(None, ge=0)
 
 
+class BatchMode(str, Enum):
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+
+class BatchLineStatus(str, Enum):
+    APPLIED = "applied"
+    REJECTED = "rejected"
+    SKIPPED = "skipped"
+
+
+class MovementBatchCreate(BaseModel):
+    movements: List[MovementCreate] = Field(..., min_length=1, max_length=10000)
+    mode: BatchMode = BatchMode.ATOMIC
+
+
 class MovementRead(BaseModel):
     id: int
     item_id: int
@@ -57,3 +129,117 @@ class InventoryPoint(BaseModel):
 class ItemQuantityPoint(BaseModel):
     timestamp: datetime
     quantity: float
+
+
+class MovementBatchLine(BaseModel):
+    index: int
+    status: BatchLineStatus
+    movement: Optional[MovementRead] = None
+    error: Optional[str] = None
+
+
+class MovementBatchResult(BaseModel):
+    mode: BatchMode
+    applied: int
+    rejected: int
+    results: List[MovementBatchLine]
+
+
+class ImportRejectedRow(BaseModel):
+    line: int
+    error: str
+
+
+class ItemImportResult(BaseModel):
+    imported: int
+    rejected: int
+    errors: List[ImportRejectedRow]
+    errors_truncated: bool
+
+
+class ABCThresholds(BaseModel):
+    a: float
+    b: float
+
+
+class ABCClassSummary(BaseModel):
+    count: int
+    share: float
+    total_value: float
+
+
+class ABCItem(ItemRead):
+    rank: int
+    contribution: float
+    cumulative: float
+    abc_class: ABCClass
+
+
+class ABCReport(BaseModel):
+    thresholds: ABCThresholds
+    total_value: float
+    item_count: int
+    summary: Dict[ABCClass, ABCClassSummary]
+    rows: List[ABCItem]
+    next_offset: Optional[int] = None
+
+
+class CategorySummary(BaseModel):
+    category: str
+    item_count: int
+    total_quantity: float
+    total_value: float
+    low_stock_count: int
+
+
+class ReportSummary(BaseModel):
+    item_count: int
+    total_quantity: float
+    total_value: float
+    low_stock_count: int
+    categories: List[CategorySummary]
+    top_items: List[ItemRead]
+
+
+class ValuationReport(BaseModel):
+    as_of: Optional[datetime] = None
+    item_count: int
+    total_quantity: float
+    total_value: float
+    low_stock_count: int
+    categories: List[CategorySummary]
+
+
+class ItemAnalytics(BaseModel):
+    id: int
+    name: str
+    category: str
+    unit: str
+    quantity: float
+    unit_price: float
+    total_value: float
+    movements: int
+    consumed_quantity: float
+    consumed_value: float
+    received_quantity: float
+    average_quantity: Optional[float] = None
+    average_daily_consumption: Optional[float] = None
+    turnover: Optional[float] = None
+    days_of_supply: Optional[float] = None
+    last_exit_at: Optional[datetime] = None
+    dead_stock: bool
+
+
+class AnalyticsReport(BaseModel):
+    start: Optional[datetime] = None
+    end: datetime
+    dead_stock_days: int
+    engine: str
+    item_count: int
+    movements: int
+    inventory_value: float
+    consumed_value: float
+    dead_stock_count: int
+    dead_stock_value: float
+    rows: List[ItemAnalytics]
+    next_offset: Optional[int] = None
@@ -1,18 +1,45 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Iterable, List
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .database import DATETIME_FORMAT
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from .analytics import AnalyticsResult
+from .database import EPOCH, from_epoch_us
+
+try:
+    import orjson
+except ImportError:  # optional speedup, falls back to the stdlib encoder
+    orjson = None
 from .schemas import (
-    InventoryPoint,
-    ItemQuantityPoint,
+    ABCClass,
+    ABCClassSummary,
+    ABCItem,
+    ABCReport,
+    ABCThresholds,
+    AnalyticsReport,
+    CategorySummary,
+    ItemAnalytics,
     ItemRead,
+    MovementCreate,
     MovementKind,
     MovementRead,
+    ReportSummary,
+    SeriesBucket,
+    ValuationReport,
 )
 
-LOW_STOCK_THRESHOLD = 5
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+BUCKET_WIDTH_US = {
+    SeriesBucket.MINUTE: 60 * 1_000_000,
+    SeriesBucket.HOUR: 3600 * 1_000_000,
+    SeriesBucket.DAY: 86400 * 1_000_000,
+}
 
 
 def build_item_output(row) -> ItemRead:
@@ -25,13 +52,104 @@ def build_item_output(row) -> ItemRead:
         unit=row["unit"],
         quantity=quantity,
         unit_price=unit_price,
+        reorder_threshold=row["reorder_threshold"],
         total_value=quantity * unit_price,
-        low_stock=quantity < LOW_STOCK_THRESHOLD,
+        low_stock=quantity < row["low_stock_threshold"],
+        low_stock_threshold=row["low_stock_threshold"],
+    )
+
+
+def build_abc_report(
+    summary_rows: Iterable,
+    rows: Iterable,
+    *,
+    a: float,
+    b: float,
+    next_offset: Optional[int],
+) -> ABCReport:
+    summary = {klass: ABCClassSummary(count=0, share=0.0, total_value=0.0) for klass in ABCClass}
+    for row in summary_rows:
+        summary[ABCClass(row["abc_class"])] = ABCClassSummary(
+            count=row["item_count"],
+            share=row["share"],
+            total_value=row["total_value"],
+        )
+    items = [
+        ABCItem(
+            **build_item_output(row).model_dump(),
+            rank=row["rank"],
+            contribution=row["contribution"],
+            cumulative=row["cumulative"],
+            abc_class=ABCClass(row["abc_class"]),
+        )
+        for row in rows
+    ]
+    return ABCReport(
+        thresholds=ABCThresholds(a=a, b=b),
+        total_value=sum(entry.total_value for entry in summary.values()),
+        item_count=sum(entry.count for entry in summary.values()),
+        summary=summary,
+        rows=items,
+        next_offset=next_offset,
+    )
+
+
+def build_category_summaries(category_rows: Iterable) -> List[CategorySummary]:
+    return [
+        CategorySummary(
+            category=row["category"],
+            item_count=row["item_count"],
+            total_quantity=row["total_quantity"] or 0.0,
+            total_value=row["total_value"] or 0.0,
+            low_stock_count=row["low_stock_count"] or 0,
+        )
+        for row in category_rows
+    ]
+
+
+def build_report_summary(category_rows: Iterable, top_rows: Iterable) -> ReportSummary:
+    categories = build_category_summaries(category_rows)
+    return ReportSummary(
+        item_count=sum(entry.item_count for entry in categories),
+        total_quantity=sum(entry.total_quantity for entry in categories),
+        total_value=sum(entry.total_value for entry in categories),
+        low_stock_count=sum(entry.low_stock_count for entry in categories),
+        categories=categories,
+        top_items=[build_item_output(row) for row in top_rows],
+    )
+
+
+def build_valuation_report(category_rows: Iterable, *, as_of: Optional[datetime]) -> ValuationReport:
+    categories = build_category_summaries(category_rows)
+    return ValuationReport(
+        as_of=as_of,
+        item_count=sum(entry.item_count for entry in categories),
+        total_quantity=sum(entry.total_quantity for entry in categories),
+        total_value=sum(entry.total_value for entry in categories),
+        low_stock_count=sum(entry.low_stock_count for entry in categories),
+        categories=categories,
+    )
+
+
+def build_analytics_report(result: AnalyticsResult) -> AnalyticsReport:
+    return AnalyticsReport(
+        start=from_epoch_us(result.start_ts) if result.start_ts is not None else None,
+        end=from_epoch_us(result.end_ts),
+        dead_stock_days=result.dead_stock_days,
+        engine=result.engine,
+        item_count=result.item_count,
+        movements=result.movements,
+        inventory_value=result.inventory_value,
+        consumed_value=result.consumed_value,
+        dead_stock_count=result.dead_stock_count,
+        dead_stock_value=result.dead_stock_value,
+        rows=[ItemAnalytics(**row) for row in result.rows],
+        next_offset=result.next_offset,
     )
 
 
 def build_movement_output(row) -> MovementRead:
-    timestamp = datetime.strptime(row["timestamp"], DATETIME_FORMAT)
+    timestamp = from_epoch_us(row["ts"])
     return MovementRead(
         id=row["id"],
         item_id=row["item_id"],
@@ -44,27 +162,203 @@ def build_movement_output(row) -> MovementRead:
     )
 
 
-def build_inventory_points(rows: Iterable) -> List[InventoryPoint]:
-    points: List[InventoryPoint] = []
-    for row in rows:
-        timestamp = datetime.strptime(row["timestamp"], DATETIME_FORMAT)
-        points.append(
-            InventoryPoint(
-                timestamp=timestamp,
-                total_value=row["total_value_after"],
+def downsample_lttb(rows: Sequence, max_points: int) -> Sequence:
+    # Largest-Triangle-Three-Buckets: keeps first/last points and, per bucket,
+    # the point forming the largest triangle with its neighbours, which
+    # preserves peaks and troughs far better than striding.
+    count = len(rows)
+    if max_points >= count or max_points < 3:
+        return rows
+    # Rows are (ts, value) pairs, as returned by the series queries.
+    xs = [row[0] for row in rows]
+    ys = [row[1] for row in rows]
+    sampled = [rows[0]]
+    every = (count - 2) / (max_points - 2)
+    selected = 0
+    for bucket in range(max_points - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_start = end
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[count - 1], ys[count - 1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        anchor_x, anchor_y = xs[selected], ys[selected]
+        best_area = -1.0
+        best = start
+        for index in range(start, end):
+            area = abs(
+                (anchor_x - avg_x) * (ys[index] - anchor_y)
+                - (anchor_x - xs[index]) * (avg_y - anchor_y)
             )
+            if area > best_area:
+                best_area = area
+                best = index
+        sampled.append(rows[best])
+        selected = best
+    sampled.append(rows[count - 1])
+    return sampled
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    # Same settings as starlette's JSONResponse.
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=65536)
+def _iso_second(seconds: int) -> str:
+    return (EPOCH + timedelta(seconds=seconds)).isoformat()
+
+
+def format_timestamp(ts: int) -> str:
+    # Matches pydantic's datetime serialization (fraction omitted when zero);
+    # consecutive rows mostly share a second, so the prefix is cached.
+    seconds, micros = divmod(ts, 1_000_000)
+    if micros:
+        return f"{_iso_second(seconds)}.{micros:06d}"
+    return _iso_second(seconds)
+
+
+# The serialize_* helpers take raw tuple rows (see database.row_cursor) and
+# return plain dicts with the same keys, order and values as the pydantic
+# response models, skipping per-row model construction and validation.
+def serialize_items(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    for item_id, name, category, unit, quantity, unit_price, reorder_threshold, low_stock_threshold in rows:
+        quantity = quantity or 0.0
+        unit_price = unit_price or 0.0
+        items.append(
+            {
+                "name": name,
+                "category": category,
+                "unit": unit,
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "reorder_threshold": reorder_threshold,
+                "id": item_id,
+                "total_value": quantity * unit_price,
+                "low_stock": quantity < low_stock_threshold,
+                "low_stock_threshold": low_stock_threshold,
+            }
         )
-    return points
+    return items
+
+
+def serialize_low_stock_items(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    items = serialize_items(rows)
+    for item in items:
+        item["shortfall"] = item["low_stock_threshold"] - item["quantity"]
+    return items
+
+
+def serialize_movements(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": movement_id,
+            "item_id": item_id,
+            "movement_type": movement_type,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "timestamp": format_timestamp(ts),
+            "quantity_after": quantity_after,
+            "total_value_after": total_value_after,
+        }
+        for movement_id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after in rows
+    ]
+
 
+def serialize_inventory_points(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    return [{"timestamp": format_timestamp(ts), "total_value": value} for ts, value in rows]
 
-def build_item_quantity_points(rows: Iterable) -> List[ItemQuantityPoint]:
-    series: List[ItemQuantityPoint] = []
-    for row in rows:
-        timestamp = datetime.strptime(row["timestamp"], DATETIME_FORMAT)
-        series.append(
-            ItemQuantityPoint(
-                timestamp=timestamp,
-                quantity=row["quantity_after"],
+
+def serialize_item_quantity_points(rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+    return [{"timestamp": format_timestamp(ts), "quantity": quantity} for ts, quantity in rows]
+
+
+def stream_ndjson(chunks: Iterable[List], serialize: Callable[[List], List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(encode_json(entry) + b"\n" for entry in serialize(rows))
+
+
+def plan_movement_batch(
+    payloads: Sequence[MovementCreate],
+    items: Iterable,
+    total_value: float,
+    ts: int,
+) -> Tuple[List[Tuple[int, tuple]], List[Tuple[int, str]], Dict[int, Tuple[float, float]]]:
+    # Replays the batch in order against in-memory item state, so several lines
+    # for the same item see each other's effect exactly as sequential POSTs would.
+    state: Dict[int, Tuple[float, float]] = {
+        row["id"]: (row["quantity"] or 0.0, row["unit_price"] or 0.0) for row in items
+    }
+    touched: Dict[int, Tuple[float, float]] = {}
+    planned: List[Tuple[int, tuple]] = []
+    errors: List[Tuple[int, str]] = []
+    for index, payload in enumerate(payloads):
+        if payload.movement_type is MovementKind.INIT:
+            errors.append((index, "movement_type must be entry or exit"))
+            continue
+        current = state.get(payload.item_id)
+        if current is None:
+            errors.append((index, "Item not found"))
+            continue
+        current_quantity, current_price = current
+        if payload.movement_type is MovementKind.EXIT and payload.quantity > current_quantity:
+            errors.append((index, "Quantity exceeds current stock"))
+            continue
+
+        updated_price = payload.unit_price if payload.unit_price is not None else current_price
+        if payload.movement_type is MovementKind.ENTRY:
+            new_quantity = current_quantity + payload.quantity
+        else:
+            new_quantity = current_quantity - payload.quantity
+
+        total_value += new_quantity * updated_price - current_quantity * current_price
+        state[payload.item_id] = touched[payload.item_id] = (new_quantity, updated_price)
+        planned.append(
+            (
+                index,
+                (
+                    payload.item_id,
+                    payload.movement_type.value,
+                    payload.quantity,
+                    updated_price,
+                    ts,
+                    new_quantity,
+                    total_value,
+                ),
             )
         )
-    return series
+    return planned, errors, touched
+
+
+def build_batch_movement_output(movement_id: int, record: tuple) -> MovementRead:
+    item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after = record
+    return MovementRead(
+        id=movement_id,
+        item_id=item_id,
+        movement_type=MovementKind(movement_type),
+        quantity=quantity,
+        unit_price=round(unit_price, 4),
+        timestamp=from_epoch_us(ts),
+        quantity_after=quantity_after,
+        total_value_after=round(total_value_after, 2),
+    )
@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import operator
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .async_database import run_read
+from .database import (
+    fetch_all_items,
+    fetch_change_watermarks,
+    fetch_changes_since,
+    fetch_items_by_ids,
+    fetch_revision,
+    get_connection,
+    iter_items,
+)
+
+ITEM_SNAPSHOT_ENABLED = os.environ.get("MRP_ITEM_SNAPSHOT", "").strip().lower() in ("1", "true", "yes", "on")
+SNAPSHOT_SYNC_SECONDS = float(os.environ.get("MRP_ITEM_SNAPSHOT_SYNC_MS", "1000")) / 1000
+SNAPSHOT_VERIFY_SECONDS = float(os.environ.get("MRP_ITEM_SNAPSHOT_VERIFY_SECONDS", "10"))
+SNAPSHOT_VERIFY_BATCH = int(os.environ.get("MRP_ITEM_SNAPSHOT_VERIFY_BATCH", "5000"))
+# More changed rows than this since the last sync and a full reload is cheaper.
+SNAPSHOT_MAX_CHANGES = 5000
+
+# Same order as database.ITEM_COLUMNS, so rows go straight to serialize_items.
+ITEM_FIELDS = ("id", "name", "category", "unit", "quantity", "unit_price", "reorder_threshold", "low_stock_threshold")
+ItemRow = Tuple[int, str, str, str, float, float, Optional[float], float]
+
+logger = logging.getLogger(__name__)
+
+
+class ItemColumns:
+    # Columnar copy of the items table: one typed array per column, indexed by
+    # position. ids ascend, so a lookup is a bisect over them instead of a
+    # dict, which at 1M items would take more memory than every column put
+    # together. Names share one UTF-8 blob; categories and units are codes into
+    # small string tables. Deleted items are tombstoned until the next reload.
+    # Per-category totals are kept up to date with every change.
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.alive = bytearray()
+        self.quantity = array("d")
+        self.unit_price = array("d")
+        self.reorder_threshold = array("d")  # NaN when the item has none
+        self.low_stock_threshold = array("d")
+        self.category = array("I")
+        self.unit = array("I")
+        self.name_start = array("Q")
+        self.name_length = array("I")
+        self.names = bytearray()
+        self.categories: List[str] = []
+        self.units: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._unit_codes: Dict[str, int] = {}
+        # category code -> [item_count, total_quantity, total_value, low_stock_count]
+        self.totals: Dict[int, List[float]] = {}
+        self.count = 0
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Sequence[tuple]]) -> "ItemColumns":
+        # Rows in id order, as iter_items returns them.
+        columns = cls()
+        for chunk in chunks:
+            columns._extend(chunk)
+        return columns
+
+    def _extend(self, rows: Sequence[tuple]) -> None:
+        start = len(self.ids)
+        encoded = [row[1].encode() for row in rows]
+        offset = len(self.names)
+        for name in encoded:
+            self.name_start.append(offset)
+            offset += len(name)
+        self.names += b"".join(encoded)
+        self.name_length.extend(len(name) for name in encoded)
+        self.ids.extend(row[0] for row in rows)
+        self.alive.extend(b"\x01" * len(rows))
+        self.category.extend(self._code(row[2], self.categories, self._category_codes) for row in rows)
+        self.unit.extend(self._code(row[3], self.units, self._unit_codes) for row in rows)
+        self.quantity.extend(row[4] or 0.0 for row in rows)
+        self.unit_price.extend(row[5] or 0.0 for row in rows)
+        self.reorder_threshold.extend(math.nan if row[6] is None else row[6] for row in rows)
+        self.low_stock_threshold.extend(row[7] for row in rows)
+        for position in range(start, len(self.ids)):
+            self._account(position, 1)
+
+    @staticmethod
+    def _code(value: str, table: List[str], codes: Dict[str, int]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def _account(self, position: int, sign: int) -> None:
+        code = self.category[position]
+        entry = self.totals.get(code)
+        if entry is None:
+            entry = self.totals[code] = [0, 0.0, 0.0, 0]
+        quantity = self.quantity[position]
+        entry[0] += sign
+        entry[1] += sign * quantity
+        entry[2] += sign * quantity * self.unit_price[position]
+        entry[3] += sign if quantity < self.low_stock_threshold[position] else 0
+        if entry[0] == 0:
+            # Drop the float residue along with the last item of the category.
+            del self.totals[code]
+        self.count += sign
+
+    def _find(self, item_id: int) -> int:
+        position = bisect_left(self.ids, item_id)
+        if position < len(self.ids) and self.ids[position] == item_id:
+            return position
+        return -1
+
+    def row(self, position: int) -> ItemRow:
+        start = self.name_start[position]
+        reorder_threshold = self.reorder_threshold[position]
+        return (
+            self.ids[position],
+            self.names[start : start + self.name_length[position]].decode(),
+            self.categories[self.category[position]],
+            self.units[self.unit[position]],
+            self.quantity[position],
+            self.unit_price[position],
+            None if math.isnan(reorder_threshold) else reorder_threshold,
+            self.low_stock_threshold[position],
+        )
+
+    def get(self, item_id: int) -> Optional[ItemRow]:
+        position = self._find(item_id)
+        if position < 0 or not self.alive[position]:
+            return None
+        return self.row(position)
+
+    def page(self, *, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[ItemRow]:
+        position = bisect_right(self.ids, after_id) if after_id is not None else 0
+        rows: List[ItemRow] = []
+        alive = self.alive
+        end = len(self.ids)
+        while position < end and (limit is None or len(rows) < limit):
+            if alive[position]:
+                rows.append(self.row(position))
+            position += 1
+        return rows
+
+    def range_ids(self, after_id: int, last_id: Optional[int]) -> List[int]:
+        # Live ids in (after_id, last_id]; last_id None means to the end.
+        start = bisect_right(self.ids, after_id)
+        end = bisect_right(self.ids, last_id) if last_id is not None else len(self.ids)
+        return [self.ids[position] for position in range(start, end) if self.alive[position]]
+
+    def upsert(self, row: Sequence[Any]) -> None:
+        item_id = row[0]
+        position = self._find(item_id)
+        if position < 0:
+            position = bisect_left(self.ids, item_id)
+            self.ids.insert(position, item_id)
+            self.alive.insert(position, 0)
+            self.name_start.insert(position, 0)
+            self.name_length.insert(position, 0)
+            for column in (self.quantity, self.unit_price, self.reorder_threshold, self.low_stock_threshold):
+                column.insert(position, 0.0)
+            self.category.insert(position, 0)
+            self.unit.insert(position, 0)
+        elif self.alive[position]:
+            self._account(position, -1)
+        start = self.name_start[position]
+        encoded = row[1].encode()
+        if self.names[start : start + self.name_length[position]] != encoded:
+            # The old bytes stay in the blob until the next reload.
+            self.name_start[position] = len(self.names)
+            self.name_length[position] = len(encoded)
+            self.names += encoded
+        self.category[position] = self._code(row[2], self.categories, self._category_codes)
+        self.unit[position] = self._code(row[3], self.units, self._unit_codes)
+        self.quantity[position] = row[4] or 0.0
+        self.unit_price[position] = row[5] or 0.0
+        self.reorder_threshold[position] = math.nan if row[6] is None else row[6]
+        self.low_stock_threshold[position] = row[7]
+        self.alive[position] = 1
+        self._account(position, 1)
+
+    def set_stock(self, item_id: int, quantity: float, unit_price: float) -> bool:
+        position = self._find(item_id)
+        if position < 0 or not self.alive[position]:
+            return False
+        self._account(position, -1)
+        self.quantity[position] = quantity
+        self.unit_price[position] = unit_price
+        self._account(position, 1)
+        return True
+
+    def remove(self, item_id: int) -> bool:
+        position = self._find(item_id)
+        if position < 0 or not self.alive[position]:
+            return False
+        self._account(position, -1)
+        self.alive[position] = 0
+        return True
+
+    def category_rows(self) -> List[Dict[str, Any]]:
+        # Same rows and order as database.fetch_category_summary.
+        rows = [
+            {
+                "category": self.categories[code],
+                "item_count": int(count),
+                "total_quantity": total_quantity,
+                "total_value": total_value,
+                "low_stock_count": int(low_stock_count),
+            }
+            for code, (count, total_quantity, total_value, low_stock_count) in self.totals.items()
+        ]
+        rows.sort(key=lambda row: (-row["total_value"], row["category"]))
+        return rows
+
+    def top_rows(self, limit: int) -> List[ItemRow]:
+        # Ranks the live columns without copying them: the caller holds the
+        # event loop, so rows and ranking come from the same version.
+        top_ids = top_by_value(self.ids, self.quantity, self.unit_price, self.alive, limit=limit)
+        return [row for row in map(self.get, top_ids) if row is not None]
+
+    def value_columns(self) -> Tuple[array, array, array, bytes]:
+        # Copies for top_by_value, so it can run off the event loop.
+        return array("q", self.ids), array("d", self.quantity), array("d", self.unit_price), bytes(self.alive)
+
+    def memory_usage(self) -> Dict[str, Any]:
+        columns = {
+            name: sys.getsizeof(getattr(self, name))
+            for name in (
+                "ids",
+                "alive",
+                "quantity",
+                "unit_price",
+                "reorder_threshold",
+                "low_stock_threshold",
+                "category",
+                "unit",
+                "name_start",
+                "name_length",
+                "names",
+            )
+        }
+        columns["strings"] = sum(
+            sys.getsizeof(value) for table in (self.categories, self.units) for value in table
+        ) + sum(sys.getsizeof(table) for table in (self.categories, self.units))
+        total = sum(columns.values())
+        return {
+            "items": self.count,
+            "slots": len(self.ids),
+            "bytes": total,
+            "bytes_per_item": round(total / self.count, 1) if self.count else 0.0,
+            "columns": columns,
+        }
+
+
+def top_by_value(ids: array, quantity: array, unit_price: array, alive: Sequence[int], *, limit: int) -> List[int]:
+    # Same order as database.fetch_top_items_by_value: value desc, then id.
+    values = zip(map(operator.mul, quantity, unit_price), map(operator.neg, ids))
+    return [-negated_id for _, negated_id in heapq.nlargest(limit, compress(values, alive))]
+
+
+def _load(conn: sqlite3.Connection) -> Tuple[ItemColumns, int, Tuple[int, int]]:
+    # Items, revision and change watermarks from one read transaction.
+    conn.execute("BEGIN;")
+    try:
+        revision = fetch_revision(conn)
+        watermarks = fetch_change_watermarks(conn)
+        columns = ItemColumns.from_chunks(iter_items(conn, raw=True))
+    finally:
+        conn.commit()
+    return columns, revision, watermarks
+
+
+def _read_changes(
+    conn: sqlite3.Connection,
+    *,
+    known_revision: Optional[int],
+    watermarks: Tuple[int, int],
+) -> Tuple[int, Optional[Tuple[Tuple[int, int], Set[int], List[tuple]]]]:
+    # (revision, None) when nothing changed or a reload is due; otherwise the
+    # new watermarks, the ids touched since the old ones and their rows now.
+    revision = fetch_revision(conn)
+    if revision == known_revision:
+        return revision, None
+    movement_id, change_id = watermarks
+    changes, movements = fetch_changes_since(
+        conn, movement_id=movement_id, change_id=change_id, limit=SNAPSHOT_MAX_CHANGES + 1
+    )
+    if len(changes) > SNAPSHOT_MAX_CHANGES or len(movements) > SNAPSHOT_MAX_CHANGES:
+        return revision, None
+    touched = {movement[1] for movement in movements}
+    for _, event, data, _ in changes:
+        if event == "resync":
+            return revision, None
+        touched.add(json.loads(data)["id"])
+    rows = [tuple(row) for row in fetch_items_by_ids(conn, touched)]
+    new_watermarks = (movements[-1][0] if movements else movement_id, changes[-1][0] if changes else change_id)
+    return revision, (new_watermarks, touched, rows)
+
+
+class ItemSnapshot:
+    # Optional in-process read model for the item GETs (MRP_ITEM_SNAPSHOT=1).
+    # Loaded at startup, then kept current three ways: this process's write
+    # endpoints apply their own changes right after committing; every sync
+    # interval the changes other processes (and the CLI) committed are read
+    # from movements and change_events, the way the event feed does; and every
+    # verify interval one batch of rows is compared with the table, walking it
+    # end to end over time, and any difference is corrected and counted.
+    # Everything here runs on the event loop thread, except the database reads.
+    def __init__(
+        self,
+        *,
+        enabled: bool = ITEM_SNAPSHOT_ENABLED,
+        sync_interval: float = SNAPSHOT_SYNC_SECONDS,
+        verify_interval: float = SNAPSHOT_VERIFY_SECONDS,
+        verify_batch: int = SNAPSHOT_VERIFY_BATCH,
+    ) -> None:
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.verify_interval = verify_interval
+        self.verify_batch = verify_batch
+        self.columns: Optional[ItemColumns] = None
+        self.version = 0
+        self._revision: Optional[int] = None
+        self._watermarks: Tuple[int, int] = (0, 0)
+        # Local changes made while a database read is in flight, replayed on
+        # top of what the read returns (which may predate them).
+        self._pending: Optional[List[Tuple[Callable[..., Any], tuple]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._verify_after_id = 0
+        self._last_verify = 0.0
+        self._loaded_seconds = 0.0
+        self._syncs = 0
+        self._reloads = 0
+        self._refreshed = 0
+        self._verified = 0
+        self._mismatches = 0
+        self._errors = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.columns is not None
+
+    def start(self) -> None:
+        # Called from the startup hook, on the event loop thread.
+        if not self.enabled:
+            return
+        started = time.perf_counter()
+        with get_connection(readonly=True) as conn:
+            self.columns, self._revision, self._watermarks = _load(conn)
+        self._loaded_seconds = time.perf_counter() - started
+        self._last_verify = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.columns = None
+
+    def _apply(self, change: Callable[..., Any], *args: Any) -> None:
+        if self.columns is None:
+            return
+        change(self.columns, *args)
+        self.version += 1
+        if self._pending is not None:
+            self._pending.append((change, args))
+
+    def upsert(self, row: Sequence[Any]) -> None:
+        self._apply(ItemColumns.upsert, tuple(row))
+
+    def set_stock(self, item_id: int, quantity: float, unit_price: float) -> None:
+        self._apply(ItemColumns.set_stock, item_id, quantity, unit_price)
+
+    def remove(self, item_id: int) -> None:
+        self._apply(ItemColumns.remove, item_id)
+
+    async def _read(self, fn: Callable[..., Any], **kwargs: Any) -> Tuple[Any, List[Tuple[Callable[..., Any], tuple]]]:
+        self._pending = []
+        try:
+            result = await run_read(fn, **kwargs)
+        finally:
+            pending, self._pending = self._pending, None
+        return result, pending
+
+    def _replay(self, pending: List[Tuple[Callable[..., Any], tuple]]) -> None:
+        for change, args in pending:
+            change(self.columns, *args)
+
+    async def reload(self) -> None:
+        (columns, revision, watermarks), pending = await self._read(_load)
+        self.columns, self._revision, self._watermarks = columns, revision, watermarks
+        self._replay(pending)
+        self.version += 1
+        self._reloads += 1
+
+    async def sync(self) -> None:
+        # Picks up what other processes committed since the last sync.
+        if self.columns is None:
+            return
+        (revision, changes), pending = await self._read(
+            _read_changes, known_revision=self._revision, watermarks=self._watermarks
+        )
+        self._syncs += 1
+        if revision == self._revision:
+            return
+        if changes is None:
+            await self.reload()
+            return
+        self._watermarks, touched, rows = changes
+        for row in rows:
+            self.columns.upsert(row)
+        for item_id in touched.difference(row[0] for row in rows):
+            self.columns.remove(item_id)
+        self._replay(pending)
+        self._revision = revision
+        self._refreshed += len(touched)
+        self.version += 1
+
+    async def verify(self) -> int:
+        # Compares the next verify_batch rows of the table with the snapshot
+        # and fixes whatever differs; returns how many rows did.
+        if self.columns is None:
+            return 0
+        after_id = self._verify_after_id
+        rows, pending = await self._read(fetch_all_items, after_id=after_id, limit=self.verify_batch, raw=True)
+        last_id = rows[-1][0] if len(rows) == self.verify_batch else None
+        # Ids changed locally meanwhile are newer here than in rows.
+        skip = {args[0][0] if change is ItemColumns.upsert else args[0] for change, args in pending}
+        expected = {row[0]: row for row in rows}
+        mismatches = 0
+        for item_id in set(self.columns.range_ids(after_id, last_id)).difference(expected, skip):
+            self.columns.remove(item_id)
+            mismatches += 1
+        for item_id, row in expected.items():
+            if item_id not in skip and self.columns.get(item_id) != row:
+                self.columns.upsert(row)
+                mismatches += 1
+        self._replay(pending)
+        self._verify_after_id = last_id or 0
+        self._verified += len(rows)
+        self._mismatches += mismatches
+        if mismatches:
+            self.version += 1
+            logger.warning("Item snapshot differed from the database in %d row(s); corrected", mismatches)
+        return mismatches
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+                if self.verify_interval > 0 and time.monotonic() - self._last_verify >= self.verify_interval:
+                    self._last_verify = time.monotonic()
+                    await self.verify()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._errors += 1
+                logger.exception("Item snapshot sync failed")
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "version": self.version,
+            "revision": self._revision,
+            "load_seconds": round(self._loaded_seconds, 3),
+            "syncs": self._syncs,
+            "reloads": self._reloads,
+            "refreshed": self._refreshed,
+            "verified": self._verified,
+            "mismatches": self._mismatches,
+            "errors": self._errors,
+        }
+        if self.columns is not None:
+            stats["memory"] = self.columns.memory_usage()
+        return stats
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .database import (
+    POOL_TIMEOUT,
+    apply_stock_change,
+    calculate_total_inventory,
+    get_connection,
+    immediate_transaction,
+    insert_movement,
+    utc_now_us,
+)
+from .schemas import MovementCreate, MovementKind
+
+WRITER_GROUP_SIZE = int(os.environ.get("MRP_WRITER_GROUP_SIZE", "256"))
+WRITER_QUEUE_SIZE = int(os.environ.get("MRP_WRITER_QUEUE_SIZE", "10000"))
+
+MovementRecord = Tuple[int, str, float, float, int, float, float]
+
+
+class MovementRejected(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class WriterTimeoutError(RuntimeError):
+    pass
+
+
+def apply_movement(conn: sqlite3.Connection, payload: MovementCreate, ts: int) -> Tuple[int, MovementRecord]:
+    # Must run inside a write transaction; a rejected movement leaves no changes behind.
+    if payload.movement_type is MovementKind.INIT:
+        raise MovementRejected(400, "movement_type must be entry or exit")
+    exit_movement = payload.movement_type is MovementKind.EXIT
+    row = apply_stock_change(
+        conn,
+        item_id=payload.item_id,
+        delta=-payload.quantity if exit_movement else payload.quantity,
+        unit_price=payload.unit_price,
+        min_quantity=payload.quantity if exit_movement else None,
+    )
+    if row is None:
+        exists = conn.execute("SELECT 1 FROM items WHERE id = ?;", (payload.item_id,)).fetchone()
+        if exists is None:
+            raise MovementRejected(404, "Item not found")
+        raise MovementRejected(400, "Quantity exceeds current stock")
+
+    record: MovementRecord = (
+        payload.item_id,
+        payload.movement_type.value,
+        payload.quantity,
+        row["unit_price"],
+        ts,
+        row["quantity"],
+        calculate_total_inventory(conn),
+    )
+    movement_id = insert_movement(
+        conn,
+        item_id=record[0],
+        movement_type=record[1],
+        quantity=record[2],
+        unit_price=record[3],
+        ts=record[4],
+        quantity_after=record[5],
+        total_value_after=record[6],
+    )
+    return movement_id, record
+
+
+class _PendingMovement(NamedTuple):
+    payload: MovementCreate
+    future: Future
+
+
+class MovementWriter:
+    # Single thread that owns movement writes: queued movements are applied in
+    # arrival order and committed together, one transaction per drained group.
+    # Callers only see their result after the group commit succeeded.
+    def __init__(
+        self,
+        *,
+        max_group_size: int = WRITER_GROUP_SIZE,
+        queue_size: int = WRITER_QUEUE_SIZE,
+        timeout: float = POOL_TIMEOUT,
+    ) -> None:
+        if max_group_size < 1:
+            raise ValueError("Group size must be at least 1")
+        self.max_group_size = max_group_size
+        self.timeout = timeout
+        self._queue: queue.Queue[Optional[_PendingMovement]] = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._groups = 0
+        self._movements = 0
+        self._rejected = 0
+        self._failed_groups = 0
+        self._largest_group = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="movement-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # Movements queued before the sentinel are still written.
+        self._queue.put(None)
+        thread.join()
+
+    def submit(self, payload: MovementCreate, *, block: bool = True) -> Future:
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put(_PendingMovement(payload, future), block=block, timeout=self.timeout)
+        except queue.Full:
+            raise WriterTimeoutError("Movement queue is full") from None
+        return future
+
+    def register(self, payload: MovementCreate) -> Tuple[int, MovementRecord]:
+        future = self.submit(payload)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise WriterTimeoutError(
+                f"Timed out after {self.timeout}s waiting for the movement writer"
+            ) from None
+
+    async def register_async(self, payload: MovementCreate) -> Tuple[int, MovementRecord]:
+        # Awaits the group commit without holding a thread; a full queue is
+        # refused right away instead of blocking the event loop.
+        future = self.submit(payload, block=False)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise WriterTimeoutError(
+                f"Timed out after {self.timeout}s waiting for the movement writer"
+            ) from None
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            group = [first]
+            stopping = False
+            while len(group) < self.max_group_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                group.append(entry)
+            self._write_group(group)
+            if stopping:
+                return
+
+    def _write_group(self, group: List[_PendingMovement]) -> None:
+        pending = [entry for entry in group if entry.future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        outcomes: List[Union[Tuple[int, MovementRecord], MovementRejected]] = []
+        try:
+            with get_connection() as conn, immediate_transaction(conn):
+                for entry in pending:
+                    try:
+                        outcomes.append(apply_movement(conn, entry.payload, utc_now_us()))
+                    except MovementRejected as exc:
+                        outcomes.append(exc)
+        except Exception as exc:
+            with self._lock:
+                self._failed_groups += 1
+            for entry in pending:
+                entry.future.set_exception(exc)
+            return
+
+        rejected = 0
+        for entry, outcome in zip(pending, outcomes):
+            if isinstance(outcome, MovementRejected):
+                rejected += 1
+                entry.future.set_exception(outcome)
+            else:
+                entry.future.set_result(outcome)
+        with self._lock:
+            self._groups += 1
+            self._movements += len(pending) - rejected
+            self._rejected += rejected
+            self._largest_group = max(self._largest_group, len(pending))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "queued": self._queue.qsize(),
+                "max_group_size": self.max_group_size,
+                "groups": self._groups,
+                "movements": self._movements,
+                "rejected": self._rejected,
+                "failed_groups": self._failed_groups,
+                "largest_group": self._largest_group,
+            }
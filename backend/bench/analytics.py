@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from app.analytics import (
+    ANALYTICS_CHUNK_SIZE,
+    HISTORY_START,
+    ItemAggregates,
+    aggregate_movements,
+    aggregate_movements_sqlite,
+    np,
+)
+from app.database import DAY_US, ConnectionPool, create_tables, iter_movement_values, utc_now_us
+
+SIZES: Dict[str, int] = {"1m": 1_000_000, "10m": 10_000_000}
+INSERT_CHUNK_SIZE = 100_000
+
+
+def populate(path: Path, *, movements: int, items: int, archived: float, seed: int) -> None:
+    # Synthetic history over two years: one init per item, then random entries
+    # and exits. The oldest share goes straight to movements_archive, as if
+    # archived, so both tables are read.
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    create_tables(conn)
+    conn.executemany(
+        "INSERT INTO items (name, category, unit, quantity, unit_price) VALUES (?, 'bench', 'un', ?, ?)",
+        ((f"produto {index}", 0.0, round(rng.uniform(1, 300), 2)) for index in range(items)),
+    )
+    prices = [row[0] for row in conn.execute("SELECT unit_price FROM items ORDER BY id;")]
+    stock = [0.0] * items
+    start = utc_now_us() - 730 * DAY_US
+    step = 730 * DAY_US // max(movements, 1)
+    cutoff = int(movements * archived)
+    for first in range(0, movements, INSERT_CHUNK_SIZE):
+        rows = []
+        for index in range(first, min(first + INSERT_CHUNK_SIZE, movements)):
+            item = index if index < items else rng.randrange(items)
+            if index < items:
+                movement_type, quantity = "init", round(rng.uniform(0, 500), 2)
+            elif stock[item] >= 20 and rng.random() < 0.5:
+                movement_type, quantity = "exit", round(rng.uniform(1, 20), 2)
+            else:
+                movement_type, quantity = "entry", round(rng.uniform(1, 20), 2)
+            stock[item] += -quantity if movement_type == "exit" else quantity
+            rows.append(
+                (index + 1, item + 1, movement_type, quantity, prices[item], start + index * step, stock[item], 0.0)
+            )
+        table = "movements_archive" if first + INSERT_CHUNK_SIZE <= cutoff else "movements"
+        conn.executemany(
+            f"""
+            INSERT INTO {table} (
+                id, item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    conn.executemany("UPDATE items SET quantity = ? WHERE id = ?;", ((stock[item], item + 1) for item in range(items)))
+    conn.commit()
+    conn.close()
+
+
+def synthetic_database(data_dir: Path, *, size: str, items: int, archived: float, seed: int) -> Path:
+    # Generating 10M movements takes a while, so files are kept and reused.
+    path = data_dir / f"analytics-{size}-{items}-{archived}-{seed}.db"
+    if not path.exists():
+        data_dir.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        populate(partial, movements=SIZES[size], items=items, archived=archived, seed=seed)
+        partial.rename(path)
+    return path
+
+
+def aggregate_rows_python(conn: sqlite3.Connection, ids: List[int], *, end_ts: int) -> ItemAggregates:
+    # Row by row in Python, the way the history was processed before.
+    position = {item_id: index for index, item_id in enumerate(ids)}
+    count = len(ids)
+    movements = [0] * count
+    consumed, consumed_value, received, stock_time = ([0.0] * count for _ in range(4))
+    first_ts, last_exit_ts = [end_ts] * count, [HISTORY_START] * count
+    for chunk in iter_movement_values(conn, end_ts=end_ts, chunk_size=ANALYTICS_CHUNK_SIZE):
+        for item_id, ts, quantity, value in chunk:
+            index = position.get(item_id)
+            if index is None:
+                continue
+            movements[index] += 1
+            if quantity < 0:
+                consumed[index] -= quantity
+                consumed_value[index] -= value
+                last_exit_ts[index] = max(last_exit_ts[index], ts)
+            else:
+                received[index] += quantity
+            stock_time[index] += quantity * (end_ts - ts)
+            first_ts[index] = min(first_ts[index], ts)
+    return ItemAggregates(movements, consumed, consumed_value, received, stock_time, first_ts, last_exit_ts)
+
+
+def timed(path: Path, run: Callable[[sqlite3.Connection], ItemAggregates]) -> Tuple[float, int, ItemAggregates]:
+    # Through the app's pool, so the engines run with the server's pragmas
+    # (cache_size, mmap_size, temp_store). Peak RSS growth rather than
+    # tracemalloc, which does not see SQLite's allocations (GROUP BY sorter).
+    pool = ConnectionPool(path, size=1, readonly=True)
+    try:
+        with pool.connection() as conn:
+            baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            result = run(conn)
+            elapsed = time.perf_counter() - started
+            peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * 1024
+    finally:
+        pool.close()
+    return elapsed, peak, result
+
+
+def measure(
+    path: Path, run: Callable[[sqlite3.Connection], ItemAggregates], *, memory: bool
+) -> Tuple[float, int, ItemAggregates]:
+    if not memory:
+        return timed(path, run)
+    # A fresh process per engine, so one engine's peak does not hide the next.
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=lambda: sender.send(timed(path, run)))
+    process.start()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def same_aggregates(first: ItemAggregates, second: ItemAggregates) -> bool:
+    for left, right in zip(first, second):
+        for a, b in zip(left, right):
+            if abs(float(a) - float(b)) > 1e-6 * max(1.0, abs(float(a))):
+                return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mede o cálculo de giro, consumo e estoque parado (app.analytics) sobre históricos sintéticos: "
+            "NumPy em blocos, GROUP BY no SQLite e o laço linha a linha em Python."
+        )
+    )
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="Movimentações no banco")
+    parser.add_argument("--items", type=int, default=10_000, help="Produtos no banco gerado")
+    parser.add_argument("--archived", type=float, default=0.5, help="Fração do histórico em movements_archive")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        choices=["numpy", "sqlite", "python"],
+        default=["numpy", "sqlite", "python"],
+        help="Caminhos medidos",
+    )
+    parser.add_argument(
+        "--memory", action="store_true", help="Medir o pico de memória de cada caminho (RSS, um processo por caminho)"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "mrp-bench",
+        help="Onde guardar os bancos gerados para reutilização",
+    )
+    args = parser.parse_args()
+
+    if np is None and "numpy" in args.engines:
+        print("NumPy não está instalado; o caminho numpy será ignorado.")
+    for size in args.sizes:
+        path = synthetic_database(args.data_dir, size=size, items=args.items, archived=args.archived, seed=args.seed)
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        item_ids = [row[0] for row in conn.execute("SELECT id FROM items ORDER BY id;")]
+        conn.close()
+        end_ts = utc_now_us()
+        runs: Dict[str, Callable[[sqlite3.Connection], ItemAggregates]] = {
+            "sqlite": lambda conn: aggregate_movements_sqlite(conn, item_ids, start_ts=HISTORY_START, end_ts=end_ts),
+            "python": lambda conn: aggregate_rows_python(conn, item_ids, end_ts=end_ts),
+        }
+        if np is not None:
+            ids = np.array(item_ids, dtype=np.int64)
+            runs["numpy"] = lambda conn: aggregate_movements(conn, ids, start_ts=HISTORY_START, end_ts=end_ts)
+        results: Dict[str, Tuple[float, int, ItemAggregates]] = {}
+        for engine in args.engines:
+            if engine in runs:
+                results[engine] = measure(path, runs[engine], memory=args.memory)
+
+        reference = next(iter(results.values()))[2]
+        for engine, (elapsed, peak, aggregates) in results.items():
+            if not same_aggregates(reference, aggregates):
+                raise SystemExit(f"{size}: o caminho {engine} chegou a resultados diferentes")
+            memory = f" | pico {peak / 2**20:,.0f} MiB" if args.memory else ""
+            print(
+                f"{size:>4} {engine:<7} {elapsed:>7.2f}s | {SIZES[size] / elapsed:>12,.0f} movimentações/s{memory}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .common import BACKEND_DIR, HttpConnection, free_port, start_uvicorn, stop_server, summarize
+
+DEFAULT_CONCURRENCY = [50, 200, 1000]
+
+# (weight, method, path template) — roughly a dashboard-heavy read mix with writes
+# frequent enough to keep invalidating the response cache.
+REQUEST_MIX = [
+    (40, "GET", "/items/{item_id}"),
+    (20, "GET", "/movements?limit=50"),
+    (20, "GET", "/dashboard/total?max_points=200"),
+    (20, "POST", "/movements"),
+]
+
+
+def start_server(app_dir: Path, db_path: Path, *, items: int, port: int) -> subprocess.Popen:
+    subprocess.run(
+        [sys.executable, "-m", "scripts.seed_db", "--items", str(items), "--seed", "1"],
+        cwd=app_dir,
+        env={**os.environ, "MRP_DB_PATH": str(db_path), "PYTHONPATH": str(app_dir)},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return start_uvicorn(app_dir, db_path, port=port)
+
+
+async def run_level(base_url: str, *, concurrency: int, duration: float, items: int) -> Dict[str, object]:
+    url = httpx.URL(base_url)
+    weights = [weight for weight, _, _ in REQUEST_MIX]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(seed: int) -> None:
+        rng = random.Random(seed)
+        connection = HttpConnection(url.host, url.port or 80)
+        try:
+            while time.perf_counter() < deadline:
+                _, method, template = rng.choices(REQUEST_MIX, weights)[0]
+                item_id = rng.randint(1, items)
+                body = None
+                if method == "POST":
+                    body = json.dumps({"item_id": item_id, "movement_type": "entry", "quantity": 1}).encode()
+                started = time.perf_counter()
+                try:
+                    status = str(await connection.request(method, template.format(item_id=item_id), body))
+                except (OSError, asyncio.IncompleteReadError) as exc:
+                    connection.close()
+                    status = type(exc).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(seed) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {"concurrency": concurrency, **summarize(latencies, elapsed, statuses)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Teste de carga: latência p50/p95/p99 da API com N clientes concorrentes."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY, help="Clientes simultâneos por rodada"
+    )
+    parser.add_argument("--duration", type=float, default=15, help="Segundos por rodada")
+    parser.add_argument("--items", type=int, default=1000, help="Produtos gerados no banco de teste")
+    parser.add_argument("--url", default=None, help="Usar um servidor já em execução em vez de iniciar um")
+    parser.add_argument(
+        "--app-dir",
+        type=Path,
+        default=BACKEND_DIR,
+        help="Diretório do backend a iniciar (ex.: um git worktree de outra versão, para comparação)",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Gravar os resultados em JSON")
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    with tempfile.TemporaryDirectory() as directory:
+        base_url = args.url
+        if base_url is None:
+            port = free_port()
+            server = start_server(args.app_dir, Path(directory) / "bench.db", items=args.items, port=port)
+            base_url = f"http://127.0.0.1:{port}"
+        try:
+            results = []
+            for concurrency in args.concurrency:
+                result = asyncio.run(
+                    run_level(base_url, concurrency=concurrency, duration=args.duration, items=args.items)
+                )
+                results.append(result)
+                print(
+                    f"{concurrency:>5} clientes | {result['throughput']:>8,.0f} req/s | "
+                    f"p50 {result['p50_ms']:>8.1f} ms | p95 {result['p95_ms']:>8.1f} ms | "
+                    f"p99 {result['p99_ms']:>8.1f} ms | {result['statuses']}"
+                )
+        finally:
+            if server is not None:
+                stop_server(server)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps({"app_dir": str(args.app_dir), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import app.database as database
+from app.database import (
+    PRAGMAS,
+    calculate_total_inventory,
+    close_pools,
+    create_tables,
+    immediate_transaction,
+    insert_item,
+    insert_movement,
+    update_item_record,
+    utc_now_us,
+)
+from app.schemas import MovementCreate, MovementKind
+from app.writer import MovementRejected, MovementWriter, apply_movement
+
+MODES = ("legacy", "conditional", "writer")
+
+
+def open_connection(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};").fetchall()
+    return conn
+
+
+def prepare(path: Path, *, items: int, stock: float) -> None:
+    conn = open_connection(path)
+    create_tables(conn)
+    for index in range(items):
+        insert_item(
+            conn,
+            name=f"Item {index + 1}",
+            category="Stress",
+            unit="un",
+            quantity=stock,
+            unit_price=1.0,
+        )
+    conn.commit()
+    conn.close()
+
+
+def legacy_movement(conn: sqlite3.Connection, payload: MovementCreate) -> None:
+    # The pre-writer request path: read, check in Python, then write, with no
+    # write lock held between the read and the update.
+    item = conn.execute("SELECT quantity, unit_price FROM items WHERE id = ?;", (payload.item_id,)).fetchone()
+    current_quantity = item["quantity"] or 0.0
+    if payload.quantity > current_quantity:
+        raise MovementRejected(400, "Quantity exceeds current stock")
+    new_quantity = current_quantity - payload.quantity
+    update_item_record(conn, item_id=payload.item_id, quantity=new_quantity, unit_price=item["unit_price"])
+    insert_movement(
+        conn,
+        item_id=payload.item_id,
+        movement_type=payload.movement_type.value,
+        quantity=payload.quantity,
+        unit_price=item["unit_price"],
+        ts=utc_now_us(),
+        quantity_after=new_quantity,
+        total_value_after=calculate_total_inventory(conn),
+    )
+    conn.commit()
+
+
+def run(mode: str, path: Path, *, threads: int, per_thread: int, items: int) -> Dict[str, object]:
+    accepted: Dict[int, int] = {}
+    counters = {"rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    writer = MovementWriter() if mode == "writer" else None
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        conn = open_connection(path) if writer is None else None
+        for _ in range(per_thread):
+            payload = MovementCreate(item_id=rng.randint(1, items), movement_type=MovementKind.EXIT, quantity=1)
+            try:
+                if writer is not None:
+                    writer.register(payload)
+                elif mode == "conditional":
+                    with immediate_transaction(conn):
+                        apply_movement(conn, payload, utc_now_us())
+                else:
+                    legacy_movement(conn, payload)
+            except MovementRejected:
+                with lock:
+                    counters["rejected"] += 1
+                continue
+            except sqlite3.OperationalError:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+                with lock:
+                    counters["errors"] += 1
+                continue
+            with lock:
+                accepted[payload.item_id] = accepted.get(payload.item_id, 0) + 1
+        if conn is not None:
+            conn.close()
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if writer is not None:
+        writer.stop()
+
+    conn = open_connection(path)
+    quantities = dict(conn.execute("SELECT id, quantity FROM items;").fetchall())
+    movements = conn.execute("SELECT COUNT(*) FROM movements;").fetchone()[0]
+    conn.close()
+    return {
+        "accepted": sum(accepted.values()),
+        "rejected": counters["rejected"],
+        "errors": counters["errors"],
+        "elapsed": elapsed,
+        "quantities": quantities,
+        "movements": movements,
+        "per_item": accepted,
+    }
+
+
+def report(mode: str, result: Dict[str, object], *, stock: float) -> bool:
+    quantities: Dict[int, float] = result["quantities"]
+    per_item: Dict[int, int] = result["per_item"]
+    mismatched = [
+        item_id for item_id, quantity in quantities.items() if quantity != stock - per_item.get(item_id, 0)
+    ]
+    negative = [item_id for item_id, quantity in quantities.items() if quantity < 0]
+    consistent = not mismatched and not negative and result["movements"] == result["accepted"]
+    rate = result["accepted"] / result["elapsed"] if result["elapsed"] else 0.0
+    print(
+        f"{mode:<12} {rate:>10,.0f} mov/s | aceitas {result['accepted']} | rejeitadas {result['rejected']} | "
+        f"erros {result['errors']} | estoque divergente {len(mismatched)} | negativo {len(negative)} | "
+        f"{'OK' if consistent else 'INCONSISTENTE'}"
+    )
+    return consistent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Teste de estresse de saídas concorrentes: confere o estoque final e mede movimentações/s."
+    )
+    parser.add_argument("--threads", type=int, default=16, help="Threads concorrentes")
+    parser.add_argument("--per-thread", type=int, default=500, help="Saídas por thread")
+    parser.add_argument("--items", type=int, default=20, help="Quantidade de itens disputados")
+    parser.add_argument("--stock", type=float, default=300, help="Estoque inicial de cada item")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Caminhos a comparar")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            path = Path(directory) / f"{mode}.db"
+            database.DB_PATH = path
+            prepare(path, items=args.items, stock=args.stock)
+            result = run(mode, path, threads=args.threads, per_thread=args.per_thread, items=args.items)
+            close_pools()
+            if not report(mode, result, stock=args.stock) and mode != "legacy":
+                failures.append(mode)
+    if failures:
+        raise SystemExit(f"Estoque final incorreto em: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
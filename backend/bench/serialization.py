@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from app.database import create_tables, list_movements_rows, utc_now_us
+from app.services import build_movement_output, encode_json, orjson, serialize_movements
+
+MOVEMENT_TYPES = ("init", "entry", "exit")
+
+
+def populate(conn: sqlite3.Connection, rows: int) -> None:
+    create_tables(conn)
+    start = utc_now_us() - rows * 1_000_000
+    conn.executemany(
+        """
+        INSERT INTO movements (
+            item_id, movement_type, quantity, unit_price, ts, quantity_after, total_value_after
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                random.randint(1, 1000),
+                random.choice(MOVEMENT_TYPES),
+                round(random.uniform(1, 50), 2),
+                round(random.uniform(1, 500), 2),
+                start + index * random.randint(1, 1_500_000),
+                round(random.uniform(0, 1000), 2),
+                round(random.uniform(1e4, 1e6), 2),
+            )
+            for index in range(rows)
+        ),
+    )
+    conn.commit()
+
+
+def encode_with_models(conn: sqlite3.Connection, limit: int) -> bytes:
+    # Previous path: sqlite3.Row -> validated MovementRead per row -> FastAPI's
+    # jsonable_encoder + json.dumps for the response_model.
+    movements = [build_movement_output(row) for row in list_movements_rows(conn, limit=limit)]
+    return json.dumps(
+        jsonable_encoder(movements),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_with_tuples(conn: sqlite3.Connection, limit: int) -> bytes:
+    return encode_json(serialize_movements(list_movements_rows(conn, limit=limit, raw=True)))
+
+
+def measure(run: Callable[[], bytes], rows: int, repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {"best_seconds": best, "rows_per_second": rows / best}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare a serialização de movimentações via modelos pydantic e via tuplas."
+    )
+    parser.add_argument("--rows", type=int, default=100_000, help="Quantidade de movimentações")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por caminho")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    populate(conn, args.rows)
+
+    if json.loads(encode_with_models(conn, args.rows)) != json.loads(encode_with_tuples(conn, args.rows)):
+        raise SystemExit("Os dois caminhos produziram respostas diferentes.")
+
+    before = measure(lambda: encode_with_models(conn, args.rows), args.rows, args.repeat)
+    after = measure(lambda: encode_with_tuples(conn, args.rows), args.rows, args.repeat)
+    print(f"Movimentações: {args.rows} (orjson {'ativo' if orjson is not None else 'ausente'})")
+    print(f"Modelos pydantic: {before['rows_per_second']:,.0f} linhas/s ({before['best_seconds']:.3f}s)")
+    print(f"Tuplas + encode_json: {after['rows_per_second']:,.0f} linhas/s ({after['best_seconds']:.3f}s)")
+    print(f"Ganho: {after['rows_per_second'] / before['rows_per_second']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
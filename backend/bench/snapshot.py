@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.database import (
+    create_tables,
+    fetch_all_items,
+    fetch_category_summary,
+    fetch_item,
+    fetch_top_items_by_value,
+    iter_items,
+)
+from app.snapshot import ItemColumns, top_by_value
+
+CATEGORIES = [f"categoria {index}" for index in range(40)]
+UNITS = ("un", "kg", "l", "m", "cx")
+
+
+def populate(conn: sqlite3.Connection, items: int) -> None:
+    create_tables(conn)
+    conn.executemany(
+        "INSERT INTO items (name, category, unit, quantity, unit_price, reorder_threshold) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                f"produto {index} {random.choice(('azul', 'grande', 'inox', 'premium'))}",
+                random.choice(CATEGORIES),
+                random.choice(UNITS),
+                round(random.uniform(0, 500), 2),
+                round(random.uniform(1, 300), 2),
+                random.choice((None, None, None, 25.0)),
+            )
+            for index in range(items)
+        ),
+    )
+    conn.commit()
+
+
+def traced(build: Callable[[], object]) -> int:
+    # Bytes still allocated by what build returns.
+    tracemalloc.start()
+    try:
+        kept = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def best_of(run: Callable[[], object], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mede a memória e a latência do snapshot de produtos (MRP_ITEM_SNAPSHOT) contra as consultas "
+            "equivalentes no SQLite."
+        )
+    )
+    parser.add_argument("--items", type=int, default=1_000_000, help="Quantidade de produtos")
+    parser.add_argument("--lookups", type=int, default=10_000, help="Buscas por id medidas")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições dos relatórios")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    populate(conn, args.items)
+
+    started = time.perf_counter()
+    columns = ItemColumns.from_chunks(iter_items(conn, raw=True))
+    load_seconds = time.perf_counter() - started
+    usage = columns.memory_usage()
+    traced_columns = traced(lambda: ItemColumns.from_chunks(iter_items(conn, raw=True)))
+    traced_rows = traced(lambda: {row[0]: row for row in fetch_all_items(conn, raw=True)})
+
+    if [tuple(row) for row in fetch_all_items(conn, limit=1000, raw=True)] != columns.page(limit=1000):
+        raise SystemExit("O snapshot e o banco devolveram produtos diferentes.")
+    expected_top = [row["id"] for row in fetch_top_items_by_value(conn, limit=20)]
+    if top_by_value(*columns.value_columns(), limit=20) != expected_top:
+        raise SystemExit("O snapshot e o banco ordenaram os produtos de maior valor de forma diferente.")
+
+    ids = [random.randint(1, args.items) for _ in range(args.lookups)]
+    timings: Dict[str, tuple] = {
+        "busca por id": (
+            best_of(lambda: [fetch_item(conn, item_id) for item_id in ids], 1) / args.lookups,
+            best_of(lambda: [columns.get(item_id) for item_id in ids], 1) / args.lookups,
+        ),
+        "página de 100": (
+            best_of(lambda: fetch_all_items(conn, after_id=args.items // 2, limit=100, raw=True), args.repeat),
+            best_of(lambda: columns.page(after_id=args.items // 2, limit=100), args.repeat),
+        ),
+        "resumo por categoria": (
+            best_of(lambda: fetch_category_summary(conn), args.repeat),
+            best_of(columns.category_rows, args.repeat),
+        ),
+        "top 100 por valor": (
+            best_of(lambda: fetch_top_items_by_value(conn, limit=100), args.repeat),
+            best_of(lambda: top_by_value(*columns.value_columns(), limit=100), args.repeat),
+        ),
+    }
+
+    print(f"Produtos: {args.items:,}")
+    print(
+        f"Snapshot: {usage['bytes'] / 2**20:,.1f} MiB ({usage['bytes_per_item']:.0f} bytes/produto), "
+        f"carregado em {load_seconds:.2f}s"
+    )
+    print(
+        f"Alocado (tracemalloc): snapshot {traced_columns / 2**20:,.1f} MiB | "
+        f"dict de tuplas {traced_rows / 2**20:,.1f} MiB ({traced_rows / max(traced_columns, 1):.1f}x)"
+    )
+    for name, (database_seconds, snapshot_seconds) in timings.items():
+        print(
+            f"{name:<22} SQLite {database_seconds * 1e6:>12,.1f} µs | snapshot {snapshot_seconds * 1e6:>12,.1f} µs "
+            f"({database_seconds / snapshot_seconds:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
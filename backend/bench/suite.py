@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+import httpx
+
+import app.database as database
+from app.database import close_pools
+from app.main import app, response_cache
+from scripts.seed_db import seed_database
+
+from .common import BACKEND_DIR, HttpConnection, free_port, start_uvicorn, stop_server, summarize
+
+SIZES: Dict[str, int] = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+MODES = ("inprocess", "uvicorn")
+SEARCH_TERMS = ["aço", "caixa", "oleo", "parafuso", "tubo", "pa", "embal", "fio cobre"]
+
+# (method, path, body, content type, stream) -> status
+Send = Callable[[str, str, Optional[bytes], str, bool], Awaitable[int]]
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    # (rng, item count) -> (path, JSON body, raw body or None)
+    request: Callable[[random.Random, int], Tuple[str, Union[dict, bytes, None]]]
+    content_type: str = "application/json"
+    # Timed up to the first chunk of the response, then disconnected.
+    stream: bool = False
+
+
+def _new_item(rng: random.Random, items: int) -> Tuple[str, Optional[dict]]:
+    return "/items", {
+        "name": f"Bench {rng.randrange(10**9)}",
+        "category": "Benchmark",
+        "unit": "un",
+        "quantity": rng.randint(1, 100),
+        "unit_price": round(rng.uniform(1, 50), 2),
+    }
+
+
+def _movement(rng: random.Random, items: int) -> dict:
+    return {"item_id": rng.randint(1, items), "movement_type": "entry", "quantity": 1}
+
+
+def _as_of(rng: random.Random) -> str:
+    # Within the last week: inside the seeded history of every size (one
+    # movement a minute, ending when the database was generated).
+    moment = datetime.now(timezone.utc) - timedelta(minutes=rng.randint(1, 7 * 24 * 60))
+    return urlencode({"as_of": moment.isoformat()})
+
+
+def _import_csv(rng: random.Random, items: int) -> Tuple[str, bytes]:
+    lines = ["name,category,unit,quantity,unit_price"]
+    for _ in range(100):
+        lines.append(f"Bench {rng.randrange(10**9)},Benchmark,un,{rng.randint(1, 100)},{rng.uniform(1, 50):.2f}")
+    return "/items/import", ("\n".join(lines) + "\n").encode()
+
+
+# GET scenarios run before the writes, so every mode and size reads the same data.
+SCENARIOS: List[Scenario] = [
+    Scenario("item_get", "GET", lambda rng, items: (f"/items/{rng.randint(1, items)}", None)),
+    Scenario("items_page", "GET", lambda rng, items: (f"/items?limit=100&after_id={rng.randint(0, items)}", None)),
+    Scenario(
+        "items_search",
+        "GET",
+        lambda rng, items: (f"/items/search?{urlencode({'term': rng.choice(SEARCH_TERMS), 'limit': 20})}", None),
+    ),
+    Scenario(
+        "items_as_of",
+        "GET",
+        lambda rng, items: (f"/items?limit=100&after_id={rng.randint(0, items)}&{_as_of(rng)}", None),
+    ),
+    Scenario("items_low_stock", "GET", lambda rng, items: ("/items/low-stock?limit=100", None)),
+    Scenario("movements_page", "GET", lambda rng, items: ("/movements?limit=100", None)),
+    Scenario(
+        "movements_item",
+        "GET",
+        lambda rng, items: (f"/movements?item_id={rng.randint(1, items)}&limit=100", None),
+    ),
+    Scenario("dashboard_total_day", "GET", lambda rng, items: ("/dashboard/total?bucket=day", None)),
+    Scenario("dashboard_total_lttb", "GET", lambda rng, items: ("/dashboard/total?max_points=500", None)),
+    Scenario(
+        "dashboard_item",
+        "GET",
+        lambda rng, items: (f"/dashboard/items/{rng.randint(1, items)}?max_points=200", None),
+    ),
+    Scenario(
+        "dashboard_items_50",
+        "GET",
+        lambda rng, items: (
+            f"/dashboard/items?ids={','.join(str(rng.randint(1, items)) for _ in range(50))}&bucket=day",
+            None,
+        ),
+    ),
+    Scenario("report_abc", "GET", lambda rng, items: ("/reports/abc?limit=50", None)),
+    Scenario("report_summary", "GET", lambda rng, items: ("/reports/summary", None)),
+    Scenario("report_valuation", "GET", lambda rng, items: ("/reports/valuation", None)),
+    Scenario("report_valuation_as_of", "GET", lambda rng, items: (f"/reports/valuation?{_as_of(rng)}", None)),
+    Scenario("report_analytics", "GET", lambda rng, items: ("/reports/analytics?limit=50", None)),
+    Scenario("events_subscribe", "GET", lambda rng, items: ("/events", None), stream=True),
+    Scenario("item_create", "POST", _new_item),
+    Scenario("movement_create", "POST", lambda rng, items: ("/movements", _movement(rng, items))),
+    Scenario(
+        "movement_batch",
+        "POST",
+        lambda rng, items: ("/movements/batch", {"movements": [_movement(rng, items) for _ in range(50)]}),
+    ),
+    Scenario("items_import", "POST", _import_csv, content_type="text/csv"),
+]
+
+
+def seeded_database(data_dir: Path, *, size: str, items: int, seed: int) -> Path:
+    # Seeding 1M movements takes a while, so seeded files are kept and reused.
+    path = data_dir / f"seed-{size}-{items}-{seed}.db"
+    if path.exists():
+        return path
+    data_dir.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    for leftover in data_dir.glob(f"{partial.name}*"):
+        leftover.unlink()
+    database.DB_PATH = partial
+    try:
+        seed_database(item_count=items, seed=seed, movement_count=SIZES[size])
+    finally:
+        close_pools()
+    partial.rename(path)
+    return path
+
+
+def working_copy(source: Path, directory: Path, name: str) -> Path:
+    target = directory / f"{name}.db"
+    shutil.copyfile(source, target)
+    return target
+
+
+async def run_scenario(
+    scenario: Scenario,
+    open_sender: Callable[[], Tuple[Send, Callable[[], None]]],
+    *,
+    items: int,
+    requests: int,
+    warmup: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, object]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = [warmup + requests]
+
+    async def worker(index: int) -> None:
+        rng = random.Random(f"{seed}-{scenario.name}-{index}")
+        send, close = open_sender()
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                measured = remaining[0] < requests
+                path, payload = scenario.request(rng, items)
+                body = payload if payload is None or isinstance(payload, bytes) else json.dumps(payload).encode()
+                started = time.perf_counter()
+                try:
+                    status = str(await send(scenario.method, path, body, scenario.content_type, scenario.stream))
+                except (OSError, asyncio.IncompleteReadError, httpx.HTTPError) as exc:
+                    status = type(exc).__name__
+                if measured:
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # Warmup requests are excluded from the latencies but not from the wall clock,
+    # so scale the elapsed time to the measured share.
+    elapsed *= requests / (warmup + requests)
+    result = summarize(latencies, elapsed, statuses)
+    result["errors"] = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return result
+
+
+async def first_chunk(method: str, path: str) -> int:
+    # httpx's ASGI transport waits for the whole body, which an event stream
+    # never finishes: call the app directly and disconnect after one chunk.
+    status = [0]
+    received = asyncio.Event()
+
+    async def receive() -> Dict[str, Any]:
+        await received.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+        elif message["type"] == "http.response.body" and (message.get("body") or not message.get("more_body")):
+            received.set()
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run_inprocess(db_path: Path, scenarios: List[Scenario], *, cache: bool, **options) -> List[Dict[str, object]]:
+    database.DB_PATH = db_path
+    response_cache.clear()
+    max_entries = response_cache.max_entries
+    if not cache:
+        response_cache.max_entries = 0
+    results = []
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def send(method: str, path: str, body: Optional[bytes], content_type: str, stream: bool) -> int:
+                    if stream:
+                        return await first_chunk(method, path)
+                    headers = {"Content-Type": content_type} if body is not None else None
+                    response = await client.request(method, path, content=body, headers=headers)
+                    return response.status_code
+
+                for scenario in scenarios:
+                    result = await run_scenario(scenario, lambda: (send, lambda: None), **options)
+                    results.append({"scenario": scenario.name, **result})
+    finally:
+        response_cache.max_entries = max_entries
+        response_cache.clear()
+        close_pools()
+    return results
+
+
+async def run_uvicorn(db_path: Path, scenarios: List[Scenario], *, cache: bool, **options) -> List[Dict[str, object]]:
+    port = free_port()
+    env = {} if cache else {"MRP_RESPONSE_CACHE_ENTRIES": "0"}
+    server = await asyncio.to_thread(start_uvicorn, BACKEND_DIR, db_path, port=port, env=env)
+
+    def open_sender() -> Tuple[Send, Callable[[], None]]:
+        connection = HttpConnection("127.0.0.1", port)
+        return connection.request, connection.close
+
+    results = []
+    try:
+        for scenario in scenarios:
+            result = await run_scenario(scenario, open_sender, **options)
+            results.append({"scenario": scenario.name, **result})
+    finally:
+        stop_server(server)
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def find_regressions(
+    results: List[Dict[str, object]],
+    baseline: List[Dict[str, object]],
+    *,
+    threshold: float,
+) -> List[str]:
+    previous = {(entry["size"], entry["mode"], entry["scenario"]): entry for entry in baseline}
+    regressions: List[str] = []
+    for entry in results:
+        before = previous.get((entry["size"], entry["mode"], entry["scenario"]))
+        if before is None:
+            continue
+        label = f"{entry['size']}/{entry['mode']}/{entry['scenario']}"
+        if before["p95_ms"] and entry["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {before['p95_ms']:.1f} ms -> {entry['p95_ms']:.1f} ms")
+        if before["throughput"] and entry["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{label}: vazão {before['throughput']:.0f} req/s -> {entry['throughput']:.0f} req/s"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark reprodutível da API: vazão e latência p50/p95/p99 por rota."
+    )
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="Movimentações no banco")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Em processo e/ou uvicorn")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=[scenario.name for scenario in SCENARIOS],
+        default=None,
+        help="Subconjunto de cenários (padrão: todos)",
+    )
+    parser.add_argument("--items", type=int, default=1000, help="Produtos no banco gerado")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições medidas por cenário")
+    parser.add_argument("--warmup", type=int, default=20, help="Requisições de aquecimento por cenário")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos")
+    parser.add_argument("--seed", type=int, default=1, help="Semente dos dados e das requisições")
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Manter o cache de respostas ativo (por padrão é desligado para medir o banco)",
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "mrp-bench",
+        help="Onde guardar os bancos gerados para reutilização",
+    )
+    parser.add_argument("--output", type=Path, default=None, help="Gravar os resultados em JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="Resultados anteriores (JSON) para comparação")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.environ.get("MRP_BENCH_THRESHOLD", "0.2")),
+        help="Piora relativa tolerada em p95 e vazão antes de falhar (padrão: 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    scenarios = [scenario for scenario in SCENARIOS if args.scenarios is None or scenario.name in args.scenarios]
+    options = {
+        "items": args.items,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    runners = {"inprocess": run_inprocess, "uvicorn": run_uvicorn}
+
+    results: List[Dict[str, object]] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            source = seeded_database(args.data_dir, size=size, items=args.items, seed=args.seed)
+            for mode in args.modes:
+                db_path = working_copy(source, Path(directory), f"{size}-{mode}")
+                for entry in asyncio.run(runners[mode](db_path, scenarios, cache=args.cache, **options)):
+                    entry = {"size": size, "mode": mode, **entry}
+                    results.append(entry)
+                    print(
+                        f"{size:>4} {mode:<9} {entry['scenario']:<22} {entry['throughput']:>8,.0f} req/s | "
+                        f"p50 {entry['p50_ms']:>7.1f} | p95 {entry['p95_ms']:>7.1f} | p99 {entry['p99_ms']:>7.1f} ms"
+                        + (f" | erros {entry['errors']}" if entry["errors"] else "")
+                    )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": {**options, "cache": args.cache, "sizes": args.sizes, "modes": args.modes},
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    failures: List[str] = []
+    errored = [f"{entry['size']}/{entry['mode']}/{entry['scenario']}" for entry in results if entry["errors"]]
+    if errored:
+        failures.append(f"Requisições com erro em: {', '.join(errored)}")
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = find_regressions(results, baseline, threshold=args.threshold)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        if regressions:
+            failures.append(f"{len(regressions)} regressão(ões) acima de {args.threshold:.0%}")
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+import httpx
+
+from .common import BACKEND_DIR, HttpConnection, free_port, start_uvicorn, stop_server
+from .suite import SCENARIOS, SIZES, run_scenario, seeded_database, working_copy
+
+READ_SCENARIOS = [scenario for scenario in SCENARIOS if scenario.method == "GET"]
+
+
+async def worker_pids(base_url: str, *, expected: int, timeout: float = 30) -> Set[int]:
+    # Fresh connections land on whichever worker accepts first; keep asking
+    # until every worker has answered at least once.
+    pids: Set[int] = set()
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, limits=httpx.Limits(max_keepalive_connections=0)) as client:
+        while len(pids) < expected and time.monotonic() < deadline:
+            responses = await asyncio.gather(*(client.get("/health/db") for _ in range(expected * 4)))
+            pids.update(response.json()["write"]["pid"] for response in responses if "write" in response.json())
+            await asyncio.sleep(0.1)
+    return pids
+
+
+async def cold_start(directory: Path, *, workers: int) -> Set[int]:
+    # N workers migrating the same empty file at once.
+    port = free_port()
+    server = await asyncio.to_thread(
+        start_uvicorn, BACKEND_DIR, directory / f"cold-{workers}.db", port=port, workers=workers
+    )
+    try:
+        return await worker_pids(f"http://127.0.0.1:{port}", expected=workers)
+    finally:
+        stop_server(server)
+
+
+async def check_consistency(base_url: str, *, items: int, writes: int, subscribers: int) -> List[str]:
+    # Writes go through one connection, reads and event streams through many,
+    # so each write is checked from several workers.
+    problems: List[str] = []
+    item_id = random.Random(writes).randint(1, items)
+    no_keepalive = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as writer, httpx.AsyncClient(
+        base_url=base_url, timeout=30, limits=no_keepalive
+    ) as readers:
+        received: List[List[int]] = [[] for _ in range(subscribers)]
+        ready = [asyncio.Event() for _ in range(subscribers)]
+
+        async def listen(index: int) -> None:
+            async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+                async with client.stream("GET", "/events") as response:
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: ready"):
+                            ready[index].set()
+                        elif line.startswith("id: "):
+                            received[index].append(int(line[4:]))
+                            if len(received[index]) >= writes:
+                                return
+
+        listeners = [asyncio.create_task(listen(index)) for index in range(subscribers)]
+        await asyncio.gather(*(event.wait() for event in ready))
+
+        movement_ids: List[int] = []
+        for _ in range(writes):
+            response = await writer.post(
+                "/movements", json={"item_id": item_id, "movement_type": "entry", "quantity": 1}
+            )
+            response.raise_for_status()
+            movement = response.json()
+            movement_ids.append(movement["id"])
+            expected = movement["quantity_after"]
+            views = await asyncio.gather(*(readers.get(f"/items/{item_id}") for _ in range(8)))
+            quantities = {view.json()["quantity"] for view in views}
+            etags = {view.headers["etag"] for view in views}
+            if quantities != {expected} or len(etags) != 1:
+                problems.append(
+                    f"movimentação {movement['id']}: quantidades {sorted(quantities)}, {len(etags)} ETags"
+                )
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*listeners), 30)
+        except asyncio.TimeoutError:
+            for task in listeners:
+                task.cancel()
+        for index, ids in enumerate(received):
+            if ids != movement_ids:
+                problems.append(f"assinante {index}: recebeu {len(ids)} de {len(movement_ids)} eventos")
+    return problems
+
+
+async def run_workers(
+    db_path: Path,
+    directory: Path,
+    *,
+    workers: int,
+    scenarios: List[str],
+    writes: int,
+    subscribers: int,
+    **options,
+) -> Dict[str, object]:
+    pids = await cold_start(directory, workers=workers)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = await asyncio.to_thread(start_uvicorn, BACKEND_DIR, db_path, port=port, workers=workers)
+
+    def open_sender():
+        connection = HttpConnection("127.0.0.1", port)
+        return connection.request, connection.close
+
+    try:
+        serving = await worker_pids(base_url, expected=workers)
+        throughput: Dict[str, float] = {}
+        errors = 0
+        for scenario in READ_SCENARIOS:
+            if scenario.name in scenarios:
+                result = await run_scenario(scenario, open_sender, **options)
+                throughput[scenario.name] = result["throughput"]
+                errors += result["errors"]
+        problems = await check_consistency(
+            base_url, items=options["items"], writes=writes, subscribers=subscribers
+        )
+    finally:
+        stop_server(server)
+    return {
+        "workers": workers,
+        "cold_start_workers": len(pids),
+        "serving_workers": len(serving),
+        "throughput": throughput,
+        "errors": errors,
+        "problems": problems,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Sobe o uvicorn com 1, 2, 4... processos sobre o mesmo inventory.db, mede a vazão de leitura "
+            "e confere se escritas feitas por um processo aparecem nos demais (cache, ETag e /events)."
+        )
+    )
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="Quantidades de processos")
+    parser.add_argument("--size", choices=list(SIZES), default="10k", help="Movimentações no banco")
+    parser.add_argument("--items", type=int, default=1000, help="Produtos no banco gerado")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=[scenario.name for scenario in READ_SCENARIOS],
+        default=["item_get", "items_page", "dashboard_item"],
+        help="Cenários de leitura medidos",
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="Requisições medidas por cenário")
+    parser.add_argument("--warmup", type=int, default=200, help="Requisições de aquecimento por cenário")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clientes simultâneos")
+    parser.add_argument("--writes", type=int, default=20, help="Escritas na verificação de consistência")
+    parser.add_argument("--subscribers", type=int, default=8, help="Conexões em /events na verificação")
+    parser.add_argument("--seed", type=int, default=1, help="Semente dos dados e das requisições")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "mrp-bench",
+        help="Onde guardar os bancos gerados para reutilização",
+    )
+    args = parser.parse_args()
+
+    options = {
+        "items": args.items,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    print(f"CPUs disponíveis: {os.cpu_count()}")
+    failures: List[str] = []
+    baseline: Dict[str, float] = {}
+    source = seeded_database(args.data_dir, size=args.size, items=args.items, seed=args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            db_path = working_copy(source, Path(directory), f"workers-{workers}")
+            result = asyncio.run(
+                run_workers(
+                    db_path,
+                    Path(directory),
+                    workers=workers,
+                    scenarios=args.scenarios,
+                    writes=args.writes,
+                    subscribers=args.subscribers,
+                    **options,
+                )
+            )
+            for name, throughput in result["throughput"].items():
+                baseline.setdefault(name, throughput)
+                print(
+                    f"{workers:>2} processo(s) {name:<20} {throughput:>8,.0f} req/s "
+                    f"({throughput / baseline[name]:.2f}x)"
+                )
+            print(
+                f"{workers:>2} processo(s) partida a frio: {result['cold_start_workers']}/{workers} | "
+                f"atendendo: {result['serving_workers']}/{workers} | "
+                f"consistência: {'ok' if not result['problems'] else 'FALHOU'}"
+            )
+            for problem in result["problems"]:
+                print(f"   {problem}")
+            if result["cold_start_workers"] < workers or result["serving_workers"] < workers:
+                failures.append(f"{workers} processo(s): nem todos os processos subiram")
+            if result["problems"]:
+                failures.append(f"{workers} processo(s): {len(result['problems'])} inconsistência(s)")
+            if result["errors"]:
+                failures.append(f"{workers} processo(s): {result['errors']} requisição(ões) com erro")
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
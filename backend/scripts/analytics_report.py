@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.analytics import (
+    ANALYTICS_CHUNK_SIZE,
+    DEFAULT_DEAD_STOCK_DAYS,
+    analytics_engine,
+    load_analytics,
+    summarize_analytics,
+)
+from app.database import create_tables, from_epoch_us, get_connection, to_epoch_us
+from app.schemas import AnalyticsSort
+
+
+def format_metric(value, digits: int = 2) -> str:
+    return "-" if value is None else f"{value:,.{digits}f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Calcule giro, consumo médio diário, dias de cobertura e estoque parado por produto "
+            "a partir de todo o histórico de movimentações (inclusive o arquivado)."
+        )
+    )
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Início da janela analisada (ISO 8601, UTC; padrão: todo o histórico)",
+    )
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Fim da janela analisada, exclusivo (ISO 8601, UTC; padrão: agora)",
+    )
+    parser.add_argument(
+        "--dead-stock-days",
+        type=int,
+        default=DEFAULT_DEAD_STOCK_DAYS,
+        help=f"Dias sem saída para considerar um produto parado (padrão: {DEFAULT_DEAD_STOCK_DAYS})",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=[sort.value for sort in AnalyticsSort],
+        default=AnalyticsSort.DAYS_OF_SUPPLY.value,
+        help="Ordem dos produtos (padrão: menor cobertura primeiro)",
+    )
+    parser.add_argument("--dead-stock", action="store_true", help="Listar apenas os produtos parados")
+    parser.add_argument("--limit", type=int, default=20, help="Produtos exibidos na tela (padrão: 20)")
+    parser.add_argument("--output", type=Path, default=None, help="Gravar todos os produtos neste arquivo CSV")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=ANALYTICS_CHUNK_SIZE,
+        help=f"Movimentações lidas por bloco (padrão: {ANALYTICS_CHUNK_SIZE})",
+    )
+    args = parser.parse_args()
+
+    if args.dead_stock_days <= 0:
+        raise SystemExit("--dead-stock-days must be greater than zero")
+    if args.chunk_size <= 0:
+        raise SystemExit("--chunk-size must be greater than zero")
+    start_ts = to_epoch_us(args.start) if args.start is not None else None
+    end_ts = to_epoch_us(args.end) if args.end is not None else None
+    if start_ts is not None and end_ts is not None and start_ts >= end_ts:
+        raise SystemExit("--start must be before --end")
+
+    with get_connection() as conn:
+        create_tables(conn)
+    started = time.perf_counter()
+    with get_connection(readonly=True) as conn:
+        data = load_analytics(conn, start_ts=start_ts, end_ts=end_ts, chunk_size=args.chunk_size)
+        loaded = time.perf_counter() - started
+        options = {
+            "dead_stock_days": args.dead_stock_days,
+            "sort": AnalyticsSort(args.sort),
+            "dead_stock_only": args.dead_stock,
+        }
+        result = summarize_analytics(conn, data, limit=args.limit, **options)
+        if args.output is not None:
+            rows = summarize_analytics(conn, data, **options).rows
+            with args.output.open("w", newline="", encoding="utf-8") as output:
+                writer = csv.DictWriter(output, fieldnames=list(rows[0]) if rows else ["id"])
+                writer.writeheader()
+                writer.writerows(rows)
+    elapsed = time.perf_counter() - started
+
+    window = f"{from_epoch_us(result.start_ts):%Y-%m-%d}" if result.start_ts is not None else "início"
+    print(
+        f"{result.movements:,} movimentações de {result.item_count:,} produtos "
+        f"({window} a {from_epoch_us(result.end_ts):%Y-%m-%d %H:%M}) em {elapsed:.2f}s "
+        f"(leitura {loaded:.2f}s, motor {analytics_engine()})"
+    )
+    print(f"Valor em estoque: R$ {result.inventory_value:,.2f} | consumido na janela: R$ {result.consumed_value:,.2f}")
+    print(
+        f"Estoque parado (sem saída há {result.dead_stock_days} dias): {result.dead_stock_count} produtos, "
+        f"R$ {result.dead_stock_value:,.2f}"
+    )
+    if result.rows:
+        print(f"{'ID':>8}  {'Produto':<30} {'Qtd':>10} {'Consumo/dia':>12} {'Giro':>8} {'Cobertura':>10}  Parado")
+    for row in result.rows:
+        print(
+            f"{row['id']:>8}  {row['name'][:30]:<30} {row['quantity']:>10,.2f} "
+            f"{format_metric(row['average_daily_consumption'], 3):>12} {format_metric(row['turnover']):>8} "
+            f"{format_metric(row['days_of_supply'], 1):>10}  {'sim' if row['dead_stock'] else ''}"
+        )
+    if args.output is not None:
+        print(f"Relatório completo gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
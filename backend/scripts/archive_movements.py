@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.archive import ARCHIVE_BATCH_DAYS, DEFAULT_RETENTION_DAYS, archive_cutoff, archive_movements
+from app.database import DAY_US, create_tables, from_epoch_us, get_connection
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Arquive movimentações anteriores à janela de retenção e gere os resumos diários "
+            "usados pelos dashboards. Pode ser executado repetidamente (incremental)."
+        )
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=DEFAULT_RETENTION_DAYS,
+        help=f"Dias mais recentes mantidos na tabela de movimentações (padrão: {DEFAULT_RETENTION_DAYS})",
+    )
+    parser.add_argument(
+        "--max-days",
+        type=int,
+        default=None,
+        help="Máximo de dias arquivados nesta execução (padrão: todos os pendentes)",
+    )
+    parser.add_argument(
+        "--batch-days",
+        type=int,
+        default=ARCHIVE_BATCH_DAYS,
+        help=f"Dias arquivados por transação (padrão: {ARCHIVE_BATCH_DAYS})",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Mostrar cada lote arquivado")
+    args = parser.parse_args()
+
+    if args.retention_days < 0:
+        raise SystemExit("--retention-days must not be negative")
+    if args.max_days is not None and args.max_days <= 0:
+        raise SystemExit("--max-days must be greater than zero")
+    if args.batch_days <= 0:
+        raise SystemExit("--batch-days must be greater than zero")
+
+    def report_batch(first_day: int, end_day: int, count: int) -> None:
+        if args.verbose:
+            print(
+                f"  {from_epoch_us(first_day * DAY_US):%Y-%m-%d} a "
+                f"{from_epoch_us((end_day - 1) * DAY_US):%Y-%m-%d}: {count} movimentações"
+            )
+
+    cutoff = archive_cutoff(args.retention_days)
+    started = time.perf_counter()
+    with get_connection() as conn:
+        create_tables(conn)
+        result = archive_movements(
+            conn,
+            before_ts=cutoff,
+            max_days=args.max_days,
+            batch_days=args.batch_days,
+            on_batch=report_batch,
+        )
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Arquivadas {result.movements} movimentações de {result.days} dias em {elapsed:.2f}s "
+        f"(corte: {from_epoch_us(cutoff):%Y-%m-%d})."
+    )
+    if result.archived_before:
+        print(f"Histórico arquivado até {from_epoch_us(result.archived_before):%Y-%m-%d} (exclusive).")
+
+
+if __name__ == "__main__":
+    main()
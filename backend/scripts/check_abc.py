@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+from typing import Dict, List, Tuple
+
+from app.database import create_tables, fetch_abc_rows, fetch_abc_summary
+
+SHARE_TOLERANCE = 1e-9
+
+
+def classify_abc(items: List[Tuple[int, float]], *, a: float, b: float) -> List[Tuple[int, float, str]]:
+    # Reference classification, formerly computed in the reports page from the
+    # full /items list: items as (id, total_value) in id order.
+    total_value = 0.0
+    for _, value in items:
+        total_value += value
+    if total_value <= 0:
+        return []
+    rows: List[Tuple[int, float, str]] = []
+    running_value = 0.0
+    # sorted() is stable, so ties keep the id order.
+    for item_id, value in sorted(items, key=lambda item: -item[1]):
+        running_value += value
+        cumulative = running_value / total_value
+        klass = "A" if cumulative <= a else "B" if cumulative <= b else "C"
+        rows.append((item_id, cumulative, klass))
+    return rows
+
+
+def boundary_datasets(*, items: int, seed: int) -> Dict[str, List[Tuple[float, float]]]:
+    # (quantity, unit_price) per item. The first ones put the cumulative share
+    # exactly on the default 0.8 and 0.95 thresholds.
+    rng = random.Random(seed)
+    return {
+        "limites exatos": [(80, 1.0), (15, 1.0), (5, 1.0)],
+        "empates": [(40, 1.0), (15, 1.0), (40, 1.0), (5, 1.0)],
+        "centavos": [(1, 0.1), (1, 0.2), (1, 0.5), (1, 0.15), (1, 0.05)],
+        "sem valor": [(0, 10.0), (5, 0.0)],
+        "aleatório": [
+            (rng.choice((0, 1, 2, 5, 10, 12.5, 100)), round(rng.uniform(0, 50), 2)) for _ in range(items)
+        ],
+    }
+
+
+def check_dataset(name: str, stock: List[Tuple[float, float]], *, a: float, b: float) -> bool:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    create_tables(conn)
+    conn.executemany(
+        "INSERT INTO items (name, category, unit, quantity, unit_price) VALUES (?, 'teste', 'un', ?, ?);",
+        ((f"produto {index}", quantity, unit_price) for index, (quantity, unit_price) in enumerate(stock)),
+    )
+    items = [(row[0], row[1]) for row in conn.execute("SELECT id, quantity * unit_price FROM items ORDER BY id;")]
+    expected = classify_abc(items, a=a, b=b)
+    actual = [
+        (row["id"], row["cumulative"], row["abc_class"])
+        for row in fetch_abc_rows(conn, a=a, b=b, limit=len(items) + 1)
+    ]
+    summary = {row["abc_class"]: (row["item_count"], row["share"]) for row in fetch_abc_summary(conn, a=a, b=b)}
+    conn.close()
+
+    values = dict(items)
+    total_value = sum(value for _, value in items)
+    expected_summary: Dict[str, Tuple[int, float]] = {}
+    for item_id, _, klass in expected:
+        count, share = expected_summary.get(klass, (0, 0.0))
+        expected_summary[klass] = (count + 1, share + values[item_id] / total_value)
+
+    problems = [
+        f"linha {rank}: esperado {want}, obtido {got}"
+        for rank, (want, got) in enumerate(zip(expected, actual), start=1)
+        if want[0] != got[0] or want[2] != got[2] or abs(want[1] - got[1]) > SHARE_TOLERANCE
+    ]
+    if len(expected) != len(actual):
+        problems.append(f"{len(expected)} linhas esperadas, {len(actual)} obtidas")
+    for klass in expected_summary.keys() | summary.keys():
+        want_count, want_share = expected_summary.get(klass, (0, 0.0))
+        got_count, got_share = summary.get(klass, (0, 0.0))
+        if want_count != got_count or abs(want_share - got_share) > SHARE_TOLERANCE:
+            problems.append(f"classe {klass}: esperado {want_count} itens, obtido {got_count}")
+    classes = "".join(klass for _, _, klass in actual[:12])
+    if not problems:
+        print(f"OK: {name} ({len(items)} itens; classes {classes}{'…' if len(actual) > 12 else ''})")
+        return True
+    print(f"DIVERGÊNCIA: {name}")
+    for problem in problems[:10]:
+        print(f"  {problem}")
+    return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Confira a curva ABC calculada no banco (/reports/abc) contra a classificação de referência "
+            "em dados com acumulados exatamente sobre os limites das classes."
+        )
+    )
+    parser.add_argument("--a", type=float, default=0.8, help="Limite acumulado da classe A (padrão: 0.8)")
+    parser.add_argument("--b", type=float, default=0.95, help="Limite acumulado da classe B (padrão: 0.95)")
+    parser.add_argument("--items", type=int, default=2000, help="Itens do conjunto aleatório (padrão: 2000)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do conjunto aleatório (padrão: 42)")
+    args = parser.parse_args()
+
+    results = [
+        check_dataset(name, stock, a=args.a, b=args.b)
+        for name, stock in boundary_datasets(items=args.items, seed=args.seed).items()
+    ]
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
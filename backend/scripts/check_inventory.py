@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import database
+from app.database import (
+    DAY_US,
+    check_total_inventory,
+    close_pools,
+    create_tables,
+    fetch_all_items,
+    fetch_total_inventory,
+    from_epoch_us,
+    get_connection,
+    rebuild_total_inventory,
+    recalculate_total_inventory,
+    to_epoch_us,
+    utc_now_us,
+)
+
+TOLERANCE = 0.005
+WORKLOAD_OPERATIONS = ("create", "delete", "entry", "exit", "price", "batch")
+WORKLOAD_WEIGHTS = (3, 1, 4, 4, 2, 2)
+
+
+def replay_movements(conn, as_of: int) -> Dict[int, Tuple[float, float]]:
+    # Full replay of the history, deliberately naive: no checkpoints, no indexes.
+    state: Dict[int, Tuple[float, float]] = {}
+    cursor = conn.execute(
+        """
+        SELECT item_id, movement_type, quantity, unit_price, ts, id FROM movements WHERE ts <= ?
+        UNION ALL
+        SELECT item_id, movement_type, quantity, unit_price, ts, id FROM movements_archive WHERE ts <= ?
+        ORDER BY ts, id;
+        """,
+        (as_of, as_of),
+    )
+    for item_id, movement_type, quantity, unit_price, _, _ in cursor:
+        current = state.get(item_id, (0.0, 0.0))[0]
+        if movement_type == "init":
+            current = quantity
+        elif movement_type == "entry":
+            current += quantity
+        else:
+            current -= quantity
+        state[item_id] = (current, unit_price)
+    return state
+
+
+def as_of_mismatches(
+    conn, as_of_us: int
+) -> Tuple[Dict[int, Tuple[float, float]], Dict[int, Tuple[float, float]], List[int]]:
+    expected = replay_movements(conn, as_of_us)
+    existing = {row["id"] for row in fetch_all_items(conn)}
+    expected = {item_id: state for item_id, state in expected.items() if item_id in existing}
+    actual = {row["id"]: (row["quantity"], row["unit_price"]) for row in fetch_all_items(conn, as_of=as_of_us)}
+    mismatched = [
+        item_id
+        for item_id in expected.keys() | actual.keys()
+        if item_id not in expected
+        or item_id not in actual
+        or abs(expected[item_id][0] - actual[item_id][0]) > TOLERANCE
+        or abs(expected[item_id][1] - actual[item_id][1]) > TOLERANCE
+    ]
+    return expected, actual, mismatched
+
+
+def check_as_of(conn, as_of: datetime) -> None:
+    expected, actual, mismatched = as_of_mismatches(conn, to_epoch_us(as_of))
+    expected_total = sum(quantity * unit_price for quantity, unit_price in expected.values())
+    actual_total = sum(quantity * unit_price for quantity, unit_price in actual.values())
+    print(f"Estoque em {as_of.isoformat()}: {len(actual)} itens, R$ {actual_total:.2f}")
+    print(f"Reprocessamento completo: {len(expected)} itens, R$ {expected_total:.2f}")
+    if not mismatched:
+        print("OK: posição histórica consistente.")
+        return
+    print(f"DIVERGÊNCIA em {len(mismatched)} itens, ex.: {sorted(mismatched)[:10]}")
+    raise SystemExit(1)
+
+
+def replay_total(conn, as_of: int) -> float:
+    return sum(quantity * unit_price for quantity, unit_price in replay_movements(conn, as_of).values())
+
+
+def random_movement(rng: random.Random, item_ids: List[int]) -> Dict[str, object]:
+    # Now and then an unknown item or an exit larger than the stock, so
+    # rejected writes are covered too.
+    return {
+        "item_id": rng.choice(item_ids) if item_ids and rng.random() < 0.95 else 10**9,
+        "movement_type": rng.choice(("entry", "exit")),
+        "quantity": round(rng.uniform(0.01, 80), 2),
+        "unit_price": round(rng.uniform(0.5, 300), 2) if rng.random() < 0.3 else None,
+    }
+
+
+def apply_random_operation(client, rng: random.Random, item_ids: List[int], step: int) -> Tuple[str, Any]:
+    # One write through the API (a fastapi TestClient): item creation or
+    # deletion, entry, exit, price change or batch. item_ids is kept current.
+    operation = rng.choices(WORKLOAD_OPERATIONS, WORKLOAD_WEIGHTS)[0]
+    if operation == "create" or not item_ids:
+        operation = "create"
+        response = client.post(
+            "/items",
+            json={
+                "name": f"produto {step}",
+                "category": rng.choice(("matéria-prima", "embalagem", "produto acabado")),
+                "unit": "un",
+                "quantity": round(rng.uniform(0, 200), 2),
+                "unit_price": round(rng.uniform(0.5, 300), 2),
+            },
+        )
+        item_ids.append(response.json()["id"])
+    elif operation == "delete":
+        response = client.delete(f"/items/{item_ids.pop(rng.randrange(len(item_ids)))}")
+    elif operation == "price":
+        response = client.post(
+            "/movements",
+            json={
+                "item_id": rng.choice(item_ids),
+                "movement_type": "entry",
+                "quantity": 0.01,
+                "unit_price": round(rng.uniform(0.5, 300), 2),
+            },
+        )
+    elif operation == "batch":
+        response = client.post(
+            "/movements/batch",
+            json={
+                "movements": [random_movement(rng, item_ids) for _ in range(rng.randint(1, 20))],
+                "mode": rng.choice(("atomic", "best_effort")),
+            },
+        )
+    else:
+        movement = random_movement(rng, item_ids)
+        movement["movement_type"] = operation
+        response = client.post("/movements", json=movement)
+    return operation, response
+
+
+def total_mismatch(conn) -> Optional[Tuple[float, float, float]]:
+    # (maintained, recomputed, replayed) when they disagree by more than a
+    # cent: the recompute is rounded to cents, the maintained total is not.
+    stored = fetch_total_inventory(conn)
+    recomputed = recalculate_total_inventory(conn)
+    replayed = replay_total(conn, utc_now_us())
+    if abs(stored - recomputed) > 2 * TOLERANCE or abs(stored - replayed) > 2 * TOLERANCE:
+        return stored, recomputed, replayed
+    return None
+
+
+def build_as_of_history(client, *, seed: int) -> Tuple[Dict[str, int], Dict[int, str]]:
+    # On the empty database behind client: seeded entries and exits over ~4
+    # months, price changes and a deleted item through the API, and everything
+    # older than 30 days archived. Returns the moments worth checking (before
+    # the first movement, exactly on movements, around the archive cutoff, now
+    # and in the future) and the category of each remaining item.
+    from app.archive import archive_cutoff, archive_movements
+    from scripts.seed_db import seed_database
+
+    seed_database(item_count=40, seed=seed, movement_count=3000, movement_interval_us=3600 * 1_000_000)
+    rng = random.Random(seed)
+    item_ids = [item["id"] for item in client.get("/items").json()]
+    for item_id in rng.sample(item_ids, 5):
+        client.post(
+            "/movements",
+            json={"item_id": item_id, "movement_type": "entry", "quantity": 3, "unit_price": 999.5},
+        )
+    client.delete(f"/items/{item_ids[0]}")
+    with get_connection() as conn:
+        archived_before = archive_movements(conn, before_ts=archive_cutoff(30)).archived_before
+        archived_ts = [row[0] for row in conn.execute("SELECT ts FROM movements_archive ORDER BY ts;")]
+        live_ts = [row[0] for row in conn.execute("SELECT ts FROM movements ORDER BY ts;")]
+        categories = {row["id"]: row["category"] for row in fetch_all_items(conn)}
+    if not archived_ts or not live_ts:
+        raise RuntimeError("Generated history does not cross the archive cutoff")
+
+    first_ts, now = archived_ts[0], utc_now_us()
+    moments = {
+        "antes da primeira movimentação": first_ts - 1,
+        "na primeira movimentação": first_ts,
+        "em uma movimentação arquivada": archived_ts[len(archived_ts) // 2],
+        "na última movimentação arquivada": archived_ts[-1],
+        "logo antes do corte do arquivo": archived_before - 1,
+        "no corte do arquivo": archived_before,
+        "na primeira movimentação recente": live_ts[0],
+        "na última mudança de preço": live_ts[-1],
+        "agora": now,
+        "no futuro": now + 365 * DAY_US,
+    }
+    return moments, categories
+
+
+def check_as_of_moment(client, as_of_us: int, categories: Dict[int, str]) -> Tuple[List[str], float]:
+    # Problems found for one moment, comparing GET /items?as_of (through
+    # fetch_all_items) and /reports/valuation?as_of with the full replay, and
+    # the replayed total value.
+    with get_connection(readonly=True) as conn:
+        expected, _, mismatched = as_of_mismatches(conn, as_of_us)
+    report = client.get("/reports/valuation", params={"as_of": from_epoch_us(as_of_us).isoformat()}).json()
+    expected_categories: Dict[str, Tuple[int, float]] = {}
+    for item_id, (quantity, unit_price) in expected.items():
+        count, value = expected_categories.get(categories[item_id], (0, 0.0))
+        expected_categories[categories[item_id]] = (count + 1, value + quantity * unit_price)
+    reported = {entry["category"]: (entry["item_count"], entry["total_value"]) for entry in report["categories"]}
+    problems = [f"item {item_id}" for item_id in sorted(mismatched)]
+    for category in expected_categories.keys() | reported.keys():
+        count, value = expected_categories.get(category, (0, 0.0))
+        reported_count, reported_value = reported.get(category, (0, 0.0))
+        if count != reported_count or abs(value - reported_value) > 2 * TOLERANCE:
+            problems.append(f"{category}: valuation {reported_count} itens, R$ {reported_value:.2f}")
+    return problems, sum(value for _, value in expected_categories.values())
+
+
+def check_as_of_scenarios(*, seed: int) -> None:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        database.DB_PATH = Path(directory) / "inventory.db"
+        try:
+            with TestClient(app) as client:
+                moments, categories = build_as_of_history(client, seed=seed)
+                for label, as_of_us in moments.items():
+                    problems, total = check_as_of_moment(client, as_of_us, categories)
+                    moment = f"{label} ({from_epoch_us(as_of_us).isoformat()})"
+                    if problems:
+                        failures += 1
+                        print(f"DIVERGÊNCIA {moment}: {', '.join(problems[:10])}")
+                    else:
+                        print(f"OK: {moment}: R$ {total:.2f}")
+        finally:
+            close_pools()
+    if failures:
+        raise SystemExit(1)
+
+
+def check_randomized(steps: int, *, seed: int) -> None:
+    # Drives the API against a temporary database with a seeded random mix of
+    # writes and compares the maintained total with a full recompute and a
+    # replay of the movements after every step.
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    rng = random.Random(seed)
+    item_ids: List[int] = []
+    with tempfile.TemporaryDirectory() as directory:
+        database.DB_PATH = Path(directory) / "inventory.db"
+        try:
+            with TestClient(app) as client:
+                for step in range(1, steps + 1):
+                    operation, response = apply_random_operation(client, rng, item_ids, step)
+                    if response.status_code >= 500:
+                        raise SystemExit(f"Passo {step} ({operation}): erro {response.status_code} na API")
+                    with get_connection(readonly=True) as conn:
+                        mismatch = total_mismatch(conn)
+                    if mismatch is not None:
+                        stored, recomputed, replayed = mismatch
+                        print(
+                            f"DIVERGÊNCIA no passo {step} ({operation}): mantido R$ {stored:.2f}, "
+                            f"recalculado R$ {recomputed:.2f}, reprocessado R$ {replayed:.2f}"
+                        )
+                        raise SystemExit(1)
+        finally:
+            close_pools()
+    print(f"OK: total mantido igual ao recálculo após {steps} operações ({len(item_ids)} itens, semente {seed}).")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Verifique o valor total mantido do estoque contra um recálculo completo."
+    )
+    parser.add_argument(
+        "--fix",
+        action="store_true",
+        help="Reconstruir o total mantido a partir da tabela de itens quando houver divergência",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Conferir a posição do estoque nesta data (ISO 8601, UTC) contra o reprocessamento do histórico",
+    )
+    parser.add_argument(
+        "--randomized",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Aplicar N operações aleatórias em um banco temporário e conferir o total após cada uma",
+    )
+    parser.add_argument(
+        "--as-of-scenarios",
+        action="store_true",
+        help=(
+            "Gerar um histórico em um banco temporário, arquivar parte dele e conferir as posições "
+            "em várias datas contra o reprocessamento"
+        ),
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente dos dados gerados (padrão: 42)")
+    args = parser.parse_args()
+
+    if args.as_of_scenarios:
+        check_as_of_scenarios(seed=args.seed)
+        return
+
+    if args.randomized is not None:
+        if args.randomized <= 0:
+            raise SystemExit("--randomized must be greater than zero")
+        check_randomized(args.randomized, seed=args.seed)
+        return
+
+    with get_connection() as conn:
+        create_tables(conn)
+        if args.as_of is not None:
+            check_as_of(conn, args.as_of)
+            return
+        stored, actual = check_total_inventory(conn)
+        difference = stored - actual
+        print(f"Total mantido: R$ {stored:.2f}")
+        print(f"Total recalculado: R$ {actual:.2f}")
+        if abs(difference) <= TOLERANCE:
+            print("OK: total consistente.")
+            return
+
+        print(f"DIVERGÊNCIA: R$ {difference:+.2f}")
+        if not args.fix:
+            raise SystemExit(1)
+
+        rebuilt = rebuild_total_inventory(conn)
+        conn.commit()
+        print(f"Total reconstruído: R$ {rebuilt:.2f}")
+
+
+if __name__ == "__main__":
+    main()
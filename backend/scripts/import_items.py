@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from app.database import create_tables, get_connection
+from app.importer import IMPORT_CHUNK_SIZE, detect_format, import_items_file
+from app.schemas import ImportFormat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importe produtos em massa a partir de um arquivo CSV ou NDJSON.")
+    parser.add_argument("path", type=Path, help="Arquivo CSV (com cabeçalho) ou NDJSON, ou '-' para stdin")
+    parser.add_argument(
+        "--format",
+        choices=[fmt.value for fmt in ImportFormat],
+        default=None,
+        help="Formato do arquivo (padrão: detectado pela extensão)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=IMPORT_CHUNK_SIZE,
+        help=f"Linhas gravadas por transação (padrão: {IMPORT_CHUNK_SIZE})",
+    )
+    args = parser.parse_args()
+
+    if args.chunk_size <= 0:
+        raise SystemExit("--chunk-size must be greater than zero")
+
+    import_format = ImportFormat(args.format) if args.format else detect_format(str(args.path))
+    if import_format is None:
+        raise SystemExit("Não foi possível detectar o formato; informe --format csv|ndjson")
+
+    with get_connection() as conn:
+        create_tables(conn)
+
+    started = time.perf_counter()
+    if str(args.path) == "-":
+        result = import_items_file(sys.stdin.buffer, import_format, chunk_size=args.chunk_size)
+    else:
+        with args.path.open("rb") as source:
+            result = import_items_file(source, import_format, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+
+    print(f"Importados {result.imported} itens em {elapsed:.2f}s ({result.rejected} rejeitados).")
+    for row in result.errors:
+        print(f"  linha {row.line}: {row.error}")
+    if result.errors_truncated:
+        print(f"  ... e mais {result.rejected - len(result.errors)} linhas rejeitadas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
 import sys
-from datetime import datetime
 from typing import Optional
 
 from app.database import (
-    DATETIME_FORMAT,
     calculate_total_inventory,
+    close_pools,
     create_tables,
     delete_item as db_delete_item,
     fetch_all_items,
@@ -14,13 +13,11 @@ from app.database import (
     get_connection,
     insert_item,
     insert_movement,
+    utc_now_us,
 )
 from app.schemas import MovementKind
 
 
-LOW_STOCK_THRESHOLD = 5
-
-
 def input_nonempty(prompt: str) -> str:
     while True:
         value = input(prompt).strip()
@@ -47,7 +44,7 @@ def print_item_row(row) -> None:
     quantity = row["quantity"] or 0.0
     unit_price = row["unit_price"] or 0.0
     total_value = quantity * unit_price
-    low_stock = quantity < LOW_STOCK_THRESHOLD
+    low_stock = quantity < row["low_stock_threshold"]
     flag = " (BAIXO ESTOQUE)" if low_stock else ""
     print(
         f"ID: {row['id']} | Nome: {row['name']} | Categoria: {row['category']} | "
@@ -56,7 +53,7 @@ def print_item_row(row) -> None:
 
 
 def action_listar() -> None:
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         rows = fetch_all_items(conn)
         if not rows:
             print("Nenhum produto cadastrado.")
@@ -83,7 +80,7 @@ def action_cadastrar() -> None:
             quantity=quantity,
             unit_price=unit_price,
         )
-        timestamp = datetime.utcnow().strftime(DATETIME_FORMAT)
+        ts = utc_now_us()
         total_after = calculate_total_inventory(conn)
         insert_movement(
             conn,
@@ -91,7 +88,7 @@ def action_cadastrar() -> None:
             movement_type=MovementKind.INIT.value,
             quantity=quantity,
             unit_price=unit_price,
-            timestamp=timestamp,
+            ts=ts,
             quantity_after=quantity,
             total_value_after=total_after,
         )
@@ -193,3 +190,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nEncerrado pelo usuário.")
         sys.exit(0)
+    finally:
+        close_pools()
@@ -2,20 +2,25 @@ from __future__ import annotations
 
 import argparse
 import random
-from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List, Tuple
 
 from faker import Faker
 
 from app.database import (
-    DATETIME_FORMAT,
     calculate_total_inventory,
     create_tables,
+    fetch_total_inventory,
     get_connection,
+    immediate_transaction,
+    insert_change_event,
     insert_item,
     insert_movement,
+    insert_movements,
+    update_item_records,
+    utc_now_us,
 )
 from app.schemas import MovementKind
+from app.services import encode_json
 
 CATEGORIES: List[str] = [
     "Matéria-prima",
@@ -38,11 +43,21 @@ BASE_ITEMS = [
 
 UNITS: List[str] = ["un", "kg", "L", "m", "caixa(s)"]
 
+MOVEMENT_CHUNK_SIZE = 50_000
+
 
 def clear_tables(conn) -> None:
+    # Archived history and rollups go too, or the dashboards would keep serving
+    # the old dataset's days. The resync event makes running servers reload.
     cursor = conn.cursor()
     cursor.execute("DELETE FROM movements;")
+    cursor.execute("DELETE FROM movements_archive;")
+    cursor.execute("DELETE FROM item_daily_rollups;")
+    cursor.execute("DELETE FROM inventory_daily_rollups;")
+    cursor.execute("DELETE FROM change_events;")
     cursor.execute("DELETE FROM items;")
+    cursor.execute("UPDATE inventory_summary SET total_value = 0.0, archived_before = 0 WHERE id = 1;")
+    insert_change_event(conn, "resync", encode_json({"reason": "reseed"}))
     conn.commit()
 
 
@@ -91,7 +106,54 @@ def generate_items(faker: Faker, count: int) -> List[dict[str, float | str]]:
     return items
 
 
-def seed_database(*, force: bool = False, item_count: int = 5, seed: int | None = None) -> None:
+def generate_movements(
+    conn,
+    *,
+    count: int,
+    start_ts: int,
+    interval_us: int,
+) -> int:
+    # Random entries/exits replayed against the current stock, so every
+    # quantity_after/total_value_after is consistent and no exit overdraws.
+    state: Dict[int, Tuple[float, float]] = {
+        row["id"]: (row["quantity"] or 0.0, row["unit_price"] or 0.0)
+        for row in conn.execute("SELECT id, quantity, unit_price FROM items;")
+    }
+    item_ids = list(state)
+    total_value = fetch_total_inventory(conn)
+    inserted = 0
+    while inserted < count:
+        records = []
+        for offset in range(min(MOVEMENT_CHUNK_SIZE, count - inserted)):
+            item_id = random.choice(item_ids)
+            quantity, unit_price = state[item_id]
+            amount = round(random.uniform(1, 20), 2)
+            if quantity >= amount and random.random() < 0.5:
+                movement_type = MovementKind.EXIT.value
+                new_quantity = quantity - amount
+            else:
+                movement_type = MovementKind.ENTRY.value
+                new_quantity = quantity + amount
+            total_value += (new_quantity - quantity) * unit_price
+            state[item_id] = (new_quantity, unit_price)
+            ts = start_ts + (inserted + offset) * interval_us
+            records.append((item_id, movement_type, amount, unit_price, ts, new_quantity, total_value))
+        with immediate_transaction(conn):
+            insert_movements(conn, records)
+        inserted += len(records)
+    with immediate_transaction(conn):
+        update_item_records(conn, ((item_id, quantity, price) for item_id, (quantity, price) in state.items()))
+    return inserted
+
+
+def seed_database(
+    *,
+    force: bool = False,
+    item_count: int = 5,
+    seed: int | None = None,
+    movement_count: int = 0,
+    movement_interval_us: int = 60_000_000,
+) -> None:
     faker = Faker("pt_BR")
     if seed is not None:
         Faker.seed(seed)
@@ -111,13 +173,13 @@ def seed_database(*, force: bool = False, item_count: int = 5, seed: int | None
             clear_tables(conn)
 
         seed_items = generate_items(faker, item_count)
-        # Base timestamp so data remains reproducible with --seed
-        base_time = datetime.utcnow()
+        # Base timestamp so data remains reproducible with --seed; with a generated
+        # history, start early enough for it to end around now
+        base_ts = utc_now_us() - movement_count * movement_interval_us
         for idx, payload in enumerate(seed_items):
             item_id = insert_item(conn, **payload)
             # Spread timestamps by seconds (can adjust granularity if needed)
-            timestamp_dt = base_time + timedelta(seconds=idx)
-            timestamp = timestamp_dt.strftime(DATETIME_FORMAT)
+            ts = base_ts + idx * 1_000_000
             total_after = calculate_total_inventory(conn)
             insert_movement(
                 conn,
@@ -125,13 +187,22 @@ def seed_database(*, force: bool = False, item_count: int = 5, seed: int | None
                 movement_type=MovementKind.INIT.value,
                 quantity=payload["quantity"],
                 unit_price=payload["unit_price"],
-                timestamp=timestamp,
+                ts=ts,
                 quantity_after=payload["quantity"],
                 total_value_after=total_after,
             )
         conn.commit()
         print(f"Inseridos {len(seed_items)} itens no inventory.db")
 
+        if movement_count:
+            generated = generate_movements(
+                conn,
+                count=movement_count,
+                start_ts=base_ts + len(seed_items) * 1_000_000,
+                interval_us=movement_interval_us,
+            )
+            print(f"Inseridas {generated} movimentações de histórico")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Inicie o banco de dados de inventário com dados de amostra.")
@@ -152,12 +223,32 @@ def main() -> None:
         default=None,
         help="Semente aleatória opcional para dados reproduzíveis",
     )
+    parser.add_argument(
+        "--movements",
+        type=int,
+        default=0,
+        help="Quantas movimentações de histórico (entradas/saídas) gerar após o cadastro (padrão: 0)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="Segundos entre movimentações consecutivas do histórico (padrão: 60)",
+    )
     args = parser.parse_args()
 
     if args.items <= 0:
         raise SystemExit("--items must be greater than zero")
-
-    seed_database(force=args.force, item_count=args.items, seed=args.seed)
+    if args.movements < 0:
+        raise SystemExit("--movements must not be negative")
+
+    seed_database(
+        force=args.force,
+        item_count=args.items,
+        seed=args.seed,
+        movement_count=args.movements,
+        movement_interval_us=int(args.interval * 1_000_000),
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database, main
+
+
+@pytest.fixture
+def client(tmp_path) -> Iterator[TestClient]:
+    # The API on an empty database of its own. Cached responses are tagged
+    # with the revision only, so they are dropped between databases.
+    path = database.DB_PATH
+    database.DB_PATH = tmp_path / "inventory.db"
+    main.response_cache.clear()
+    try:
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        database.close_pools()
+        database.DB_PATH = path
@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from scripts.check_inventory import build_as_of_history, check_as_of_moment
+
+
+def test_as_of_matches_full_replay(client) -> None:
+    # Before the first movement, exactly on movements, around the archive
+    # cutoff, now and in the future.
+    moments, categories = build_as_of_history(client, seed=42)
+    for label, as_of_us in moments.items():
+        problems, _ = check_as_of_moment(client, as_of_us, categories)
+        assert not problems, f"{label} ({as_of_us}): {problems[:10]}"
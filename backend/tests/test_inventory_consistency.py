@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import random
+from typing import List
+
+import pytest
+
+from app.database import get_connection
+from scripts.check_inventory import apply_random_operation, total_mismatch
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_maintained_total_matches_recompute_and_replay(client, seed: int) -> None:
+    rng = random.Random(seed)
+    item_ids: List[int] = []
+    for step in range(1, 301):
+        operation, response = apply_random_operation(client, rng, item_ids, step)
+        assert response.status_code < 500, f"step {step} ({operation}): {response.text}"
+        with get_connection(readonly=True) as conn:
+            mismatch = total_mismatch(conn)
+        assert mismatch is None, f"step {step} ({operation}): maintained, recomputed, replayed = {mismatch}"
@@ -7,27 +7,42 @@ import {
   Text,
   VStack,
 } from "@chakra-ui/react"
+import { useQuery } from "@tanstack/react-query"
 import { LuPackage } from "react-icons/lu"
-import type { Item } from "@/lib/api"
+import { getLowStockItems } from "@/lib/api"
 
 interface LowStockPanelProps {
-  items: Item[]
+  hasItems: boolean
 }
 
-const LOW_STOCK_THRESHOLD = 5
-
-export function LowStockPanel({ items }: LowStockPanelProps) {
-  const lowStockProducts = items.filter((item) => item.lowStock)
+export function LowStockPanel({ hasItems }: LowStockPanelProps) {
+  // Served by the backend's low-stock index, most urgent shortfall first.
+  const {
+    data: lowStockProducts = [],
+    isPending,
+    isError,
+    refetch,
+  } = useQuery({
+    queryKey: ["items", "low-stock"],
+    queryFn: () => getLowStockItems(),
+    retry: 1,
+  })
 
   return (
     <Box maxH="lg" bg="bg.panel" borderRadius="lg" borderWidth="1px" p={6}>
       <Heading size="md">Estoque baixo</Heading>
       <Text color="fg.muted" mt={2}>
-        Produtos com quantidade menor que {LOW_STOCK_THRESHOLD} irão aparecer
-        aqui.
+        Produtos abaixo do ponto de reposição (do produto ou da categoria) irão
+        aparecer aqui.
       </Text>
       <Stack gap={3} mt={6} overflowY="auto" maxH="xs">
-        {lowStockProducts.length === 0 ? (
+        {isPending ? (
+          <Text color="fg.muted">Carregando...</Text>
+        ) : isError ? (
+          <Text color="red.500" cursor="pointer" onClick={() => refetch()}>
+            Não foi possível carregar. Clique para tentar novamente.
+          </Text>
+        ) : lowStockProducts.length === 0 ? (
           <Flex align="center" h="full" justify="center" py={10} w="full">
             <EmptyState.Root>
               <EmptyState.Content>
@@ -39,7 +54,7 @@ export function LowStockPanel({ items }: LowStockPanelProps) {
                     Nenhum produto com estoque baixo
                   </EmptyState.Title>
                   <EmptyState.Description>
-                    {items.length === 0
+                    {!hasItems
                       ? "Nenhum produto cadastrado no sistema."
                       : "Que bom! Todos os produtos possuem quantidade suficiente em estoque."}
                   </EmptyState.Description>
@@ -73,7 +88,9 @@ export function LowStockPanel({ items }: LowStockPanelProps) {
                 px={3}
                 py={1}
               >
-                Qtd: {product.quantity.toLocaleString("pt-BR")} {product.unit}
+                Qtd: {product.quantity.toLocaleString("pt-BR")} /{" "}
+                {product.lowStockThreshold.toLocaleString("pt-BR")}{" "}
+                {product.unit}
               </Box>
             </Flex>
           ))
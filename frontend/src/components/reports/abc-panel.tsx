@@ -10,20 +10,10 @@ import {
   Table,
   Text,
 } from "@chakra-ui/react"
-import type { Item } from "@/lib/api"
-
-type ABCClass = "A" | "B" | "C"
+import type { ABCReport } from "@/lib/api"
 
 interface ABCPanelProps {
-  items: Item[]
-  thresholds?: { A: number; B: number }
-  showRows?: number
-}
-
-type ABCRow = Item & {
-  contribution: number // 0..1
-  cumulative: number // 0..1
-  klass: ABCClass
+  report: ABCReport
 }
 
 const percentFmt = new Intl.NumberFormat("pt-BR", {
@@ -32,47 +22,8 @@ const percentFmt = new Intl.NumberFormat("pt-BR", {
   maximumFractionDigits: 1,
 })
 
-const defaultThresholds = { A: 0.8, B: 0.95 }
-
-function classifyABC(
-  items: Item[],
-  thresholds = defaultThresholds
-): { rows: ABCRow[]; summary: Record<ABCClass, { count: number; share: number }> } {
-  const totalValue = items.reduce((acc, it) => acc + it.totalValue, 0)
-  if (totalValue <= 0) {
-    return {
-      rows: [],
-      summary: { A: { count: 0, share: 0 }, B: { count: 0, share: 0 }, C: { count: 0, share: 0 } },
-    }
-  }
-
-  const sorted = [...items].sort((a, b) => b.totalValue - a.totalValue)
-  let running = 0
-  const rows: ABCRow[] = sorted.map((it) => {
-    const contrib = it.totalValue / totalValue
-    running += contrib
-    let klass: ABCClass
-    if (running <= thresholds.A) klass = "A"
-    else if (running <= thresholds.B) klass = "B"
-    else klass = "C"
-    return { ...it, contribution: contrib, cumulative: running, klass }
-  })
-
-  const sum: Record<ABCClass, { count: number; share: number }> = {
-    A: { count: 0, share: 0 },
-    B: { count: 0, share: 0 },
-    C: { count: 0, share: 0 },
-  }
-  rows.forEach((r) => {
-    sum[r.klass].count += 1
-    sum[r.klass].share += r.contribution
-  })
-
-  return { rows, summary: sum }
-}
-
-export function ABCPanel({ items, thresholds = defaultThresholds, showRows = 15 }: ABCPanelProps) {
-  const { rows, summary } = classifyABC(items, thresholds)
+export function ABCPanel({ report }: ABCPanelProps) {
+  const { rows, summary, thresholds } = report
 
   return (
     <Box bg="bg.surface" borderRadius="lg" borderWidth="1px" p={{ base: 6, md: 8 }}>
@@ -104,7 +55,7 @@ export function ABCPanel({ items, thresholds = defaultThresholds, showRows = 15
                 </Table.Row>
               </Table.Header>
               <Table.Body>
-                {rows.slice(0, showRows).map((r) => (
+                {rows.map((r) => (
                   <Table.Row key={r.id}>
                     <Table.Cell>
                       <Stack gap={0.5}>
@@ -119,8 +70,8 @@ export function ABCPanel({ items, thresholds = defaultThresholds, showRows = 15
                     <Table.Cell>{percentFmt.format(r.contribution)}</Table.Cell>
                     <Table.Cell>{percentFmt.format(r.cumulative)}</Table.Cell>
                     <Table.Cell textAlign="end">
-                      <Badge colorPalette={r.klass === "A" ? "blue" : r.klass === "B" ? "purple" : "gray"} variant="solid">
-                        {r.klass}
+                      <Badge colorPalette={r.abcClass === "A" ? "blue" : r.abcClass === "B" ? "purple" : "gray"} variant="solid">
+                        {r.abcClass}
                       </Badge>
                     </Table.Cell>
                   </Table.Row>
@@ -129,9 +80,9 @@ export function ABCPanel({ items, thresholds = defaultThresholds, showRows = 15
             </Table.Root>
           </LocaleProvider>
         )}
-        {rows.length > showRows && (
+        {report.itemCount > rows.length && (
           <Text color="fg.muted" fontSize="sm">
-            Mostrando {showRows} de {rows.length} produtos.
+            Mostrando {rows.length} de {report.itemCount} produtos.
           </Text>
         )}
       </Stack>
@@ -1,22 +1,14 @@
 import { Box, Heading, Text } from "@chakra-ui/react"
 import { CostByCategoryPieChart } from "@/components/charts/cost-by-category-pie-chart"
-import type { Item } from "@/lib/api"
+import type { CategorySummary } from "@/lib/api"
 
 interface CostByCategoryPanelProps {
-  items: Item[]
+  categories: CategorySummary[]
 }
 
-export function CostByCategoryPanel({ items }: CostByCategoryPanelProps) {
-  const categoryAggregation = items.reduce<Record<string, number>>(
-    (acc, item) => {
-      acc[item.category] = (acc[item.category] ?? 0) + item.totalValue
-      return acc
-    },
-    {}
-  )
-
-  const data = Object.entries(categoryAggregation)
-    .map(([label, value]) => ({ label, value }))
+export function CostByCategoryPanel({ categories }: CostByCategoryPanelProps) {
+  const data = categories
+    .map((c) => ({ label: c.category, value: c.totalValue }))
     .sort((a, b) => b.value - a.value)
 
   return (
@@ -1,24 +1,16 @@
 import { Box, Heading, Text } from "@chakra-ui/react"
 import { CategoryDistributionBarChart } from "@/components/charts/category-distribution-bar-chart"
-import type { Item } from "@/lib/api"
+import type { CategorySummary } from "@/lib/api"
 
 interface ProductsByCategoryPanelProps {
-  items: Item[]
+  categories: CategorySummary[]
 }
 
 export function ProductsByCategoryPanel({
-  items,
+  categories,
 }: ProductsByCategoryPanelProps) {
-  const categoryAggregation = items.reduce<Record<string, number>>(
-    (acc, item) => {
-      acc[item.category] = (acc[item.category] ?? 0) + item.quantity
-      return acc
-    },
-    {}
-  )
-
-  const data = Object.entries(categoryAggregation)
-    .map(([label, value]) => ({ label, value }))
+  const data = categories
+    .map((c) => ({ label: c.category, value: c.totalQuantity }))
     .sort((a, b) => b.value - a.value)
 
   return (
@@ -1,25 +1,26 @@
 import { SimpleGrid } from "@chakra-ui/react"
-import type { Item } from "@/lib/api"
+import type { ABCReport, ReportSummary } from "@/lib/api"
 import { CostByCategoryPanel } from "./cost-by-category-panel"
 import { ProductsByCategoryPanel } from "./products-by-category-panel"
 import { TopProductsPanel } from "./top-products-panel"
 import { ABCPanel } from "./abc-panel"
 
 interface ReportsContentProps {
-  items: Item[]
+  summary: ReportSummary
+  abcReport: ABCReport
 }
 
-export function ReportsContent({ items }: ReportsContentProps) {
+export function ReportsContent({ summary, abcReport }: ReportsContentProps) {
   return (
     <>
       <SimpleGrid columns={{ base: 1, lg: 2 }} gap={6}>
-        <ProductsByCategoryPanel items={items} />
-        <CostByCategoryPanel items={items} />
+        <ProductsByCategoryPanel categories={summary.categories} />
+        <CostByCategoryPanel categories={summary.categories} />
       </SimpleGrid>
 
-      <TopProductsPanel items={items} />
+      <TopProductsPanel topProducts={summary.topItems} />
 
-      <ABCPanel items={items} />
+      <ABCPanel report={abcReport} />
     </>
   )
 }
@@ -10,13 +10,10 @@ import {
 import type { Item } from "@/lib/api"
 
 interface TopProductsPanelProps {
-  items: Item[]
+  topProducts: Item[]
 }
 
-export function TopProductsPanel({ items }: TopProductsPanelProps) {
-  const topProducts = [...items]
-    .sort((a, b) => b.totalValue - a.totalValue)
-    .slice(0, 5)
+export function TopProductsPanel({ topProducts }: TopProductsPanelProps) {
 
   if (topProducts.length === 0) {
     return (
@@ -9,6 +9,8 @@ export type ItemDTO = {
   unit_price: number
   total_value: number
   low_stock: boolean
+  reorder_threshold: number | null
+  low_stock_threshold: number
 }
 
 export type Item = {
@@ -20,6 +22,8 @@ export type Item = {
   unitPrice: number
   totalValue: number
   lowStock: boolean
+  reorderThreshold: number | null
+  lowStockThreshold: number
 }
 
 function mapItem(dto: ItemDTO): Item {
@@ -32,9 +36,19 @@ function mapItem(dto: ItemDTO): Item {
     unitPrice: dto.unit_price,
     totalValue: dto.total_value,
     lowStock: dto.low_stock,
+    reorderThreshold: dto.reorder_threshold,
+    lowStockThreshold: dto.low_stock_threshold,
   }
 }
 
+export type LowStockItemDTO = ItemDTO & {
+  shortfall: number
+}
+
+export type LowStockItem = Item & {
+  shortfall: number
+}
+
 export type MovementDTO = {
   id: number
   item_id: number
@@ -115,6 +129,13 @@ export async function getItems(): Promise<Item[]> {
   return data.map(mapItem)
 }
 
+export async function getLowStockItems(limit = 50): Promise<LowStockItem[]> {
+  const data = await request<LowStockItemDTO[]>(
+    `/items/low-stock?limit=${limit}`
+  )
+  return data.map((dto) => ({ ...mapItem(dto), shortfall: dto.shortfall }))
+}
+
 export async function getItem(id: number): Promise<Item> {
   const data = await request<ItemDTO>(`/items/${id}`)
   return mapItem(data)
@@ -202,3 +223,127 @@ export async function getInventoryTotalSeries(): Promise<InventoryPoint[]> {
   const data = await request<InventoryPointDTO[]>(`/dashboard/total`)
   return data.map(mapInventoryPoint)
 }
+
+export type ABCClass = "A" | "B" | "C"
+
+export type ABCItemDTO = ItemDTO & {
+  rank: number
+  contribution: number
+  cumulative: number
+  abc_class: ABCClass
+}
+
+export type ABCItem = Item & {
+  rank: number
+  contribution: number
+  cumulative: number
+  abcClass: ABCClass
+}
+
+export type ABCClassSummary = {
+  count: number
+  share: number
+  totalValue: number
+}
+
+export type ABCReportDTO = {
+  thresholds: { a: number; b: number }
+  total_value: number
+  item_count: number
+  summary: Record<
+    ABCClass,
+    { count: number; share: number; total_value: number }
+  >
+  rows: ABCItemDTO[]
+  next_offset: number | null
+}
+
+export type ABCReport = {
+  thresholds: { A: number; B: number }
+  totalValue: number
+  itemCount: number
+  summary: Record<ABCClass, ABCClassSummary>
+  rows: ABCItem[]
+}
+
+function mapABCReport(dto: ABCReportDTO): ABCReport {
+  const summaryFor = (klass: ABCClass): ABCClassSummary => ({
+    count: dto.summary[klass].count,
+    share: dto.summary[klass].share,
+    totalValue: dto.summary[klass].total_value,
+  })
+  return {
+    thresholds: { A: dto.thresholds.a, B: dto.thresholds.b },
+    totalValue: dto.total_value,
+    itemCount: dto.item_count,
+    summary: { A: summaryFor("A"), B: summaryFor("B"), C: summaryFor("C") },
+    rows: dto.rows.map((row) => ({
+      ...mapItem(row),
+      rank: row.rank,
+      contribution: row.contribution,
+      cumulative: row.cumulative,
+      abcClass: row.abc_class,
+    })),
+  }
+}
+
+export async function getABCReport(limit = 15): Promise<ABCReport> {
+  const data = await request<ABCReportDTO>(`/reports/abc?limit=${limit}`)
+  return mapABCReport(data)
+}
+
+export type CategorySummaryDTO = {
+  category: string
+  item_count: number
+  total_quantity: number
+  total_value: number
+  low_stock_count: number
+}
+
+export type CategorySummary = {
+  category: string
+  itemCount: number
+  totalQuantity: number
+  totalValue: number
+  lowStockCount: number
+}
+
+export type ReportSummaryDTO = {
+  item_count: number
+  total_quantity: number
+  total_value: number
+  low_stock_count: number
+  categories: CategorySummaryDTO[]
+  top_items: ItemDTO[]
+}
+
+export type ReportSummary = {
+  itemCount: number
+  totalQuantity: number
+  totalValue: number
+  lowStockCount: number
+  categories: CategorySummary[]
+  topItems: Item[]
+}
+
+function mapCategorySummary(dto: CategorySummaryDTO): CategorySummary {
+  return {
+    category: dto.category,
+    itemCount: dto.item_count,
+    totalQuantity: dto.total_quantity,
+    totalValue: dto.total_value,
+    lowStockCount: dto.low_stock_count,
+  }
+}
+
+export async function getReportSummary(top = 5): Promise<ReportSummary> {
+  const data = await request<ReportSummaryDTO>(`/reports/summary?top=${top}`)
+  return {
+    itemCount: data.item_count,
+    totalQuantity: data.total_quantity,
+    totalValue: data.total_value,
+    lowStockCount: data.low_stock_count,
+    categories: data.categories.map(mapCategorySummary),
+    topItems: data.top_items.map(mapItem),
+  }
+}
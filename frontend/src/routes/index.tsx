@@ -43,7 +43,7 @@ function DashboardRoute() {
         <MetricsGrid items={items} />
 
         <SimpleGrid columns={{ base: 1, md: 2 }} gap={6}>
-          <LowStockPanel items={items} />
+          <LowStockPanel hasItems={items.length > 0} />
           <CategoryDistributionPanel items={items} />
         </SimpleGrid>
 
@@ -5,34 +5,41 @@ import { ReportsContent } from "@/components/reports/reports-content"
 import { ReportsError } from "@/components/reports/reports-error"
 import { ReportsHeader } from "@/components/reports/reports-header"
 import { ReportsLoading } from "@/components/reports/reports-loading"
-import { getItems } from "@/lib/api"
+import { getABCReport, getReportSummary } from "@/lib/api"
 
 export const Route = createFileRoute("/reports")({
   component: ReportsRoute,
 })
 
 function ReportsRoute() {
-  const {
-    data: items = [],
-    isPending,
-    isError,
-    error,
-    refetch,
-  } = useQuery({
-    queryKey: ["items"],
-    queryFn: getItems,
+  const summaryQuery = useQuery({
+    queryKey: ["reports", "summary"],
+    queryFn: () => getReportSummary(),
   })
+  const abcQuery = useQuery({
+    queryKey: ["reports", "abc"],
+    queryFn: () => getABCReport(),
+  })
+
+  if (summaryQuery.isPending || abcQuery.isPending) return <ReportsLoading />
 
-  if (isPending) return <ReportsLoading />
+  if (summaryQuery.isError)
+    return (
+      <ReportsError error={summaryQuery.error} onRetry={summaryQuery.refetch} />
+    )
 
-  if (isError) return <ReportsError error={error} onRetry={refetch} />
+  if (abcQuery.isError)
+    return <ReportsError error={abcQuery.error} onRetry={abcQuery.refetch} />
 
   return (
     <Container maxW="6xl" px={{ base: 4, md: 6 }} py={10}>
       <Stack gap={10}>
         <ReportsHeader />
 
-        <ReportsContent items={items} />
+        <ReportsContent
+          abcReport={abcQuery.data}
+          summary={summaryQuery.data}
+        />
       </Stack>
     </Container>
   )